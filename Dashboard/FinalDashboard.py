@@ -16,28 +16,48 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from functools import partial
+from uuid import uuid4
 
 # Import CRUD operations from Dashboard/crud.py
 from crud import (
     get_database_connection, get_user_info, get_household_info,
-    get_upcoming_bills, get_savings_goals, get_recent_transactions,
-    get_spending_data, get_user_spending_data, get_household_members,
-    get_categories, create_bill, check_and_update_overdue_bills,
+    get_upcoming_bills, get_savings_goals, get_transaction_page,
+    get_spending_data, get_user_spending_data, get_spending_rollup, get_household_members,
+    get_categories, create_bill,
     get_user_debt_settlements, create_category, delete_category,
-    delete_savings_goal, pay_towards_goal, record_payment_to_user,
+    create_savings_goal, delete_savings_goal, pay_towards_goal, record_payment_to_user,
     user_has_household, get_all_users, add_member_to_household,
     create_household, create_user, get_all_households,
     get_or_create_permanent_category, mark_bill_as_paid, delete_bill
 )
 
+# Background jobs (overdue-bill sweeper) from Dashboard/sweeper.py
+from sweeper import start_overdue_sweeper
+
+# Per-rerun timings for the Master View performance panel from Dashboard/tracing.py
+from tracing import start_rerun_profile, begin_section, figure_timer
+
+# Concurrent section reads from Dashboard/prefetch.py
+from prefetch import run_concurrently
+
+# Household-scoped read cache and its version stamps from Dashboard/cache.py
+from cache import household_cache
+
 # Import route/business logic functions from Dashboard/routes.py
 from routes import (
     is_admin, toggle_menu, toggle_master_view, onboarding_screen,
     show_add_bill_form, open_bill_action, handle_user_profile_update,
-    render_master_view_selector
+    render_master_view_selector, load_session_user, section_fragment, lazy_expander,
+    lazy_expander_loaded, transaction_rows_html, settlement_rows_html,
+    render_transaction_import, render_ledger_export
 )
 
 
+# Timings for this run of the script; shown in Master View on the next rerun
+rerun_profile = start_rerun_profile()
+
+
 # ============================================================
 # PAGE CONFIGURATION
 # ============================================================
@@ -269,6 +289,14 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# ============================================================
+# BACKGROUND JOBS
+# ============================================================
+
+# Starts once per server process; marks overdue bills outside the render path
+start_overdue_sweeper()
+
+
 # ============================================================
 # SESSION STATE INITIALIZATION
 # ============================================================
@@ -280,18 +308,9 @@ if 'user_info' not in st.session_state:
     st.session_state.user_info = None
 
 if 'household_info' not in st.session_state:
+    st.session_state.household_info = None
     if st.session_state.user_id is not None:
-        household_data = get_household_info(st.session_state.user_id)
-        if household_data is not None:
-            st.session_state.household_info = {
-                'household_id': household_data['household_id'], 
-                'name': household_data['name'],
-                'role': household_data['role'] 
-            }
-        else:
-            st.session_state.household_info = None
-    else:
-        st.session_state.household_info = None
+        load_session_user(st.session_state.user_id)
 
 if 'show_menu' not in st.session_state:
     st.session_state.show_menu = False
@@ -327,16 +346,9 @@ if not master_view_enabled:
 
     # Case 2: Profile exists but no household
     if user_info is not None and household_info is None:
-        result = user_has_household(user_info["user_id"])
-        if result is None:
+        if load_session_user(user_info["user_id"])["household"] is None:
             onboarding_screen()
             st.stop()
-        else:
-            st.session_state.household_info = {
-                "household_id": result["household_id"],
-                "role": result["role"],
-                "name": None
-            }
 
 
 # ============================================================
@@ -354,11 +366,47 @@ if user_info is None or household_info is None or household_info.get('household_
     st.error("Unable to load user or household information. Please check your database connection.")
     st.stop()
 
+current_user_id = st.session_state.get("user_id")
+current_household_id = household_info.get("household_id") if household_info else None
+
+if current_user_id is None or current_household_id is None:
+    st.info("Your profile is set up, but you are not yet linked to a household with spending data.")
+    st.stop()
+
+
+# ============================================================
+# PREFETCH SECTION DATA
+# ============================================================
+
+begin_section("Prefetch")
+
+# One version stamp check per rerun; every cached read below compares against it
+household_cache.household_version(current_household_id, refresh=True)
+
+# Start the reads of every visible section at once; the sections below then hit warm caches
+section_reads = [
+    partial(get_spending_rollup, current_household_id),
+    partial(get_savings_goals, current_household_id),
+    partial(get_upcoming_bills, current_household_id),
+]
+if st.session_state.get("show_payment_form") or lazy_expander_loaded("load_transactions"):
+    section_reads.append(partial(get_household_members, current_household_id))
+if st.session_state.get("show_payment_form") or lazy_expander_loaded("load_categories"):
+    section_reads.append(partial(get_categories, current_household_id))
+if lazy_expander_loaded("load_payment_history"):
+    section_reads.append(partial(get_user_debt_settlements, current_household_id, current_user_id))
+if lazy_expander_loaded("load_transactions"):
+    section_reads.append(partial(get_transaction_page, current_household_id, **st.session_state.get("txn_filters", {})))
+
+run_concurrently(section_reads)
+
 
 # ============================================================
 # HEADER SECTION
 # ============================================================
 
+begin_section("Header")
+
 col_header_left, col_header_right = st.columns([9, 3])
 
 with col_header_left:
@@ -426,431 +474,447 @@ st.markdown("<br>", unsafe_allow_html=True)
 # SPENDING OVERVIEW SECTION
 # ============================================================
 
-# Time period selector for charts
-col_title, col_period = st.columns([9, 3])
-with col_title:
-    st.markdown('<h4 style="color: white;">Spending Overview</h4>', unsafe_allow_html=True)
-with col_period:
-    period = st.selectbox(
-        "Time Period",
-        options=["Week", "Month", "Quarter", "Year"],
-        index=1,
-        label_visibility="collapsed"
-    )
-    view_mode = st.radio(
-        "Spending view",
-        options=["My spending", "Household spending"],
-        index=1,
-        horizontal=True,
-        label_visibility="collapsed"
-    )
-
-# Map period to days
-period_days_map = {
-    "Week": 7,
-    "Month": 30,
-    "Quarter": 90,
-    "Year": 365
-}
-period_days = period_days_map[period]
-
-current_user_id = st.session_state.get("user_id")
-current_household_id = household_info.get("household_id") if household_info else None
-
-if current_user_id is None or current_household_id is None:
-    st.info("Your profile is set up, but you are not yet linked to a household with spending data.")
-    st.stop()
+@section_fragment("Spending Overview")
+def render_spending_overview():
+    # Time period selector for charts
+    col_title, col_period = st.columns([9, 3])
+    with col_title:
+        st.markdown('<h4 style="color: white;">Spending Overview</h4>', unsafe_allow_html=True)
+    with col_period:
+        period = st.selectbox(
+            "Time Period",
+            options=["Week", "Month", "Quarter", "Year"],
+            index=1,
+            label_visibility="collapsed"
+        )
+        view_mode = st.radio(
+            "Spending view",
+            options=["My spending", "Household spending"],
+            index=1,
+            horizontal=True,
+            label_visibility="collapsed"
+        )
 
-# Get spending data based on view mode
-if view_mode == "My spending":
-    user_category_df, user_avg_category_df, cumulative_df = get_user_spending_data(
-        current_household_id,
-        current_user_id,
-        period_days
-    )
+    # Map period to days
+    period_days_map = {
+        "Week": 7,
+        "Month": 30,
+        "Quarter": 90,
+        "Year": 365
+    }
+    period_days = period_days_map[period]
+
+    # Get spending data based on view mode
+    if view_mode == "My spending":
+        user_category_df, user_avg_category_df, cumulative_df = get_user_spending_data(
+            current_household_id,
+            current_user_id,
+            period_days
+        )
 
-    # Three Charts for My Spending View
-    chart_col1, chart_col2, chart_col3 = st.columns(3)
+        # Three Charts for My Spending View
+        chart_col1, chart_col2, chart_col3 = st.columns(3)
     
-    with chart_col1:
-        st.markdown("#### My Total Spending")
-        if not user_category_df.empty:
-            total_amount = user_category_df['total'].sum()
-            fig1 = px.pie(
-                user_category_df, 
-                values='total', 
-                names='category',
-                hole=0.6,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig1.update_layout(
-                showlegend=True,
-                height=300,
-                margin=dict(t=0, b=0, l=0, r=0),
-                annotations=[dict(text=f'${total_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
-            )
-            fig1.update_traces(textposition='inside', textinfo='percent')
-            st.plotly_chart(fig1, use_container_width=True)
-        else:
-            st.info("No spending data available for this period")
+        with chart_col1:
+            st.markdown("#### My Total Spending")
+            if not user_category_df.empty:
+                total_amount = user_category_df['total'].sum()
+                with figure_timer():
+                    fig1 = px.pie(
+                        user_category_df, 
+                        values='total', 
+                        names='category',
+                        hole=0.6,
+                        color_discrete_sequence=px.colors.qualitative.Set3
+                    )
+                    fig1.update_layout(
+                        showlegend=True,
+                        height=300,
+                        margin=dict(t=0, b=0, l=0, r=0),
+                        annotations=[dict(text=f'${total_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
+                    )
+                    fig1.update_traces(textposition='inside', textinfo='percent')
+                    st.plotly_chart(fig1, use_container_width=True)
+            else:
+                st.info("No spending data available for this period")
     
-    with chart_col2:
-        st.markdown("#### My Average Spending by Category")
-        if not user_avg_category_df.empty:
-            avg_amount = user_avg_category_df['avg_amount'].mean()
-            fig2 = px.pie(
-                user_avg_category_df, 
-                values='avg_amount', 
-                names='category',
-                hole=0.6,
-                color_discrete_sequence=px.colors.qualitative.Pastel
-            )
-            fig2.update_layout(
-                showlegend=True,
-                height=300,
-                margin=dict(t=0, b=0, l=0, r=0),
-                annotations=[dict(text=f'${avg_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
-            )
-            fig2.update_traces(textposition='inside', textinfo='percent')
-            st.plotly_chart(fig2, use_container_width=True)
-        else:
-            st.info("No spending data available for this period")
+        with chart_col2:
+            st.markdown("#### My Average Spending by Category")
+            if not user_avg_category_df.empty:
+                avg_amount = user_avg_category_df['avg_amount'].mean()
+                with figure_timer():
+                    fig2 = px.pie(
+                        user_avg_category_df, 
+                        values='avg_amount', 
+                        names='category',
+                        hole=0.6,
+                        color_discrete_sequence=px.colors.qualitative.Pastel
+                    )
+                    fig2.update_layout(
+                        showlegend=True,
+                        height=300,
+                        margin=dict(t=0, b=0, l=0, r=0),
+                        annotations=[dict(text=f'${avg_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
+                    )
+                    fig2.update_traces(textposition='inside', textinfo='percent')
+                    st.plotly_chart(fig2, use_container_width=True)
+            else:
+                st.info("No spending data available for this period")
     
-    with chart_col3:
-        st.markdown("#### Cumulative Spending Over Time")
-        if not cumulative_df.empty:
-            fig3 = px.line(
-                cumulative_df, 
-                x='date', 
-                y='cumulative_total',
-                markers=True
-            )
-            fig3.update_layout(
-                showlegend=False,
-                height=300,
-                margin=dict(t=0, b=0, l=0, r=0),
-                xaxis_title="Date",
-                yaxis_title="Total ($)"
-            )
-            fig3.update_traces(line_color='#FF8C00')
-            st.plotly_chart(fig3, use_container_width=True)
-        else:
-            st.info("No spending data available for this period")
+        with chart_col3:
+            st.markdown("#### Cumulative Spending Over Time")
+            if not cumulative_df.empty:
+                with figure_timer():
+                    fig3 = px.line(
+                        cumulative_df, 
+                        x='date', 
+                        y='cumulative_total',
+                        markers=True
+                    )
+                    fig3.update_layout(
+                        showlegend=False,
+                        height=300,
+                        margin=dict(t=0, b=0, l=0, r=0),
+                        xaxis_title="Date",
+                        yaxis_title="Total ($)"
+                    )
+                    fig3.update_traces(line_color='#FF8C00')
+                    st.plotly_chart(fig3, use_container_width=True)
+            else:
+                st.info("No spending data available for this period")
 
-else:
-    total_spending_df, avg_spending_df, comparison_df = get_spending_data(
-        current_household_id,
-        current_user_id,
-        period_days
-    )
-
-    # Three Donut Charts Section
-    chart_col1, chart_col2, chart_col3 = st.columns(3)
+    else:
+        total_spending_df, avg_spending_df, comparison_df = get_spending_data(
+            current_household_id,
+            current_user_id,
+            period_days
+        )
+
+        # Three Donut Charts Section
+        chart_col1, chart_col2, chart_col3 = st.columns(3)
     
-    with chart_col1:
-        st.markdown("#### Total Spending")
-        if not total_spending_df.empty:
-            total_amount = total_spending_df['total'].sum()
-            fig1 = px.pie(
-                total_spending_df, 
-                values='total', 
-                names='category',
-                hole=0.6,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig1.update_layout(
-                showlegend=True,
-                height=300,
-                margin=dict(t=0, b=0, l=0, r=0),
-                annotations=[dict(text=f'${total_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
-            )
-            fig1.update_traces(textposition='inside', textinfo='percent')
-            st.plotly_chart(fig1, use_container_width=True)
-        else:
-            st.info("No spending data available for this period")
+        with chart_col1:
+            st.markdown("#### Total Spending")
+            if not total_spending_df.empty:
+                total_amount = total_spending_df['total'].sum()
+                with figure_timer():
+                    fig1 = px.pie(
+                        total_spending_df, 
+                        values='total', 
+                        names='category',
+                        hole=0.6,
+                        color_discrete_sequence=px.colors.qualitative.Set3
+                    )
+                    fig1.update_layout(
+                        showlegend=True,
+                        height=300,
+                        margin=dict(t=0, b=0, l=0, r=0),
+                        annotations=[dict(text=f'${total_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
+                    )
+                    fig1.update_traces(textposition='inside', textinfo='percent')
+                    st.plotly_chart(fig1, use_container_width=True)
+            else:
+                st.info("No spending data available for this period")
     
-    with chart_col2:
-        st.markdown("#### Average Spending by User")
-        if not avg_spending_df.empty:
-            avg_amount = avg_spending_df['avg_amount'].mean()
-            fig2 = px.pie(
-                avg_spending_df, 
-                values='avg_amount', 
-                names='username',
-                hole=0.6,
-                color_discrete_sequence=px.colors.qualitative.Pastel
-            )
-            fig2.update_layout(
-                showlegend=True,
-                height=300,
-                margin=dict(t=0, b=0, l=0, r=0),
-                annotations=[dict(text=f'${avg_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
-            )
-            fig2.update_traces(textposition='inside', textinfo='percent')
-            st.plotly_chart(fig2, use_container_width=True)
-        else:
-            st.info("No spending data available for this period")
+        with chart_col2:
+            st.markdown("#### Average Spending by User")
+            if not avg_spending_df.empty:
+                avg_amount = avg_spending_df['avg_amount'].mean()
+                with figure_timer():
+                    fig2 = px.pie(
+                        avg_spending_df, 
+                        values='avg_amount', 
+                        names='username',
+                        hole=0.6,
+                        color_discrete_sequence=px.colors.qualitative.Pastel
+                    )
+                    fig2.update_layout(
+                        showlegend=True,
+                        height=300,
+                        margin=dict(t=0, b=0, l=0, r=0),
+                        annotations=[dict(text=f'${avg_amount:.2f}', x=0.5, y=0.5, font_size=16, showarrow=False)]
+                    )
+                    fig2.update_traces(textposition='inside', textinfo='percent')
+                    st.plotly_chart(fig2, use_container_width=True)
+            else:
+                st.info("No spending data available for this period")
     
-    with chart_col3:
-        st.markdown("#### My Spending vs Household")
-        if not comparison_df.empty and comparison_df.iloc[0]['my_spending'] is not None:
-            my_spend = float(comparison_df.iloc[0]['my_spending'] or 0)
-            household_spend = float(comparison_df.iloc[0]['household_spending'] or 0)
+        with chart_col3:
+            st.markdown("#### My Spending vs Household")
+            if not comparison_df.empty and comparison_df.iloc[0]['my_spending'] is not None:
+                my_spend = float(comparison_df.iloc[0]['my_spending'] or 0)
+                household_spend = float(comparison_df.iloc[0]['household_spending'] or 0)
             
-            comparison_data = pd.DataFrame({
-                'Category': ['My Spending', 'Others Spending'],
-                'Amount': [my_spend, household_spend]
-            })
+                comparison_data = pd.DataFrame({
+                    'Category': ['My Spending', 'Others Spending'],
+                    'Amount': [my_spend, household_spend]
+                })
             
-            fig3 = px.pie(
-                comparison_data, 
-                values='Amount', 
-                names='Category',
-                hole=0.6,
-                color_discrete_sequence=['#4CAF50', '#2196F3']
-            )
-            fig3.update_layout(
-                showlegend=True,
-                height=300,
-                margin=dict(t=0, b=0, l=0, r=0)
-            )
-            fig3.update_traces(textposition='inside', textinfo='percent')
-            st.plotly_chart(fig3, use_container_width=True)
-        else:
-            st.info("No spending comparison data available")
+                with figure_timer():
+                    fig3 = px.pie(
+                        comparison_data, 
+                        values='Amount', 
+                        names='Category',
+                        hole=0.6,
+                        color_discrete_sequence=['#4CAF50', '#2196F3']
+                    )
+                    fig3.update_layout(
+                        showlegend=True,
+                        height=300,
+                        margin=dict(t=0, b=0, l=0, r=0)
+                    )
+                    fig3.update_traces(textposition='inside', textinfo='percent')
+                    st.plotly_chart(fig3, use_container_width=True)
+            else:
+                st.info("No spending comparison data available")
+
+    st.markdown("<br>", unsafe_allow_html=True)
 
-st.markdown("<br>", unsafe_allow_html=True)
+
+render_spending_overview()
 
 
 # ============================================================
 # PAY A HOUSEHOLD MEMBER SECTION
 # ============================================================
 
-st.markdown('<h4 style="color: white;">Pay a Household Member</h4>', unsafe_allow_html=True)
+@section_fragment("Payments")
+def render_payments():
+    st.markdown('<h4 style="color: white;">Pay a Household Member</h4>', unsafe_allow_html=True)
 
-if 'show_payment_form' not in st.session_state:
-    st.session_state.show_payment_form = False
+    if 'show_payment_form' not in st.session_state:
+        st.session_state.show_payment_form = False
 
-if st.button("💸 Make a Payment", key="toggle_payment"):
-    st.session_state.show_payment_form = not st.session_state.show_payment_form
+    if st.button("💸 Make a Payment", key="toggle_payment"):
+        st.session_state.show_payment_form = not st.session_state.show_payment_form
 
-if st.session_state.show_payment_form:
-    household_members = get_household_members(household_info['household_id'])
-    categories_df = get_categories(household_info['household_id'])
+    if st.session_state.show_payment_form:
+        household_members = get_household_members(household_info['household_id'])
+        categories_df = get_categories(household_info['household_id'])
     
-    # Filter out current user from receiver options
-    receiver_options = household_members[household_members['user_id'] != st.session_state.user_id]
+        # Filter out current user from receiver options
+        receiver_options = household_members[household_members['user_id'] != st.session_state.user_id]
     
-    if not receiver_options.empty:
-        with st.form("payment_form"):
-            st.markdown("### Record a payment")
+        if not receiver_options.empty:
+            with st.form("payment_form"):
+                st.markdown("### Record a payment")
             
-            col1, col2 = st.columns(2)
+                col1, col2 = st.columns(2)
             
-            with col1:
-                # Create a mapping of username to user_id
-                receiver_dict = dict(zip(receiver_options['username'], receiver_options['user_id']))
-                selected_receiver = st.selectbox(
-                    "Pay to",
-                    options=list(receiver_dict.keys())
-                )
+                with col1:
+                    # Create a mapping of username to user_id
+                    receiver_dict = dict(zip(receiver_options['username'], receiver_options['user_id']))
+                    selected_receiver = st.selectbox(
+                        "Pay to",
+                        options=list(receiver_dict.keys())
+                    )
             
-            with col2:
-                payment_amount = st.number_input(
-                    "Amount ($)",
-                    min_value=0.01,
-                    step=0.01,
-                    format="%.2f"
-                )
+                with col2:
+                    payment_amount = st.number_input(
+                        "Amount ($)",
+                        min_value=0.01,
+                        step=0.01,
+                        format="%.2f"
+                    )
             
-            # Category selection (mandatory) - only show shared categories for user-to-user payments
-            if not categories_df.empty:
-                # Filter to only 'shared' type categories - exclude 'bill' and 'goal'
-                payment_categories = categories_df[categories_df['type'] == 'shared']
+                # Category selection (mandatory) - only show shared categories for user-to-user payments
+                if not categories_df.empty:
+                    # Filter to only 'shared' type categories - exclude 'bill' and 'goal'
+                    payment_categories = categories_df[categories_df['type'] == 'shared']
                 
-                if not payment_categories.empty:
-                    category_dict = dict(zip(payment_categories['name'], payment_categories['category_id']))
-                    selected_category = st.selectbox(
-                        "Category *",
-                        options=list(category_dict.keys()),
-                        help="Select the category for this payment"
-                    )
-                    selected_category_id = category_dict[selected_category]
+                    if not payment_categories.empty:
+                        category_dict = dict(zip(payment_categories['name'], payment_categories['category_id']))
+                        selected_category = st.selectbox(
+                            "Category *",
+                            options=list(category_dict.keys()),
+                            help="Select the category for this payment"
+                        )
+                        selected_category_id = category_dict[selected_category]
+                    else:
+                        st.error("No shared expense categories found. Please create a shared category first.")
+                        selected_category_id = None
                 else:
-                    st.error("No shared expense categories found. Please create a shared category first.")
+                    st.error("No categories found. Please create a category first.")
                     selected_category_id = None
-            else:
-                st.error("No categories found. Please create a category first.")
-                selected_category_id = None
             
-            col_submit, col_cancel = st.columns(2)
-            with col_submit:
-                submit_payment = st.form_submit_button("Record Payment", use_container_width=True)
-            with col_cancel:
-                cancel_payment = st.form_submit_button("Cancel", use_container_width=True)
+                col_submit, col_cancel = st.columns(2)
+                with col_submit:
+                    submit_payment = st.form_submit_button("Record Payment", use_container_width=True)
+                with col_cancel:
+                    cancel_payment = st.form_submit_button("Cancel", use_container_width=True)
             
-            if submit_payment:
-                if selected_category_id is None:
-                    st.error("Please select a category.")
-                else:
-                    receiver_id = receiver_dict[selected_receiver]
-                    success = record_payment_to_user(
-                        household_info['household_id'],
-                        st.session_state.user_id,
-                        receiver_id,
-                        payment_amount,
-                        selected_category_id
-                    )
-                    if success:
-                        st.success(f"Payment of ${payment_amount:.2f} to {selected_receiver} recorded!")
-                        st.session_state.show_payment_form = False
-                        get_user_debt_settlements.clear()
-                        get_recent_transactions.clear()
-                        st.rerun()
+                if submit_payment:
+                    if selected_category_id is None:
+                        st.error("Please select a category.")
+                    else:
+                        receiver_id = receiver_dict[selected_receiver]
+                        success = record_payment_to_user(
+                            household_info['household_id'],
+                            st.session_state.user_id,
+                            receiver_id,
+                            payment_amount,
+                            selected_category_id
+                        )
+                        if success:
+                            st.success(f"Payment of ${payment_amount:.2f} to {selected_receiver} recorded!")
+                            st.session_state.show_payment_form = False
+                            get_user_debt_settlements.invalidate(
+                                household_info['household_id'],
+                                user_ids=(st.session_state.user_id, receiver_id)
+                            )
+                            get_transaction_page.invalidate(household_info['household_id'])
+                            get_spending_rollup.invalidate(household_info['household_id'])
+                            # Payment history, Recent Transactions and Spending Overview all changed: rerun the whole page
+                            st.rerun(scope="app")
             
-            if cancel_payment:
-                st.session_state.show_payment_form = False
-                st.rerun()
-    else:
-        st.info("No other household members found to pay.")
+                if cancel_payment:
+                    st.session_state.show_payment_form = False
+                    st.rerun(scope="fragment")
+        else:
+            st.info("No other household members found to pay.")
+
+    # Display debt settlements for the user
+    st.markdown("---")
+
+    with lazy_expander("💰 My Payment History", key="load_payment_history", load_label="Show payment history") as loaded:
+        if loaded:
+            debt_settlements = get_user_debt_settlements(household_info['household_id'], st.session_state.user_id)
+            if not debt_settlements.empty:
+                st.markdown(
+                    settlement_rows_html(debt_settlements, st.session_state.user_id),
+                    unsafe_allow_html=True
+                )
+            else:
+                st.info("No payment history found.")
 
-# Display debt settlements for the user
-st.markdown("---")
-debt_settlements = get_user_debt_settlements(household_info['household_id'], st.session_state.user_id)
+    st.markdown("<br>", unsafe_allow_html=True)
 
-with st.expander("💰 My Payment History", expanded=False):
-    if not debt_settlements.empty:
-        for index, row in debt_settlements.iterrows():
-            # Determine if current user is payer or receiver
-            is_payer = row['payer_user_id'] == st.session_state.user_id
-            
-            if is_payer:
-                description = f"You paid {row['receiver_name']}"
-                amount_color = "red"
-                amount_prefix = "-"
-            else:
-                description = f"{row['payer_name']} paid you"
-                amount_color = "green"
-                amount_prefix = "+"
-            
-            status_class = f"status-{row['status']}"
-            
-            html_row = f"""
-            <div class="transaction-row">
-                <div>
-                    <strong style="color: black;">{description}</strong>
-                    <span class="t-date">{row['created_at']}</span>
-                </div>
-                <div style="text-align: right;">
-                    <strong style="color: {amount_color};">{amount_prefix}${row['amount']:.2f}</strong>
-                    <br>
-                    <span class="{status_class}">{row['status'].upper()}</span>
-                </div>
-            </div>
-            """
-            st.markdown(html_row, unsafe_allow_html=True)
-    else:
-        st.info("No payment history found.")
 
-st.markdown("<br>", unsafe_allow_html=True)
+render_payments()
 
 
 # ============================================================
 # RECENT TRANSACTIONS SECTION
 # ============================================================
 
-st.markdown('<h4 style="color: white;">Recent Transactions</h4>', unsafe_allow_html=True)
-transactions_df = get_recent_transactions(household_info['household_id'], days=365)
-
-with st.expander("Recent Transactions", expanded=False):
-    if not transactions_df.empty:
-        for index, row in transactions_df.iterrows():
-            html_row = f"""
-            <div class="transaction-row">
-                <div>
-                    <strong style="color: black;">{row['notes']}</strong>
-                    <span class="t-date">by {row['username']} - {row['created_at']}</span>
-                </div>
-                <div style="text-align: right;">
-                    <strong style="color: red;">${row['amount']:.2f}</strong>
-                    <br>
-                    <span class="t-category">{row['category']}</span>
-                </div>
-            </div>
-            """
-            st.markdown(html_row, unsafe_allow_html=True)
-    else:
-        st.info("No recent transactions found.")
+@section_fragment("Transactions")
+def render_transactions():
+    st.markdown('<h4 style="color: white;">Recent Transactions</h4>', unsafe_allow_html=True)
+
+    with lazy_expander("Recent Transactions", key="load_transactions", load_label="Show transactions") as loaded:
+        if loaded:
+            # Server-side filters
+            members_df = get_household_members(household_info['household_id'])
+            member_options = dict(zip(members_df['username'], members_df['user_id'])) if not members_df.empty else {}
+            category_options = sorted(get_spending_rollup(household_info['household_id'])['category'].dropna().unique())
+
+            filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+            with filter_col1:
+                member_filter = st.selectbox("Member", ["All"] + list(member_options.keys()), key="txn_filter_member")
+            with filter_col2:
+                category_filter = st.selectbox("Category", ["All"] + list(category_options), key="txn_filter_category")
+            with filter_col3:
+                min_amount_filter = st.number_input("Min ($)", min_value=0.0, step=10.0, key="txn_filter_min")
+            with filter_col4:
+                max_amount_filter = st.number_input("Max ($)", min_value=0.0, step=10.0, key="txn_filter_max")
+
+            transaction_filters = {
+                "user_id": member_options.get(member_filter),
+                "category_key": None if category_filter == "All" else category_filter,
+                "min_amount": min_amount_filter or None,
+                "max_amount": max_amount_filter or None
+            }
 
-st.markdown("<br>", unsafe_allow_html=True)
+            # Changing a filter goes back to the first page
+            if st.session_state.get('txn_filters') != transaction_filters:
+                st.session_state.txn_filters = transaction_filters
+                st.session_state.txn_pages_loaded = 1
+
+            # Each page starts after the last row of the page before it
+            next_cursor = None
+            pages = []
+            for page_number in range(st.session_state.txn_pages_loaded):
+                transactions_df, next_cursor = get_transaction_page(
+                    household_info['household_id'],
+                    after=next_cursor,
+                    **transaction_filters
+                )
+                pages.append(transactions_df)
+                if next_cursor is None:
+                    break
+
+            transactions_df = pd.concat(pages, ignore_index=True)
+            if transactions_df.empty:
+                st.info("No recent transactions found.")
+            else:
+                st.markdown(transaction_rows_html(transactions_df), unsafe_allow_html=True)
+
+            if next_cursor is not None:
+                if st.button("Load more", key="txn_load_more", use_container_width=True):
+                    st.session_state.txn_pages_loaded += 1
+                    st.rerun(scope="fragment")
+
+    with st.expander("📥 Import Transactions"):
+        if render_transaction_import(household_info['household_id'], current_user_id):
+            # Spending, categories and the transaction list all change: rerun the whole page
+            st.rerun(scope="app")
+
+    with st.expander("📤 Export Household Ledger"):
+        render_ledger_export(household_info['household_id'])
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+
+render_transactions()
 
 
 # ============================================================
 # SAVINGS GOALS SECTION
 # ============================================================
 
-st.markdown('<h4 style="color: white;">Savings Goals</h4>', unsafe_allow_html=True)
-goals_df = get_savings_goals(household_info['household_id'])
+@section_fragment("Savings Goals")
+def render_savings_goals():
+    st.markdown('<h4 style="color: white;">Savings Goals</h4>', unsafe_allow_html=True)
+    goals_df = get_savings_goals(household_info['household_id'])
 
-if not goals_df.empty:
-    goals_cols = st.columns(3)
+    if not goals_df.empty:
+        goals_cols = st.columns(3)
     
-    for idx, row in goals_df.iterrows():
-        col_idx = idx % 3
-        with goals_cols[col_idx]:
-            with st.container():
-                goal_id = int(row["goal_id"])
-                st.markdown(f"**{row['name']}**")
+        for idx, row in goals_df.iterrows():
+            col_idx = idx % 3
+            with goals_cols[col_idx]:
+                with st.container():
+                    goal_id = int(row["goal_id"])
+                    st.markdown(f"**{row['name']}**")
                 
-                current = float(row['current_amount'])
-                target = float(row['target_amount'])
-                progress_pct = (current / target * 100) if target > 0 else 0
-                goal_achieved = current >= target
+                    current = float(row['current_amount'])
+                    target = float(row['target_amount'])
+                    progress_pct = (current / target * 100) if target > 0 else 0
+                    goal_achieved = current >= target
                 
-                # Use green progress bar if goal is achieved
-                if goal_achieved:
-                    st.markdown(
-                        f'<div style="background-color: #4CAF50; height: 10px; border-radius: 5px; width: 100%;"></div>',
-                        unsafe_allow_html=True
-                    )
-                else:
-                    st.progress(progress_pct / 100)
+                    # Use green progress bar if goal is achieved
+                    if goal_achieved:
+                        st.markdown(
+                            f'<div style="background-color: #4CAF50; height: 10px; border-radius: 5px; width: 100%;"></div>',
+                            unsafe_allow_html=True
+                        )
+                    else:
+                        st.progress(progress_pct / 100)
                 
-                col_a, col_b = st.columns(2)
-                with col_a:
-                    st.metric("Current", f"${current:,.2f}")
-                with col_b:
-                    st.metric("Target", f"${target:,.2f}")
+                    col_a, col_b = st.columns(2)
+                    with col_a:
+                        st.metric("Current", f"${current:,.2f}")
+                    with col_b:
+                        st.metric("Target", f"${target:,.2f}")
                 
-                if goal_achieved:
-                    st.markdown('<p class="goal-achieved">🎉 Goal Achieved!</p>', unsafe_allow_html=True)
-                else:
-                    st.caption(f"{progress_pct:.1f}% Complete")
-
-                # Show buttons - only show Pay button if goal not achieved
-                if goal_achieved:
-                    # Only show delete button when goal is achieved (admin only)
-                    if is_admin():
-                        delete_clicked = st.button(
-                            "Delete",
-                            key=f"delete_goal_{goal_id}",
-                            use_container_width=True
-                        )
+                    if goal_achieved:
+                        st.markdown('<p class="goal-achieved">🎉 Goal Achieved!</p>', unsafe_allow_html=True)
                     else:
-                        delete_clicked = False
-                    pay_clicked = False
-                else:
-                    # Show both Pay and Delete buttons for active goals
-                    btn_col1, btn_col2 = st.columns(2)
-                    
-                    with btn_col1:
-                        pay_clicked = st.button(
-                            "➕ Pay",
-                            key=f"pay_goal_{goal_id}",
-                            use_container_width=True
-                        )
-                    
-                    with btn_col2:
+                        st.caption(f"{progress_pct:.1f}% Complete")
+
+                    # Show buttons - only show Pay button if goal not achieved
+                    if goal_achieved:
+                        # Only show delete button when goal is achieved (admin only)
                         if is_admin():
                             delete_clicked = st.button(
                                 "Delete",
@@ -859,278 +923,317 @@ if not goals_df.empty:
                             )
                         else:
                             delete_clicked = False
+                        pay_clicked = False
+                    else:
+                        # Show both Pay and Delete buttons for active goals
+                        btn_col1, btn_col2 = st.columns(2)
+                    
+                        with btn_col1:
+                            pay_clicked = st.button(
+                                "➕ Pay",
+                                key=f"pay_goal_{goal_id}",
+                                use_container_width=True
+                            )
+                    
+                        with btn_col2:
+                            if is_admin():
+                                delete_clicked = st.button(
+                                    "Delete",
+                                    key=f"delete_goal_{goal_id}",
+                                    use_container_width=True
+                                )
+                            else:
+                                delete_clicked = False
                 
-                if pay_clicked:
-                    st.session_state[f"show_payment_dialog_{goal_id}"] = True
+                    if pay_clicked:
+                        st.session_state[f"show_payment_dialog_{goal_id}"] = True
                 
-                if st.session_state.get(f"show_payment_dialog_{goal_id}", False):
-                    remaining = target - current
-                    payment_amount = st.number_input(
-                        f"Payment amount (max ${remaining:,.2f})",
-                        min_value=0.01,
-                        step=10.0,
-                        format="%.2f",
-                        key=f"payment_input_{goal_id}"
-                    )
+                    if st.session_state.get(f"show_payment_dialog_{goal_id}", False):
+                        # One key per opened form, so a double-clicked submit is only applied once
+                        payment_key = st.session_state.setdefault(f"goal_payment_key_{goal_id}", uuid4().hex)
+                        remaining = target - current
+                        payment_amount = st.number_input(
+                            f"Payment amount (max ${remaining:,.2f})",
+                            min_value=0.01,
+                            step=10.0,
+                            format="%.2f",
+                            key=f"payment_input_{goal_id}"
+                        )
                     
-                    is_valid_amount = payment_amount <= remaining
+                        is_valid_amount = payment_amount <= remaining
                     
-                    col_submit, col_cancel = st.columns(2)
-                    with col_submit:
-                        submit_payment = st.button(
-                            "Submit Payment", 
-                            key=f"submit_payment_{goal_id}",
-                            use_container_width=True,
-                            disabled=not is_valid_amount
-                        )
-                    with col_cancel:
-                        cancel_payment = st.button(
-                            "Cancel", 
-                            key=f"cancel_payment_{goal_id}",
-                            use_container_width=True
-                        )
+                        col_submit, col_cancel = st.columns(2)
+                        with col_submit:
+                            submit_payment = st.button(
+                                "Submit Payment", 
+                                key=f"submit_payment_{goal_id}",
+                                use_container_width=True,
+                                disabled=not is_valid_amount
+                            )
+                        with col_cancel:
+                            cancel_payment = st.button(
+                                "Cancel", 
+                                key=f"cancel_payment_{goal_id}",
+                                use_container_width=True
+                            )
                     
-                    if submit_payment and is_valid_amount:
-                        success, message = pay_towards_goal(goal_id, household_info["household_id"], payment_amount, st.session_state.user_id)
-                        if success:
-                            st.success(message)
-                            get_savings_goals.clear()
-                            get_recent_transactions.clear()
-                            st.session_state[f"show_payment_dialog_{goal_id}"] = False
-                            st.rerun()
-                        else:
-                            st.error(message)
+                        if submit_payment and is_valid_amount:
+                            success, message = pay_towards_goal(
+                                goal_id,
+                                household_info["household_id"],
+                                payment_amount,
+                                st.session_state.user_id,
+                                idempotency_key=payment_key
+                            )
+                            if success:
+                                st.success(message)
+                                st.session_state.pop(f"goal_payment_key_{goal_id}", None)
+                                get_savings_goals.invalidate(household_info["household_id"])
+                                get_transaction_page.invalidate(household_info["household_id"])
+                                get_spending_rollup.invalidate(household_info["household_id"])
+                                st.session_state[f"show_payment_dialog_{goal_id}"] = False
+                                # Contributions also show up in Recent Transactions and Spending Overview: rerun the whole page
+                                st.rerun(scope="app")
+                            else:
+                                st.error(message)
                     
-                    if cancel_payment:
-                        st.session_state[f"show_payment_dialog_{goal_id}"] = False
-                        st.rerun()
+                        if cancel_payment:
+                            st.session_state[f"show_payment_dialog_{goal_id}"] = False
+                            st.session_state.pop(f"goal_payment_key_{goal_id}", None)
+                            st.rerun(scope="fragment")
                 
-                if delete_clicked:
-                    success = delete_savings_goal(goal_id, household_info["household_id"])
-                    if success:
-                        st.success("Savings goal deleted.")
-                        get_savings_goals.clear()
-                        st.rerun()
+                    if delete_clicked:
+                        success = delete_savings_goal(goal_id, household_info["household_id"])
+                        if success:
+                            st.success("Savings goal deleted.")
+                            get_savings_goals.invalidate(household_info["household_id"])
+                            st.rerun(scope="fragment")
 
-                st.markdown("<br>", unsafe_allow_html=True)
-else:
-    st.info("No savings goals set for this household")
+                    st.markdown("<br>", unsafe_allow_html=True)
+    else:
+        st.info("No savings goals set for this household")
 
-st.markdown("---")
+    st.markdown("---")
 
-# Toggle button for creating new savings goal (admin only)
-if 'show_create_goal_form' not in st.session_state:
-    st.session_state.show_create_goal_form = False
+    # Toggle button for creating new savings goal (admin only)
+    if 'show_create_goal_form' not in st.session_state:
+        st.session_state.show_create_goal_form = False
 
-if is_admin():
-    if st.button("➕ Create New Savings Goal", key="toggle_create_goal"):
-        st.session_state.show_create_goal_form = not st.session_state.show_create_goal_form
+    if is_admin():
+        if st.button("➕ Create New Savings Goal", key="toggle_create_goal"):
+            st.session_state.show_create_goal_form = not st.session_state.show_create_goal_form
 
-if st.session_state.show_create_goal_form and is_admin():
-    st.markdown("### Create a new savings goal")
+    if st.session_state.show_create_goal_form and is_admin():
+        st.markdown("### Create a new savings goal")
     
-    with st.form("create_savings_goal"):
-        new_goal_name = st.text_input("Goal name")
-        new_target_amount = st.number_input(
-            "Target amount ($)",
-            min_value=0.0,
-            step=10.0,
-            format="%.2f",
-        )
+        with st.form("create_savings_goal"):
+            new_goal_name = st.text_input("Goal name")
+            new_target_amount = st.number_input(
+                "Target amount ($)",
+                min_value=0.0,
+                step=10.0,
+                format="%.2f",
+            )
 
-        col_submit, col_cancel = st.columns(2)
-        with col_submit:
-            create_submitted = st.form_submit_button("Create goal", use_container_width=True)
-        with col_cancel:
-            cancel_create = st.form_submit_button("Cancel", use_container_width=True)
+            col_submit, col_cancel = st.columns(2)
+            with col_submit:
+                create_submitted = st.form_submit_button("Create goal", use_container_width=True)
+            with col_cancel:
+                cancel_create = st.form_submit_button("Cancel", use_container_width=True)
     
-    if create_submitted:
-        if not new_goal_name or new_target_amount <= 0:
-            st.error("Please enter a goal name and a positive target amount.")
-        else:
-            conn = get_database_connection()
-            if conn is None:
-                st.error("Could not connect to database to create goal.")
+        if create_submitted:
+            if not new_goal_name or new_target_amount <= 0:
+                st.error("Please enter a goal name and a positive target amount.")
             else:
-                try:
-                    cursor = conn.cursor()
-                    insert_query = """
-                        INSERT INTO SavingsGoals (household_id, name, target_amount, current_amount)
-                        VALUES (%s, %s, %s, %s);
-                    """
-                    cursor.execute(
-                        insert_query,
-                        (int(household_info["household_id"]), new_goal_name, float(new_target_amount), 0.0),
-                    )
-                    conn.commit()
-                    cursor.close()
+                success = create_savings_goal(household_info["household_id"], new_goal_name, new_target_amount)
+                if success:
                     st.success("Savings goal created successfully.")
-                    get_savings_goals.clear()
+                    get_savings_goals.invalidate(household_info["household_id"])
                     st.session_state.show_create_goal_form = False
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Error creating savings goal: {e}")
+                    st.rerun(scope="fragment")
     
-    if cancel_create:
-        st.session_state.show_create_goal_form = False
-        st.rerun()
+        if cancel_create:
+            st.session_state.show_create_goal_form = False
+            st.rerun(scope="fragment")
+
+    st.markdown("<br>", unsafe_allow_html=True)
 
-st.markdown("<br>", unsafe_allow_html=True)
+
+render_savings_goals()
 
 
 # ============================================================
 # UPCOMING BILLS SECTION
 # ============================================================
 
-check_and_update_overdue_bills(household_info['household_id'])
-st.markdown('<h4 style="color: white;">Upcoming Bills</h4>', unsafe_allow_html=True)
-bills_df = get_upcoming_bills(household_info['household_id'])
+@section_fragment("Bills")
+def render_bills():
+    st.markdown('<h4 style="color: white;">Upcoming Bills</h4>', unsafe_allow_html=True)
+    bills_df = get_upcoming_bills(household_info['household_id'])
 
-if not bills_df.empty:
-    bills_cols = st.columns(3)
+    if not bills_df.empty:
+        bills_cols = st.columns(3)
     
-    for idx, row in bills_df.iterrows():
-        col_idx = idx % 3
-        with bills_cols[col_idx]:
-            with st.container():
-                bill_id = int(row["bill_id"])
-                st.markdown(f"**{row['name']}**")
+        for idx, row in bills_df.iterrows():
+            col_idx = idx % 3
+            with bills_cols[col_idx]:
+                with st.container():
+                    bill_id = int(row["bill_id"])
+                    st.markdown(f"**{row['name']}**")
                 
-                amount = float(row['amount'])
-                due_date = row['due_date']
-                status = row['status']
+                    amount = float(row['amount'])
+                    due_date = row['due_date']
+                    status = row['status']
                 
-                col_a, col_b = st.columns(2)
-                with col_a:
-                    st.metric("Amount", f"${amount:,.2f}")
-                with col_b:
-                    status_class = f"status-{status}"
-                    st.markdown(f'<div style="padding-top: 10px;"><span class="{status_class}">{status.upper()}</span></div>', unsafe_allow_html=True)
+                    col_a, col_b = st.columns(2)
+                    with col_a:
+                        st.metric("Amount", f"${amount:,.2f}")
+                    with col_b:
+                        status_class = f"status-{status}"
+                        st.markdown(f'<div style="padding-top: 10px;"><span class="{status_class}">{status.upper()}</span></div>', unsafe_allow_html=True)
                 
-                st.caption(f"Due: {due_date.strftime('%b %d, %Y')}")
+                    st.caption(f"Due: {due_date.strftime('%b %d, %Y')}")
                 
-                if st.button(
-                    "Manage",
-                    key=f"manage_bill_{bill_id}",
-                    use_container_width=True
-                ):
-                    open_bill_action(bill_id, row['name'], amount)
-
-                st.markdown("<br>", unsafe_allow_html=True)
-else:
-    st.info("No upcoming bills found")
+                    if st.button(
+                        "Manage",
+                        key=f"manage_bill_{bill_id}",
+                        use_container_width=True
+                    ):
+                        open_bill_action(bill_id, row['name'], amount)
+
+                    st.markdown("<br>", unsafe_allow_html=True)
+    else:
+        st.info("No upcoming bills found")
 
-st.markdown("---")
+    st.markdown("---")
 
-# Toggle button for creating new bill (admin only)
-if 'show_create_bill_form' not in st.session_state:
-    st.session_state.show_create_bill_form = False
+    # Toggle button for creating new bill (admin only)
+    if 'show_create_bill_form' not in st.session_state:
+        st.session_state.show_create_bill_form = False
 
-if is_admin():
-    if st.button("➕ Create New Bill", key="toggle_create_bill"):
-        st.session_state.show_create_bill_form = not st.session_state.show_create_bill_form
+    if is_admin():
+        if st.button("➕ Create New Bill", key="toggle_create_bill"):
+            st.session_state.show_create_bill_form = not st.session_state.show_create_bill_form
 
-if st.session_state.show_create_bill_form and is_admin():
-    st.markdown("### Create a new bill")
+    if st.session_state.show_create_bill_form and is_admin():
+        st.markdown("### Create a new bill")
     
-    with st.form("create_bill_form"):
-        col1, col2 = st.columns(2)
-        with col1:
-            bill_name = st.text_input("Bill Name", placeholder="e.g. Internet, Rent")
-        with col2:
-            bill_amount = st.number_input("Amount ($)", min_value=0.0, step=0.01)
+        with st.form("create_bill_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                bill_name = st.text_input("Bill Name", placeholder="e.g. Internet, Rent")
+            with col2:
+                bill_amount = st.number_input("Amount ($)", min_value=0.0, step=0.01)
         
-        bill_due_date = st.date_input("Due Date")
+            bill_due_date = st.date_input("Due Date")
         
-        col_submit, col_cancel = st.columns(2)
-        with col_submit:
-            bill_submitted = st.form_submit_button("Create Bill", use_container_width=True)
-        with col_cancel:
-            cancel_bill = st.form_submit_button("Cancel", use_container_width=True)
+            col_submit, col_cancel = st.columns(2)
+            with col_submit:
+                bill_submitted = st.form_submit_button("Create Bill", use_container_width=True)
+            with col_cancel:
+                cancel_bill = st.form_submit_button("Cancel", use_container_width=True)
     
-    if bill_submitted:
-        if bill_name and bill_amount > 0:
-            success = create_bill(household_info['household_id'], bill_name, bill_amount, bill_due_date)
-            if success:
-                st.success("Bill created successfully!")
-                get_upcoming_bills.clear()
-                st.session_state.show_create_bill_form = False
-                st.rerun()
-        else:
-            st.warning("Please enter a valid name and amount.")
+        if bill_submitted:
+            if bill_name and bill_amount > 0:
+                success = create_bill(household_info['household_id'], bill_name, bill_amount, bill_due_date)
+                if success:
+                    st.success("Bill created successfully!")
+                    get_upcoming_bills.invalidate(household_info['household_id'])
+                    st.session_state.show_create_bill_form = False
+                    st.rerun(scope="fragment")
+            else:
+                st.warning("Please enter a valid name and amount.")
     
-    if cancel_bill:
-        st.session_state.show_create_bill_form = False
-        st.rerun()
+        if cancel_bill:
+            st.session_state.show_create_bill_form = False
+            st.rerun(scope="fragment")
+
+    st.markdown("<br>", unsafe_allow_html=True)
 
-st.markdown("<br>", unsafe_allow_html=True)
+
+render_bills()
 
 
 # ============================================================
 # CATEGORY MANAGEMENT SECTION
 # ============================================================
 
-st.markdown('<h4 style="color: white;">Manage Categories</h4>', unsafe_allow_html=True)
-
-categories_df = get_categories(household_info['household_id'])
+@section_fragment("Categories")
+def render_categories():
+    st.markdown('<h4 style="color: white;">Manage Categories</h4>', unsafe_allow_html=True)
 
-# Display existing categories (only shared type)
-with st.expander("📁 View All Categories", expanded=False):
-    if not categories_df.empty:
-        # Filter to only show shared categories
-        shared_categories = categories_df[categories_df['type'] == 'shared']
+    # Display existing categories (only shared type)
+    with lazy_expander("📁 View All Categories", key="load_categories", load_label="Show categories") as loaded:
+        if loaded:
+            categories_df = get_categories(household_info['household_id'])
+            if not categories_df.empty:
+                # Filter to only show shared categories
+                shared_categories = categories_df[categories_df['type'] == 'shared']
         
-        if not shared_categories.empty:
-            st.markdown(f"<span style='color: black; font-weight: bold;'>Shared Categories</span>", unsafe_allow_html=True)
-            for idx, row in shared_categories.iterrows():
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    st.markdown(f"<span style='color: black;'>• {row['name']}</span>", unsafe_allow_html=True)
-                with col2:
-                    if is_admin():
-                        if st.button("🗑️", key=f"delete_cat_{row['category_id']}", help="Delete category"):
-                            if delete_category(row['category_id'], household_info['household_id']):
-                                st.success(f"Deleted category: {row['name']}")
-                                get_categories.clear()
-                                st.rerun()
-        else:
-            st.info("No shared categories found for this household")
-    else:
-        st.info("No categories found for this household")
+                if not shared_categories.empty:
+                    st.markdown(f"<span style='color: black; font-weight: bold;'>Shared Categories</span>", unsafe_allow_html=True)
+                    for idx, row in shared_categories.iterrows():
+                        col1, col2 = st.columns([4, 1])
+                        with col1:
+                            st.markdown(f"<span style='color: black;'>• {row['name']}</span>", unsafe_allow_html=True)
+                        with col2:
+                            if is_admin():
+                                if st.button("🗑️", key=f"delete_cat_{row['category_id']}", help="Delete category"):
+                                    if delete_category(row['category_id'], household_info['household_id']):
+                                        st.success(f"Deleted category: {row['name']}")
+                                        get_categories.invalidate(household_info['household_id'])
+                                        # The payment form's category list changes too: rerun the whole page
+                                        st.rerun(scope="app")
+                else:
+                    st.info("No shared categories found for this household")
+            else:
+                st.info("No categories found for this household")
 
-# Toggle button for creating new category (admin only)
-if 'show_create_category_form' not in st.session_state:
-    st.session_state.show_create_category_form = False
+    # Toggle button for creating new category (admin only)
+    if 'show_create_category_form' not in st.session_state:
+        st.session_state.show_create_category_form = False
 
-if is_admin():
-    if st.button("➕ Create New Category", key="toggle_create_category"):
-        st.session_state.show_create_category_form = not st.session_state.show_create_category_form
+    if is_admin():
+        if st.button("➕ Create New Category", key="toggle_create_category"):
+            st.session_state.show_create_category_form = not st.session_state.show_create_category_form
 
-if st.session_state.show_create_category_form and is_admin():
-    st.markdown("### Create a new shared category")
+    if st.session_state.show_create_category_form and is_admin():
+        st.markdown("### Create a new shared category")
     
-    with st.form("create_category_form"):
-        category_name = st.text_input("Category Name", placeholder="e.g. Groceries, Transportation, Entertainment")
-        st.caption("This category will be available for user-to-user payments and shared expenses")
+        with st.form("create_category_form"):
+            category_name = st.text_input("Category Name", placeholder="e.g. Groceries, Transportation, Entertainment")
+            st.caption("This category will be available for user-to-user payments and shared expenses")
         
-        col_submit, col_cancel = st.columns(2)
-        with col_submit:
-            category_submitted = st.form_submit_button("Create Category", use_container_width=True)
-        with col_cancel:
-            cancel_category = st.form_submit_button("Cancel", use_container_width=True)
+            col_submit, col_cancel = st.columns(2)
+            with col_submit:
+                category_submitted = st.form_submit_button("Create Category", use_container_width=True)
+            with col_cancel:
+                cancel_category = st.form_submit_button("Cancel", use_container_width=True)
     
-    if category_submitted:
-        if category_name:
-            # Always create as 'shared' type
-            success = create_category(household_info['household_id'], category_name, 'shared')
-            if success:
-                st.success(f"Shared category '{category_name}' created successfully!")
-                get_categories.clear()
-                st.session_state.show_create_category_form = False
-                st.rerun()
-        else:
-            st.warning("Please enter a category name.")
+        if category_submitted:
+            if category_name:
+                # Always create as 'shared' type
+                success = create_category(household_info['household_id'], category_name, 'shared')
+                if success:
+                    st.success(f"Shared category '{category_name}' created successfully!")
+                    get_categories.invalidate(household_info['household_id'])
+                    st.session_state.show_create_category_form = False
+                    # The payment form's category list changes too: rerun the whole page
+                    st.rerun(scope="app")
+            else:
+                st.warning("Please enter a category name.")
     
-    if cancel_category:
-        st.session_state.show_create_category_form = False
-        st.rerun()
+        if cancel_category:
+            st.session_state.show_create_category_form = False
+            st.rerun(scope="fragment")
+
+
+render_categories()
+
+
+# ============================================================
+# PERFORMANCE PROFILE
+# ============================================================
+
+# Reruns that end early (st.stop/st.rerun) keep the previous profile
+st.session_state.last_rerun_profile = rerun_profile.finish()
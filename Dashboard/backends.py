@@ -0,0 +1,447 @@
+"""
+Database Backends for HomeBase Dashboard
+This module hides the database engine behind a small backend interface so the same
+crud.py queries run against MySQL in production and against an embedded SQLite
+file (loaded from Homebase_SQL.sql) for local runs, benchmarks and load tests.
+
+Queries are written once, MySQL style, with %s placeholders. Each backend creates
+the pooled SQLAlchemy engine, wraps the DBAPI connections it hands out and builds
+the few statements whose syntax differs between engines (upserts, EXPLAIN).
+"""
+
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+import streamlit as st
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL
+from sqlalchemy.pool import StaticPool
+
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCHEMA_FILE = os.path.join(ROOT_DIR, 'Homebase_SQL.sql')
+
+
+# ============================================================
+# SQL SCRIPT PARSING
+# ============================================================
+
+def split_sql_statements(sql_text):
+    """Split a SQL script into (label, statement) pairs.
+
+    The label is the first line of the last '--' comment block seen before the
+    statement, which is how Dashboard_SQL_Queries.sql names its queries.
+    Block comments are dropped.
+    """
+    sql_text = re.sub(r'/\*.*?(\*/|$)', '', sql_text, flags=re.DOTALL)
+
+    statements = []
+    label = None
+    in_comment_block = False
+    buffer = []
+    for line in sql_text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('--') or stripped.startswith('#'):
+            comment = stripped.lstrip('-#').strip()
+            if comment and not comment.startswith('===') and not in_comment_block:
+                label = comment
+                in_comment_block = True
+            continue
+        in_comment_block = False
+
+        buffer.append(line)
+        if stripped.endswith(';'):
+            statement = '\n'.join(buffer).strip().rstrip(';').strip()
+            if statement:
+                statements.append((label, statement))
+            buffer = []
+
+    trailing = '\n'.join(buffer).strip()
+    if trailing:
+        statements.append((label, trailing))
+    return statements
+
+
+# ============================================================
+# MYSQL
+# ============================================================
+
+class MySQLBackend:
+    """Production backend: a pooled mysql-connector engine. Queries run unchanged."""
+
+    name = "mysql"
+
+    # Each pooled connection is independent, so reads can run in parallel threads
+    concurrent_reads = True
+
+    def __init__(self, host, user, password, database, port=3306,
+                 pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=1800):
+        if not all([host, user, password, database]):
+            raise ValueError(
+                "Database credentials missing. Please set st.secrets['mysql'] with host, user, password, and database."
+            )
+        self.url = URL.create(
+            "mysql+mysqlconnector",
+            username=user,
+            password=password,
+            host=host,
+            port=int(port),
+            database=database
+        )
+        self.pool_size = int(pool_size)
+        self.max_overflow = int(max_overflow)
+        self.pool_timeout = float(pool_timeout)
+        self.pool_recycle = int(pool_recycle)
+
+    @classmethod
+    def from_settings(cls, creds):
+        """Build the backend from the st.secrets['mysql'] section."""
+        return cls(
+            host=creds.get("host"),
+            user=creds.get("user"),
+            password=creds.get("password"),
+            database=creds.get("database"),
+            port=creds.get("port") or 3306,
+            pool_size=creds.get("pool_size", 10),
+            max_overflow=creds.get("max_overflow", 20),
+            pool_timeout=creds.get("pool_timeout", 30),
+            pool_recycle=creds.get("pool_recycle", 1800)
+        )
+
+    def create_engine(self):
+        """Create the QueuePool engine; every checkout is pinged so stale connections are replaced."""
+        return create_engine(
+            self.url,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+            pool_pre_ping=True
+        )
+
+    def wrap(self, conn):
+        return conn
+
+    def streaming_cursor(self, conn):
+        """Unbuffered cursor: fetchmany() pulls rows from the server as they are read."""
+        return conn.cursor(buffered=False)
+
+    def upsert_sql(self, table, columns, key_columns, add_columns):
+        """INSERT one row, or add add_columns onto the row that already has the same key."""
+        updates = ", ".join(f"{col} = {col} + VALUES({col})" for col in add_columns)
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {updates}"
+        )
+
+    @property
+    def integrity_error(self):
+        """DBAPI exception raised when an INSERT breaks a unique or foreign key."""
+        from mysql.connector.errors import IntegrityError
+        return IntegrityError
+
+    def insert_ignore_sql(self, table, columns):
+        """INSERT one row unless one with the same unique key exists (rowcount is then 0)."""
+        return f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+    def upsert_id(self, cursor, table, columns, id_column, params):
+        """INSERT one row unless its unique key exists; return the new or existing row's id."""
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {id_column} = LAST_INSERT_ID({id_column})",
+            params
+        )
+        return cursor.lastrowid
+
+    def explain(self, cursor, statement, params):
+        """Return one dict per table access with table, type, key, rows and full_scan."""
+        cursor.execute("EXPLAIN " + statement, params)
+        columns = [col[0] for col in cursor.description]
+        plans = []
+        for row in cursor.fetchall():
+            plan = dict(zip(columns, row))
+            plans.append({
+                "table": plan.get('table'),
+                "type": plan.get('type'),
+                "key": plan.get('key'),
+                "rows": plan.get('rows'),
+                "full_scan": plan.get('type') == 'ALL'
+            })
+        return plans
+
+
+# ============================================================
+# SQLITE
+# ============================================================
+
+def _register_sqlite_types():
+    """Make sqlite3 read and write the same Python types mysql-connector does."""
+    sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+    sqlite3.register_adapter(date, lambda value: value.isoformat())
+    sqlite3.register_adapter(Decimal, float)
+    sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+    sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+    sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()))
+    sqlite3.register_converter("BOOLEAN", lambda value: bool(int(value)))
+
+
+class SQLiteCursor:
+    """sqlite3 cursor that accepts the MySQL-style SQL used throughout crud.py."""
+
+    def __init__(self, cursor, backend):
+        self._cursor = cursor
+        self._backend = backend
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(self._backend.translate(query), params or ())
+
+    def executemany(self, query, seq_of_params):
+        return self._cursor.executemany(self._backend.translate(query), seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SQLiteConnection:
+    """Pooled sqlite3 connection whose cursors translate MySQL-style SQL."""
+
+    def __init__(self, conn, backend):
+        self._conn = conn
+        self._backend = backend
+
+    def cursor(self):
+        return SQLiteCursor(self._conn.cursor(), self._backend)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SQLiteBackend:
+    """Embedded backend for local runs, benchmarks and load tests; no server needed.
+
+    A new database file is created from the CREATE/INSERT statements in
+    Homebase_SQL.sql (the demo UPDATE/DELETE/SELECT statements are skipped) and
+    then brought up to date with the /migrations files. path=':memory:' keeps the
+    whole database in one shared in-memory connection.
+    """
+
+    name = "sqlite"
+
+    # MySQL syntax -> SQLite syntax, applied to every statement
+    TRANSLATIONS = [
+        (re.compile(r'%s'), '?'),
+        (re.compile(r'\bNOW\(\)', re.IGNORECASE), "datetime('now', 'localtime')"),
+        (re.compile(r'\bCURDATE\(\)|\bCURRENT_DATE\b', re.IGNORECASE), "date('now', 'localtime')"),
+        (re.compile(r'\bDROP INDEX (\w+) ON \w+', re.IGNORECASE), r'DROP INDEX \1'),
+    ]
+
+    # Extra rewrites for the CREATE TABLE statements in Homebase_SQL.sql
+    SCHEMA_TRANSLATIONS = [
+        (re.compile(r'\bINT AUTO_INCREMENT PRIMARY KEY', re.IGNORECASE), 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+        (re.compile(r'\b(\w+) ENUM\(([^)]*)\)', re.IGNORECASE), r'\1 TEXT CHECK (\1 IN (\2))'),
+        (re.compile(r'\bDEFAULT CURRENT_TIMESTAMP', re.IGNORECASE), "DEFAULT (datetime('now', 'localtime'))"),
+    ]
+
+    SCHEMA_STATEMENTS = re.compile(r'^(CREATE\s+(TABLE|INDEX|VIEW)|INSERT)\b', re.IGNORECASE)
+
+    @property
+    def concurrent_reads(self):
+        """False for ':memory:', where every thread would share one sqlite3 connection."""
+        return self.path != ":memory:"
+
+    def __init__(self, path="homebase.db", sample_data=True, timeout=30):
+        self.path = path
+        self.sample_data = sample_data
+        self.timeout = float(timeout)
+        self._translated = {}
+        _register_sqlite_types()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build the backend from the st.secrets['sqlite'] section."""
+        return cls(
+            path=settings.get("path", "homebase.db"),
+            sample_data=bool(settings.get("sample_data", True)),
+            timeout=settings.get("timeout", 30)
+        )
+
+    def create_engine(self):
+        """Create the engine, creating and migrating the database file on first use.
+
+        Connections use WAL journaling and a busy timeout so the sweeper thread and
+        concurrent sessions wait for each other's write locks instead of failing.
+        """
+        in_memory = self.path == ":memory:"
+        engine = create_engine(
+            "sqlite://" if in_memory else f"sqlite:///{self.path}",
+            connect_args={
+                "check_same_thread": False,
+                "timeout": self.timeout,
+                "detect_types": sqlite3.PARSE_DECLTYPES
+            },
+            poolclass=StaticPool if in_memory else None
+        )
+
+        @event.listens_for(engine, "connect")
+        def _configure(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA foreign_keys = ON")
+            if not in_memory:
+                dbapi_connection.execute("PRAGMA journal_mode = WAL")
+
+        conn = self.wrap(engine.raw_connection())
+        try:
+            if not self._has_schema(conn):
+                self.bootstrap(conn)
+        finally:
+            conn.close()
+        return engine
+
+    def wrap(self, conn):
+        return SQLiteConnection(conn, self)
+
+    def translate(self, query, schema=False):
+        """Rewrite one MySQL-style statement for SQLite (results are memoized)."""
+        key = (query, schema)
+        translated = self._translated.get(key)
+        if translated is None:
+            translated = query
+            for pattern, replacement in self.TRANSLATIONS + (self.SCHEMA_TRANSLATIONS if schema else []):
+                translated = pattern.sub(replacement, translated)
+            self._translated[key] = translated
+        return translated
+
+    def streaming_cursor(self, conn):
+        """sqlite3 cursors already step through results as fetchmany() reads them."""
+        return conn.cursor()
+
+    def upsert_sql(self, table, columns, key_columns, add_columns):
+        """INSERT one row, or add add_columns onto the row that already has the same key."""
+        updates = ", ".join(f"{col} = {col} + excluded.{col}" for col in add_columns)
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates}"
+        )
+
+    # DBAPI exception raised when an INSERT breaks a unique or foreign key
+    integrity_error = sqlite3.IntegrityError
+
+    def insert_ignore_sql(self, table, columns):
+        """INSERT one row unless one with the same unique key exists (rowcount is then 0)."""
+        return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+    def upsert_id(self, cursor, table, columns, id_column, params):
+        """INSERT one row unless its unique key exists; return the new or existing row's id."""
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT DO UPDATE SET {id_column} = {id_column} RETURNING {id_column}",
+            params
+        )
+        return cursor.fetchone()[0]
+
+    def explain(self, cursor, statement, params):
+        """Return one dict per table access with table, type, key, rows and full_scan."""
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, params)
+        plans = []
+        for row in cursor.fetchall():
+            detail = row[-1]
+            match = re.match(r'^(SCAN|SEARCH) (\w+)(?: USING (?:(?:COVERING )?INDEX (\w+)|(INTEGER PRIMARY KEY)))?', detail)
+            if not match or detail.startswith('SCAN CONSTANT ROW'):
+                continue
+            access_type, table, key, primary = match.groups()
+            key = 'PRIMARY' if primary else key
+            plans.append({
+                "table": table,
+                "type": access_type,
+                "key": key,
+                "rows": None,
+                "full_scan": access_type == 'SCAN' and key is None
+            })
+        return plans
+
+    # ------------------------------------------------------------
+    # Bootstrap
+    # ------------------------------------------------------------
+
+    def _has_schema(self, conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'Users'")
+        found = cursor.fetchone()[0] > 0
+        cursor.close()
+        return found
+
+    def _foreign_key_indexes(self, statement):
+        """MySQL (InnoDB) indexes every FOREIGN KEY column automatically; SQLite does not."""
+        table = re.match(r'^CREATE\s+TABLE\s+(\w+)', statement, re.IGNORECASE)
+        if not table:
+            return []
+        table = table.group(1)
+        return [
+            f"CREATE INDEX IF NOT EXISTS fk_{table.lower()}_{column} ON {table} ({column})"
+            for column in re.findall(r'FOREIGN KEY \((\w+)\)', statement, re.IGNORECASE)
+        ]
+
+    def load_schema(self, conn, path=SCHEMA_FILE):
+        """Run the schema (and, if sample_data, the mock data) from Homebase_SQL.sql."""
+        with open(path, encoding='utf-8') as f:
+            statements = split_sql_statements(f.read())
+
+        cursor = conn.cursor()
+        for _, statement in statements:
+            if not self.SCHEMA_STATEMENTS.match(statement):
+                continue
+            if statement.upper().startswith('INSERT') and not self.sample_data:
+                continue
+            cursor.execute(self.translate(statement, schema=True))
+            for index in self._foreign_key_indexes(statement):
+                cursor.execute(index)
+        conn.commit()
+        cursor.close()
+
+    def bootstrap(self, conn):
+        """Create a fresh database: schema, migrations, category_key backfill and rollup."""
+        # migrate.py imports crud.py, which imports this module, so import it lazily
+        from migrate import apply_migrations, backfill_category_keys, rebuild_daily_spending
+
+        self.load_schema(conn)
+        apply_migrations(conn=conn)
+        backfill_category_keys(conn=conn)
+        rebuild_daily_spending(conn=conn)
+
+
+# ============================================================
+# BACKEND SELECTION
+# ============================================================
+
+BACKENDS = {
+    MySQLBackend.name: MySQLBackend,
+    SQLiteBackend.name: SQLiteBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """Return the active backend, chosen by st.secrets['database']['backend'] (default mysql)."""
+    global _backend
+    if _backend is None:
+        name = st.secrets.get("database", {}).get("backend", MySQLBackend.name)
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown database backend '{name}'. Expected one of: {', '.join(BACKENDS)}")
+        _backend = BACKENDS[name].from_settings(st.secrets.get(name, {}))
+    return _backend
+
+
+def set_backend(backend):
+    """Override the configured backend, e.g. SQLiteBackend(path) in benchmark scripts.
+
+    Must be called before the first database connection is opened, since the
+    engine is created once and then cached for the life of the process.
+    """
+    global _backend
+    _backend = backend
@@ -0,0 +1,203 @@
+"""
+Benchmark Suite for HomeBase Dashboard
+This module times every read function in crud.py against synthetic data sets of
+increasing size and stores the results as JSON so runs can be compared across commits.
+
+Usage (run from the Dashboard folder so .streamlit/secrets.toml is found):
+    python benchmark.py --sizes 10000 100000 1000000
+    python benchmark.py --sqlite bench.db --sizes 10000 100000   (no MySQL server needed)
+    python benchmark.py --compare ../benchmark_results/old.json ../benchmark_results/new.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from backends import SQLiteBackend, set_backend
+from crud import (
+    get_user_info, get_all_users, get_household_info, get_all_households,
+    get_household_members, user_has_household, get_upcoming_bills,
+    get_transaction_page, get_spending_rollup, get_spending_data,
+    get_user_spending_data, get_categories, get_user_debt_settlements,
+    get_savings_goals
+)
+from seed_data import SyntheticDataGenerator
+
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmark_results')
+DEEP_PAGE = 10
+
+
+def _row_count(result):
+    """Best-effort row count for a crud return value."""
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    return 0 if result is None else 1
+
+
+def _deep_page_cursor(household_id, pages=DEEP_PAGE):
+    """Walk the transaction history to find the cursor of page number `pages`."""
+    cursor = None
+    for _ in range(pages - 1):
+        _, next_cursor = get_transaction_page(household_id, cursor)
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+    return cursor
+
+
+def benchmark_cases(household_id, user_id):
+    """Return (name, call, clear) for every crud read; clear() makes the next call cold."""
+    deep_cursor = _deep_page_cursor(household_id)
+    return [
+        ("get_user_info", lambda: get_user_info(user_id), get_user_info.clear),
+        ("get_all_users", lambda: get_all_users('admin'), get_all_users.clear),
+        ("get_household_info", lambda: get_household_info(user_id), get_household_info.clear),
+        ("get_all_households", get_all_households, get_all_households.clear),
+        ("get_household_members", lambda: get_household_members(household_id), get_household_members.clear),
+        ("user_has_household", lambda: user_has_household(user_id), None),
+        ("get_upcoming_bills", lambda: get_upcoming_bills(household_id), get_upcoming_bills.clear),
+        ("get_transaction_page (first)", lambda: get_transaction_page(household_id), get_transaction_page.clear),
+        (f"get_transaction_page (page {DEEP_PAGE})", lambda: get_transaction_page(household_id, deep_cursor), get_transaction_page.clear),
+        ("get_transaction_page (member filter)", lambda: get_transaction_page(household_id, user_id=user_id), get_transaction_page.clear),
+        ("get_spending_rollup", lambda: get_spending_rollup(household_id), get_spending_rollup.clear),
+        ("get_spending_data (cold)", lambda: get_spending_data(household_id, user_id, 30), get_spending_rollup.clear),
+        ("get_spending_data (warm rollup)", lambda: get_spending_data(household_id, user_id, 30), None),
+        ("get_user_spending_data (warm rollup)", lambda: get_user_spending_data(household_id, user_id, 90), None),
+        ("get_categories", lambda: get_categories(household_id), get_categories.clear),
+        ("get_user_debt_settlements", lambda: get_user_debt_settlements(household_id, user_id), get_user_debt_settlements.clear),
+        ("get_savings_goals", lambda: get_savings_goals(household_id), get_savings_goals.clear),
+    ]
+
+
+def time_case(call, clear, repeat):
+    """Run call() repeat times (after a warm-up) and return timing stats in milliseconds."""
+    call()
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        if clear is not None:
+            clear()
+        started = time.perf_counter()
+        result = call()
+        timings.append((time.perf_counter() - started) * 1000)
+        rows = _row_count(result)
+
+    timings.sort()
+    return {
+        "runs": repeat,
+        "rows": rows,
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(timings), 3)
+    }
+
+
+def run_benchmarks(sizes, households=10, members=5, repeat=5, seed=42, tag="benchmark"):
+    """Seed each size in turn (growing one data set) and time every case at each size."""
+    generator = SyntheticDataGenerator(seed, tag)
+    results = []
+    for size in sorted(sizes):
+        started = time.perf_counter()
+        summary = generator.seed(households=households, members=members, transactions=size)
+        print(f"[{size:,} transactions] seeded in {time.perf_counter() - started:.1f}s")
+
+        household_id = summary["household_ids"][0]
+        user_id = summary["members_by_household"][household_id][0]
+        for name, call, clear in benchmark_cases(household_id, user_id):
+            stats = time_case(call, clear, repeat)
+            results.append({"size": size, "function": name, **stats})
+            print(f"  {name:<40} median {stats['median_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  rows {stats['rows']}")
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(results, config, path=None):
+    """Write results plus run metadata to JSON and return the path."""
+    commit = current_commit()
+    timestamp = datetime.now()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{timestamp:%Y%m%d-%H%M%S}-{commit}.json")
+
+    with open(path, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": timestamp.isoformat(timespec="seconds"),
+            "config": config,
+            "results": results
+        }, f, indent=2)
+    return path
+
+
+def compare_results(old_path, new_path):
+    """Print the median change per (size, function) between two result files."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    old_medians = {(r["size"], r["function"]): r["median_ms"] for r in old["results"]}
+    print(f"{old['commit']} -> {new['commit']}")
+    for r in new["results"]:
+        before = old_medians.get((r["size"], r["function"]))
+        if before is None:
+            continue
+        change = (r["median_ms"] - before) / before * 100 if before else 0.0
+        print(f"[{r['size']:,}] {r['function']:<40} {before:>9.2f} -> {r['median_ms']:>9.2f} ms ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HomeBase crud reads.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="total transactions in the benchmark data set at each step")
+    parser.add_argument('--households', type=int, default=10)
+    parser.add_argument('--members', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tag', default="benchmark")
+    parser.add_argument('--output', help="results file (default: benchmark_results/<time>-<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two results files")
+    parser.add_argument('--sqlite', metavar='PATH', help="benchmark an embedded SQLite database instead of MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        set_backend(SQLiteBackend(args.sqlite, sample_data=False))
+
+    if args.compare:
+        compare_results(*args.compare)
+        return 0
+
+    config = {
+        "sizes": sorted(args.sizes),
+        "households": args.households,
+        "members": args.members,
+        "repeat": args.repeat,
+        "seed": args.seed
+    }
+    results = run_benchmarks(args.sizes, args.households, args.members, args.repeat, args.seed, args.tag)
+    print(f"Results written to {save_results(results, config, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Household-Scoped Cache for HomeBase Dashboard
+This module caches read results per household (and per user where relevant) so that
+write paths can invalidate only the households they touch instead of clearing every
+cached result on the server.
+"""
+
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+
+import pandas as pd
+
+
+def memory_size(value):
+    """Approximate bytes held by a cached value (deep for DataFrames, Series and tuples of them)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(memory_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class HouseholdCache:
+    """Process-wide TTL + LRU cache whose entries are indexed by household_id.
+
+    Keys are (function name, household_id, user_id, args). Entries are shared by every
+    session on the server, like st.cache_data, but the returned objects are not copied,
+    so callers must not modify cached DataFrames in place. Each entry's memory_size is
+    measured when it is stored, so stats() can report memory per function.
+
+    When a version_source is set (crud registers the HouseholdVersion stamp), each entry
+    remembers the household version it was fetched at and goes stale as soon as the
+    stamp moves. The stamp itself is re-read at most every version_check_seconds.
+    """
+
+    def __init__(self, max_entries=5000, version_check_seconds=2.0):
+        self.max_entries = max_entries
+        self.version_check_seconds = version_check_seconds
+        self.version_source = None
+        self._entries = OrderedDict()
+        self._by_household = {}
+        self._versions = {}
+        self._by_function = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    def household_version(self, household_id, refresh=False):
+        """Return household_id's version stamp, or None if no version_source is set."""
+        if self.version_source is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            checked = self._versions.get(household_id)
+        if checked is not None and not refresh and now - checked[0] < self.version_check_seconds:
+            return checked[1]
+
+        version = self.version_source(household_id)
+        with self._lock:
+            self._versions[household_id] = (now, version)
+        return version
+
+    def remember_version(self, household_id, version):
+        """Record a stamp read alongside other rows, so the next check needs no query."""
+        with self._lock:
+            self._versions[int(household_id)] = (time.monotonic(), version)
+
+    def forget_version(self, household_id):
+        """Make the next read re-check household_id's stamp (this process just committed a write to it)."""
+        with self._lock:
+            self._versions.pop(int(household_id), None)
+
+    def get(self, key, version=None):
+        """Return (True, value) for a live entry fetched at version, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, entry_version, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return False, None
+
+            if entry_version != version:
+                self._remove(key)
+                self.stale += 1
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value, ttl, version=None):
+        """Store value under key for ttl seconds, evicting the least recently used entries if full."""
+        size = memory_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, version, value, size)
+            self._by_household.setdefault(key[1], set()).add(key)
+            usage = self._by_function.setdefault(key[0], [0, 0])
+            usage[0] += 1
+            usage[1] += size
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, household_id, *function_names, user_ids=None):
+        """Drop cached entries for one household.
+
+        If function_names are given only those functions are dropped. If user_ids is given,
+        entries scoped to other users are kept; household-wide entries are always dropped.
+        """
+        household_id = int(household_id)
+        if user_ids is not None:
+            user_ids = {int(u) for u in user_ids}
+
+        with self._lock:
+            keys = self._by_household.get(household_id, set())
+            stale = [
+                key for key in keys
+                if (not function_names or key[0] in function_names)
+                and (user_ids is None or key[2] is None or key[2] in user_ids)
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self, *function_names):
+        """Drop every entry (or every entry of the given functions) for all households."""
+        with self._lock:
+            stale = [key for key in self._entries if not function_names or key[0] in function_names]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current hit ratio."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "households": len(self._by_household),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale": self.stale,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "bytes": sum(usage[1] for usage in self._by_function.values())
+            }
+
+    def memory_by_function(self):
+        """Return {function name: {"entries": n, "bytes": b}} for the entries currently cached."""
+        with self._lock:
+            return {
+                name: {"entries": entries, "bytes": size}
+                for name, (entries, size) in sorted(self._by_function.items())
+            }
+
+    def _remove(self, key):
+        """Remove key from every index. Caller must hold the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            usage = self._by_function[key[0]]
+            usage[0] -= 1
+            usage[1] -= entry[3]
+            if not usage[0]:
+                del self._by_function[key[0]]
+        household_keys = self._by_household.get(key[1])
+        if household_keys is not None:
+            household_keys.discard(key)
+            if not household_keys:
+                del self._by_household[key[1]]
+
+
+household_cache = HouseholdCache()
+
+# Whether the latest household_cached call in this context was answered from cache
+_last_lookup_hit = ContextVar("last_lookup_hit", default=False)
+
+
+def household_cached(ttl, per_user=False):
+    """Cache a read function whose first argument is household_id.
+
+    With per_user=True the second argument is treated as user_id so entries can be
+    invalidated for individual members. The wrapped function gains
+    .invalidate(household_id, user_ids=None), .clear() and
+    .prime(value, household_id, ..., version=None) helpers; prime stores a value another
+    query already fetched as the result of that call, at the household version read with
+    it. .was_hit() tells whether the latest call was answered from cache.
+    """
+    def decorator(func):
+        name = func.__name__
+        signature = inspect.signature(func)
+
+        def make_key(household_id, args, kwargs):
+            # Bind with defaults so f(h), f(h, None) and f(h, after=None) share one entry
+            bound = signature.bind(household_id, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = tuple(bound.arguments.items())[1:]
+            user_id = int(arguments[0][1]) if per_user else None
+            return (name, int(household_id), user_id, arguments)
+
+        @wraps(func)
+        def wrapper(household_id, *args, **kwargs):
+            key = make_key(household_id, args, kwargs)
+
+            version = household_cache.household_version(int(household_id))
+            found, value = household_cache.get(key, version)
+            if not found:
+                value = func(household_id, *args, **kwargs)
+                household_cache.set(key, value, ttl, version)
+            # Set after func, whose own cached reads would overwrite it
+            _last_lookup_hit.set(found)
+            return value
+
+        def prime(value, household_id, *args, version=None, **kwargs):
+            if version is None:
+                version = household_cache.household_version(int(household_id))
+            else:
+                household_cache.remember_version(household_id, version)
+            household_cache.set(make_key(household_id, args, kwargs), value, ttl, version)
+
+        wrapper.invalidate = lambda household_id, user_ids=None: household_cache.invalidate(
+            household_id, name, user_ids=user_ids
+        )
+        wrapper.clear = lambda: household_cache.clear(name)
+        wrapper.prime = prime
+        wrapper.was_hit = _last_lookup_hit.get
+        return wrapper
+
+    return decorator
@@ -4,110 +4,193 @@ This module contains all database operations and SQL queries.
 """
 
 import streamlit as st
-import mysql.connector
 import pandas as pd
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from backends import get_backend
+from cache import household_cache, household_cached
+from events import household_events
+from tracing import TracedConnection, traced
 
 
 @st.cache_resource
-def get_database_connection():
-    """Establish connection to MySQL database using credentials from Streamlit secrets.toml."""
+def get_engine():
+    """Create the pooled engine shared by every session on this server.
+
+    The backend is chosen by st.secrets['database']['backend']: 'mysql' (default) reads
+    its credentials and pool settings from st.secrets['mysql'], 'sqlite' runs on an
+    embedded database file configured in st.secrets['sqlite']. See backends.py.
+    """
     try:
-        creds = st.secrets.get("mysql", {})
-        host = creds.get("host")
-        port = int(creds.get("port")) if creds.get("port") else 3306
-        user = creds.get("user")
-        password = creds.get("password")
-        database = creds.get("database")
-
-        if not all([host, user, password, database]):
-            st.error("Database credentials missing. Please set st.secrets['mysql'] with host, user, password, and database.")
-            return None
-
-        connection = mysql.connector.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database=database
-        )
-        return connection
+        return get_backend().create_engine()
     except Exception as e:
         st.error(f"Database connection failed: {e}")
         return None
 
 
+@contextmanager
+def get_database_connection():
+    """Check a connection out of the pool for the duration of a with-block.
+
+    Yields None if the engine is unavailable or no connection frees up within pool_timeout.
+    The connection goes back to the pool on exit and anything left uncommitted is rolled back.
+    """
+    engine = get_engine()
+    conn = None
+    if engine is not None:
+        try:
+            conn = TracedConnection(get_backend().wrap(engine.raw_connection()))
+        except Exception as e:
+            st.error(f"Database connection failed: {e}")
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+# ============================================================
+# HOUSEHOLD VERSIONS
+# ============================================================
+
+# Upper bound on a cached read's age; entries normally go stale when their
+# household's version stamp moves, long before this
+CACHE_TTL = 3600
+
+
+@traced
+def get_household_version(household_id):
+    """Get a household's version stamp (0 if it has never been written to)"""
+    with get_database_connection() as conn:
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM HouseholdVersion WHERE household_id = %s", (int(household_id),))
+            row = cursor.fetchone()
+            cursor.close()
+            return int(row[0]) if row else 0
+    return None
+
+
+def bump_household_version(cursor, *household_ids):
+    """Bump the version stamp of every household a write touches.
+
+    Must run on the caller's cursor, inside the write's transaction, so readers on
+    any replica see the new stamp exactly when they can see the new rows. This
+    process re-reads the stamp once the write publishes its event after commit.
+    """
+    query = get_backend().upsert_sql(
+        "HouseholdVersion",
+        columns=("household_id", "version"),
+        key_columns=("household_id",),
+        add_columns=("version",)
+    )
+    cursor.executemany(query, [(int(household_id), 1) for household_id in household_ids])
+
+
+household_cache.version_source = get_household_version
+household_events.add_listener(household_cache.forget_version)
+
+
+# ============================================================
+# CACHED FRAME DTYPES
+# ============================================================
+
+def compact_dtypes(df, money=(), labels=()):
+    """Give a freshly read frame compact dtypes before it is cached.
+
+    DECIMAL money columns arrive as object columns of Decimal values; they become
+    float64. Repeated strings and enum values (names, categories, statuses) become
+    category dtype, which stores each distinct string once. Modifies df in place.
+    """
+    for column in money:
+        df[column] = df[column].astype('float64')
+    for column in labels:
+        df[column] = df[column].astype('category')
+    return df
+
+
 # ============================================================
 # USER OPERATIONS
 # ============================================================
 
+@traced
 @st.cache_data(ttl=300)
 def get_user_info(user_id):
     """Get user information"""
     user_id = int(user_id)
     
-    conn = get_database_connection()
-    if conn:
-        query = "SELECT username, email FROM Users WHERE user_id = %s"
-        df = pd.read_sql(query, conn, params=(user_id,))
-        return df.iloc[0] if not df.empty else None
+    with get_database_connection() as conn:
+        if conn:
+            query = "SELECT username, email FROM Users WHERE user_id = %s"
+            df = pd.read_sql(query, conn, params=(user_id,))
+            return df.iloc[0] if not df.empty else None
     return None
 
 
+@traced
 @st.cache_data(ttl=300)
 def get_all_users(user_type='admin'):
     """Get users from the specified view (admin or non-admin)"""
-    conn = get_database_connection()
-    if conn:
-        if user_type == 'non-admin':
-            view_name = 'nonadminusers'
-        else:
-            view_name = 'adminusers'
-        
-        query = f"""
-            SELECT user_id, username
-            FROM {view_name}
-            ORDER BY user_id
-        """
-        df = pd.read_sql(query, conn)
-        return df
+    with get_database_connection() as conn:
+        if conn:
+            if user_type == 'non-admin':
+                view_name = 'nonadminusers'
+            else:
+                view_name = 'adminusers'
+            
+            query = f"""
+                SELECT user_id, username
+                FROM {view_name}
+                ORDER BY user_id
+            """
+            df = pd.read_sql(query, conn)
+            return df
     return pd.DataFrame()
 
 
+@traced
 def create_user(username, email):
     """Insert a new user into Users table."""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = "INSERT INTO Users (username, email) VALUES (%s, %s)"
-            cursor.execute(query, (username, email))
-            conn.commit()
-            new_id = cursor.lastrowid
-            cursor.close()
-            get_all_users.clear()
-            return new_id
-        except Exception as e:
-            st.error(f"Error creating user: {e}")
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = "INSERT INTO Users (username, email) VALUES (%s, %s)"
+                cursor.execute(query, (username, email))
+                conn.commit()
+                new_id = cursor.lastrowid
+                cursor.close()
+                get_all_users.clear()
+                return new_id
+            except Exception as e:
+                st.error(f"Error creating user: {e}")
     return None
 
 
+@traced
 def update_user_name(user_id, new_username):
     """Update user's username"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            user_id_int = int(user_id)
-            query = "UPDATE Users SET username = %s WHERE user_id = %s" 
-            cursor.execute(query, (new_username, user_id_int))
-            conn.commit()
-            cursor.close()
-            get_user_info.clear()
-            return True 
-        except Exception as e:
-            st.error(f"Error updating user: {e}")
-            return False
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                user_id_int = int(user_id)
+                query = "UPDATE Users SET username = %s WHERE user_id = %s" 
+                cursor.execute(query, (new_username, user_id_int))
+                # The name shows up in every household the user belongs to
+                cursor.execute("SELECT household_id FROM HouseholdMembers WHERE user_id = %s", (user_id_int,))
+                household_ids = [row[0] for row in cursor.fetchall()]
+                bump_household_version(cursor, *household_ids)
+                conn.commit()
+                cursor.close()
+                for household_id in household_ids:
+                    household_events.publish(household_id, "members", "transactions", "settlements")
+                get_user_info.clear()
+                return True 
+            except Exception as e:
+                st.error(f"Error updating user: {e}")
+                return False
     return False
 
 
@@ -115,249 +198,398 @@ def update_user_name(user_id, new_username):
 # HOUSEHOLD OPERATIONS
 # ============================================================
 
+@traced
 @st.cache_data(ttl=300)
 def get_household_info(user_id):
     """Get household information for user"""
     user_id = int(user_id)
     
-    conn = get_database_connection()
-    if conn:
-        query = """
-            SELECT h.household_id, h.name, hm.role
-            FROM Households h
-            JOIN HouseholdMembers hm ON h.household_id = hm.household_id
-            WHERE hm.user_id = %s
-            LIMIT 1
-        """
-        df = pd.read_sql(query, conn, params=(user_id,))
-        return df.iloc[0] if not df.empty else None
+    with get_database_connection() as conn:
+        if conn:
+            query = """
+                SELECT h.household_id, h.name, hm.role
+                FROM Households h
+                JOIN HouseholdMembers hm ON h.household_id = hm.household_id
+                WHERE hm.user_id = %s
+                LIMIT 1
+            """
+            df = pd.read_sql(query, conn, params=(user_id,))
+            return df.iloc[0] if not df.empty else None
     return None
 
 
+@traced
 @st.cache_data(ttl=300)
 def get_all_households():
     """Get all households available."""
-    conn = get_database_connection()
-    if conn:
-        try:
-            df = pd.read_sql(
-                "SELECT household_id, name FROM Households ORDER BY name",
-                conn
-            )
-            return df
-        except:
-            return pd.DataFrame()
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                df = pd.read_sql(
+                    "SELECT household_id, name FROM Households ORDER BY name",
+                    conn
+                )
+                return df
+            except:
+                return pd.DataFrame()
     return pd.DataFrame()
 
 
+@traced
 def create_household(household_name, admin_user_id):
     """Create a new household and assign admin_user_id."""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = """
-                INSERT INTO Households (admin_user_id, name)
-                VALUES (%s, %s)
-            """
-            cursor.execute(query, (admin_user_id, household_name))
-            conn.commit()
-            new_household_id = cursor.lastrowid
-            cursor.close()
-            return new_household_id
-        except Exception as e:
-            st.error(f"Error creating household: {e}")
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO Households (admin_user_id, name)
+                    VALUES (%s, %s)
+                """
+                cursor.execute(query, (admin_user_id, household_name))
+                conn.commit()
+                new_household_id = cursor.lastrowid
+                cursor.close()
+                return new_household_id
+            except Exception as e:
+                st.error(f"Error creating household: {e}")
     return None
 
 
-@st.cache_data(ttl=300)
+@traced
+@household_cached(ttl=CACHE_TTL)
 def get_household_members(household_id):
     """Get all members of a household"""
     household_id = int(household_id)
     
-    conn = get_database_connection()
-    if conn:
-        query = """
-            SELECT u.user_id, u.username
-            FROM Users u
-            JOIN HouseholdMembers hm ON u.user_id = hm.user_id
-            WHERE hm.household_id = %s
-            ORDER BY u.username
-        """
-        df = pd.read_sql(query, conn, params=(household_id,))
-        return df
+    with get_database_connection() as conn:
+        if conn:
+            query = """
+                SELECT u.user_id, u.username
+                FROM Users u
+                JOIN HouseholdMembers hm ON u.user_id = hm.user_id
+                WHERE hm.household_id = %s
+                ORDER BY u.username
+            """
+            df = pd.read_sql(query, conn, params=(household_id,))
+            return df
     return pd.DataFrame()
 
 
+@traced
 def add_member_to_household(household_id, user_id, role="member"):
     """Add a user to HouseholdMembers table."""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = """
-                INSERT INTO HouseholdMembers (household_id, user_id, role)
-                VALUES (%s, %s, %s)
-            """
-            cursor.execute(query, (household_id, user_id, role))
-            conn.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            st.error(f"Error adding member: {e}")
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO HouseholdMembers (household_id, user_id, role)
+                    VALUES (%s, %s, %s)
+                """
+                cursor.execute(query, (household_id, user_id, role))
+                bump_household_version(cursor, household_id)
+                conn.commit()
+                cursor.close()
+                household_events.publish(household_id, "members")
+                return True
+            except Exception as e:
+                st.error(f"Error adding member: {e}")
     return False
 
 
+@traced
 def user_has_household(user_id):
     """Return household_id and role if user belongs to a household, otherwise None."""
-    conn = get_database_connection()
-    if conn:
-        try:
-            df = pd.read_sql(
-                """
-                SELECT household_id, role
-                FROM HouseholdMembers
-                WHERE user_id = %s
-                LIMIT 1
-                """,
-                conn,
-                params=(user_id,)
-            )
-            if df.empty:
-                return None
-            return df.iloc[0].to_dict()
-        except Exception as e:
-            st.error(f"Error checking household: {e}")
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                df = pd.read_sql(
+                    """
+                    SELECT household_id, role
+                    FROM HouseholdMembers
+                    WHERE user_id = %s
+                    LIMIT 1
+                    """,
+                    conn,
+                    params=(user_id,)
+                )
+                if df.empty:
+                    return None
+                return df.iloc[0].to_dict()
+            except Exception as e:
+                st.error(f"Error checking household: {e}")
     return None
 
 
+# ============================================================
+# SESSION BOOTSTRAP
+# ============================================================
+
+@traced
+def get_session_bootstrap(user_id):
+    """Load everything a session needs about a user in one round trip.
+
+    Returns {'user', 'household', 'members', 'categories'}: user and household are
+    dicts (None if missing), members and categories are DataFrames shaped like
+    get_household_members and get_categories, whose caches are primed with them.
+    """
+    user_id = int(user_id)
+    bootstrap = {
+        "user": None,
+        "household": None,
+        "members": pd.DataFrame(columns=['user_id', 'username']),
+        "categories": pd.DataFrame(columns=['category_id', 'name', 'type'])
+    }
+
+    with get_database_connection() as conn:
+        if conn:
+            # The user's household: the lowest household_id they belong to
+            household_id_query = "SELECT MIN(household_id) FROM HouseholdMembers WHERE user_id = %s"
+            query = f"""
+                SELECT 'user' AS kind, u.user_id AS id, u.username AS name, u.email AS detail
+                FROM Users u
+                WHERE u.user_id = %s
+                UNION ALL
+                SELECT 'household', h.household_id, h.name, hm.role
+                FROM Households h
+                JOIN HouseholdMembers hm ON h.household_id = hm.household_id
+                WHERE hm.user_id = %s AND h.household_id = ({household_id_query})
+                UNION ALL
+                SELECT 'member', u.user_id, u.username, NULL
+                FROM HouseholdMembers hm
+                JOIN Users u ON hm.user_id = u.user_id
+                WHERE hm.household_id = ({household_id_query})
+                UNION ALL
+                SELECT 'category', c.category_id, c.name, c.type
+                FROM Categories c
+                WHERE c.household_id = ({household_id_query})
+                UNION ALL
+                SELECT 'version', hv.version, NULL, NULL
+                FROM HouseholdVersion hv
+                WHERE hv.household_id = ({household_id_query})
+            """
+            rows = pd.read_sql(query, conn, params=(user_id,) * 6)
+
+            user = rows[rows['kind'] == 'user']
+            if not user.empty:
+                bootstrap["user"] = {
+                    "user_id": int(user.iloc[0]['id']),
+                    "username": user.iloc[0]['name'],
+                    "email": user.iloc[0]['detail']
+                }
+
+            household = rows[rows['kind'] == 'household']
+            if not household.empty:
+                household_id = int(household.iloc[0]['id'])
+                bootstrap["household"] = {
+                    "household_id": household_id,
+                    "name": household.iloc[0]['name'],
+                    "role": household.iloc[0]['detail']
+                }
+
+                members = rows[rows['kind'] == 'member']
+                bootstrap["members"] = pd.DataFrame({
+                    'user_id': members['id'].astype(int),
+                    'username': members['name']
+                }).sort_values('username', ignore_index=True)
+
+                categories = rows[rows['kind'] == 'category']
+                bootstrap["categories"] = compact_dtypes(pd.DataFrame({
+                    'category_id': categories['id'].astype(int),
+                    'name': categories['name'],
+                    'type': categories['detail']
+                }).sort_values(['type', 'name'], ignore_index=True), labels=['type'])
+
+                # The stamp is read in the same statement, so priming needs no version query
+                version = rows.loc[rows['kind'] == 'version', 'id']
+                version = int(version.iloc[0]) if not version.empty else 0
+                get_household_members.prime(bootstrap["members"], household_id, version=version)
+                get_categories.prime(bootstrap["categories"], household_id, version=version)
+
+    return bootstrap
+
+
 # ============================================================
 # BILL OPERATIONS
 # ============================================================
 
-@st.cache_data(ttl=300)
+@traced
+@household_cached(ttl=CACHE_TTL)
 def get_upcoming_bills(household_id):
     """Get upcoming bills"""
     household_id = int(household_id)
     
-    conn = get_database_connection()
-    if conn:
-        query = """
-            SELECT 
-                bill_id,
-                name,
-                amount,
-                due_date,
-                status
-            FROM Bills
-            WHERE household_id = %s
-            AND due_date >= CURDATE()
-            ORDER BY due_date ASC
-            LIMIT 10
-        """
-        df = pd.read_sql(query, conn, params=(household_id,))
-        return df
+    with get_database_connection() as conn:
+        if conn:
+            query = """
+                SELECT 
+                    bill_id,
+                    name,
+                    amount,
+                    due_date,
+                    status
+                FROM Bills
+                WHERE household_id = %s
+                AND due_date >= %s
+                ORDER BY due_date ASC
+                LIMIT 10
+            """
+            df = pd.read_sql(query, conn, params=(household_id, date.today()))
+            return compact_dtypes(df, money=['amount'], labels=['status'])
     return pd.DataFrame()
 
 
+@traced
 def create_bill(household_id, name, amount, due_date):
     """Insert a new bill into the database"""
     household_id = int(household_id)  
     amount = float(amount)            
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = """
-                INSERT INTO Bills (household_id, name, amount, due_date, status)
-                VALUES (%s, %s, %s, %s, 'pending')
-            """
-            cursor.execute(query, (household_id, name, amount, due_date))
-            conn.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            st.error(f"Error creating bill: {e}")
-            return False
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO Bills (household_id, name, amount, due_date, status)
+                    VALUES (%s, %s, %s, %s, 'pending')
+                """
+                cursor.execute(query, (household_id, name, amount, due_date))
+                bump_household_version(cursor, household_id)
+                conn.commit()
+                cursor.close()
+                household_events.publish(household_id, "bills")
+                return True
+            except Exception as e:
+                st.error(f"Error creating bill: {e}")
+                return False
     return False
 
 
-def check_and_update_overdue_bills(household_id):
-    """Update overdue bills status"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = """
+@traced
+def sweep_overdue_bills(batch_size=500):
+    """Mark past-due pending bills as overdue for every household, batch_size bills per transaction.
+
+    Returns (rows_changed, household_ids) so callers can invalidate the affected households.
+    Raises on database errors; this runs from the background sweeper, not a render path.
+    """
+    rows_changed = 0
+    household_ids = set()
+    with get_database_connection() as conn:
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("""
+                SELECT bill_id, household_id
+                FROM Bills
+                WHERE status = 'pending'
+                AND due_date < %s
+                ORDER BY due_date
+                LIMIT %s
+            """, (date.today(), int(batch_size)))
+            batch = cursor.fetchall()
+            if not batch:
+                break
+
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"""
                 UPDATE Bills 
                 SET status = 'overdue' 
-                WHERE household_id = %s 
-                AND status = 'pending' 
-                AND due_date < CURRENT_DATE
-            """
-            cursor.execute(query, (int(household_id),))
+                WHERE status = 'pending' 
+                AND bill_id IN ({placeholders})
+            """, tuple(bill_id for bill_id, _ in batch))
+            # Read before the version bump reuses the cursor
+            rows_changed += cursor.rowcount
+            batch_households = {household_id for _, household_id in batch}
+            bump_household_version(cursor, *batch_households)
             conn.commit()
-            cursor.close()
-        except Exception as e:
-            st.error(f"Error updating overdue bills: {e}")
+            for household_id in batch_households:
+                household_events.publish(household_id, "bills")
+
+            household_ids.update(batch_households)
+            if len(batch) < batch_size:
+                break
+        cursor.close()
+    return rows_changed, household_ids
 
 
+@traced
 def mark_bill_as_paid(bill_id, user_id=None):
-    """Mark a bill as paid and optionally create a transaction"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            
-            # Get bill details
-            cursor.execute("SELECT household_id, name, amount FROM Bills WHERE bill_id = %s", (bill_id,))
-            bill_result = cursor.fetchone()
-            
-            if bill_result:
-                household_id = bill_result[0]
-                bill_name = bill_result[1]
-                bill_amount = bill_result[2]
+    """Mark a bill as paid and optionally create a transaction
+
+    The status change is a conditional UPDATE, so a second click (or a second
+    replica) finds the bill already paid and records no second transaction.
+    """
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
                 
-                # Update bill status
-                query = "UPDATE Bills SET status = 'paid' WHERE bill_id = %s"
-                cursor.execute(query, (bill_id,))
+                # Get bill details
+                cursor.execute("SELECT household_id, name, amount FROM Bills WHERE bill_id = %s", (bill_id,))
+                bill_result = cursor.fetchone()
                 
-                # Create transaction if user_id is provided
-                if user_id is not None:
-                    # Get or create permanent 'Bill' category
-                    category_id = get_or_create_permanent_category(household_id, 'Bill', 'bill')
+                if bill_result:
+                    household_id = bill_result[0]
+                    bill_name = bill_result[1]
+                    bill_amount = bill_result[2]
                     
-                    if category_id:
+                    # Update bill status, unless someone already paid it
+                    query = "UPDATE Bills SET status = 'paid' WHERE bill_id = %s AND status <> 'paid'"
+                    cursor.execute(query, (bill_id,))
+                    if cursor.rowcount == 0:
+                        conn.rollback()
+                        cursor.close()
+                        return True
+                    
+                    # Create transaction if user_id is provided
+                    if user_id is not None:
+                        # Get or create permanent 'Bill' category
+                        category_id = get_or_create_permanent_category(cursor, household_id, 'Bill', 'bill')
+                        
                         transaction_query = """
-                            INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared)
-                            VALUES (%s, %s, %s, %s, %s, TRUE)
+                            INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, bill_id, category_key)
+                            VALUES (%s, %s, %s, %s, %s, TRUE, %s, %s)
                         """
                         transaction_notes = f"Paid bill: {bill_name}"
-                        cursor.execute(transaction_query, (household_id, user_id, category_id, float(bill_amount), transaction_notes))
-                
-                conn.commit()
-                cursor.close()
-                return True
-        except Exception as e:
-            st.error(f"Error updating bill: {e}")
-            return False
+                        cursor.execute(transaction_query, (household_id, user_id, category_id, float(bill_amount), transaction_notes, bill_id, bill_name))
+                        add_to_daily_spending(cursor, household_id, user_id, bill_name, bill_amount)
+                    
+                    bump_household_version(cursor, household_id)
+                    conn.commit()
+                    cursor.close()
+                    if user_id is not None:
+                        remember_permanent_category(household_id, 'Bill', 'bill', category_id)
+                    household_events.publish(household_id, "bills", "transactions")
+                    return True
+            except Exception as e:
+                st.error(f"Error updating bill: {e}")
+                return False
     return False
 
 
+@traced
 def delete_bill(bill_id):
     """Delete a bill"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = "DELETE FROM Bills WHERE bill_id = %s"
-            cursor.execute(query, (bill_id,))
-            conn.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            st.error(f"Error deleting bill: {e}")
-            return False
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT household_id FROM Bills WHERE bill_id = %s", (bill_id,))
+                bill_result = cursor.fetchone()
+                query = "DELETE FROM Bills WHERE bill_id = %s"
+                cursor.execute(query, (bill_id,))
+                if bill_result:
+                    bump_household_version(cursor, bill_result[0])
+                conn.commit()
+                cursor.close()
+                if bill_result:
+                    household_events.publish(bill_result[0], "bills")
+                return True
+            except Exception as e:
+                st.error(f"Error deleting bill: {e}")
+                return False
     return False
 
 
@@ -365,318 +597,461 @@ def delete_bill(bill_id):
 # TRANSACTION OPERATIONS
 # ============================================================
 
-@st.cache_data(ttl=60)
-def get_recent_transactions(household_id, days=365):
-    """Get recent transactions for a household"""
+TRANSACTION_PAGE_SIZE = 20
+
+
+@traced
+@household_cached(ttl=CACHE_TTL)
+def get_transaction_page(household_id, after=None, page_size=TRANSACTION_PAGE_SIZE,
+                         user_id=None, category_key=None, min_amount=None, max_amount=None):
+    """Get one page of a household's transaction history, newest first.
+
+    Uses keyset pagination on (created_at, transaction_id): pass the next_cursor
+    returned with one page as `after` to fetch the following page, so every page is
+    an index range scan however far back the user has scrolled. Filters by member,
+    display category and amount range are applied in SQL.
+    Returns (page_df, next_cursor); next_cursor is None on the last page.
+    """
     household_id = int(household_id)
-    days = int(days)
-    
-    conn = get_database_connection()
-    if conn:
-        query = """
-            SELECT 
-                t.transaction_id,
-                t.amount,
-                t.notes,
-                t.created_at,
-                u.username,
-                c.name AS category,
-                c.type AS category_type
-            FROM Transactions t
-            JOIN Users u ON t.user_id = u.user_id
-            JOIN Categories c ON t.category_id = c.category_id
-            WHERE t.household_id = %s 
-            AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-            ORDER BY t.created_at DESC
-            LIMIT 10
-        """
-        df = pd.read_sql(query, conn, params=(household_id, days))
-        return df
-    return pd.DataFrame()
+    page_size = int(page_size)
+
+    conditions = ["t.household_id = %s"]
+    params = [household_id]
+    if after is not None:
+        after_created_at, after_id = after
+        conditions.append("t.created_at <= %s AND (t.created_at < %s OR t.transaction_id < %s)")
+        params += [after_created_at, after_created_at, int(after_id)]
+    if user_id is not None:
+        conditions.append("t.user_id = %s")
+        params.append(int(user_id))
+    if category_key is not None:
+        conditions.append("t.category_key = %s")
+        params.append(category_key)
+    if min_amount is not None:
+        conditions.append("t.amount >= %s")
+        params.append(float(min_amount))
+    if max_amount is not None:
+        conditions.append("t.amount <= %s")
+        params.append(float(max_amount))
+
+    with get_database_connection() as conn:
+        if conn:
+            query = f"""
+                SELECT 
+                    t.transaction_id,
+                    t.amount,
+                    t.notes,
+                    t.created_at,
+                    u.username,
+                    c.name AS category,
+                    c.type AS category_type,
+                    t.category_key
+                FROM Transactions t
+                JOIN Users u ON t.user_id = u.user_id
+                JOIN Categories c ON t.category_id = c.category_id
+                WHERE {" AND ".join(conditions)}
+                ORDER BY t.created_at DESC, t.transaction_id DESC
+                LIMIT %s
+            """
+            # One extra row tells us whether another page exists
+            df = pd.read_sql(query, conn, params=tuple(params + [page_size + 1]))
+            compact_dtypes(df, money=['amount'], labels=['username', 'category', 'category_type', 'category_key'])
+            if len(df) > page_size:
+                df = df.iloc[:page_size]
+                last = df.iloc[-1]
+                return df, (last['created_at'].to_pydatetime(), int(last['transaction_id']))
+            return df, None
+    return pd.DataFrame(), None
+
+
+SPENDING_WINDOW_DAYS = 365
+
+
+def category_key_for(category_name, notes):
+    """Return the display category for a transaction.
+
+    Bill payments and goal contributions are labelled with the bill or goal name,
+    everything else with its category name. New rows store this in
+    Transactions.category_key at write time; this parser only exists for
+    backfilling rows written before that column existed.
+    """
+    if notes:
+        if category_name == 'Bill':
+            return notes.split(': ')[-1].split('\n')[0]
+        if category_name == 'Contribution':
+            return notes.split('to ')[-1].split('\n')[0]
+    return category_name
+
+
+def add_to_daily_spending(cursor, household_id, user_id, category_key, amount):
+    """Add one of today's transactions to the DailySpending rollup.
+
+    Must run on the caller's cursor, inside the same transaction as the
+    Transactions INSERT, so the rollup never drifts from the raw rows.
+    """
+    add_totals_to_daily_spending(cursor, [(household_id, date.today(), category_key, user_id, amount, 1)])
+
+
+def add_totals_to_daily_spending(cursor, totals):
+    """Add (household_id, day, category_key, user_id, total, count) rows to the rollup in one batch.
+
+    Same rule as add_to_daily_spending: the caller's cursor, the Transactions INSERT's transaction.
+    """
+    query = get_backend().upsert_sql(
+        "DailySpending",
+        columns=("household_id", "day", "category_key", "user_id", "total", "count"),
+        key_columns=("household_id", "day", "category_key", "user_id"),
+        add_columns=("total", "count")
+    )
+    cursor.executemany(query, [
+        (int(household_id), day, category_key, int(user_id), float(total), int(count))
+        for household_id, day, category_key, user_id, total, count in totals
+    ])
+
+
+def claim_idempotency_key(cursor, idempotency_key):
+    """Claim idempotency_key inside the caller's transaction.
+
+    Returns False if the key was already used, in which case the caller should roll
+    back and treat the write as done. A concurrent claim of the same key waits on
+    the row lock until the first transaction ends. No key means nothing to claim.
+    """
+    if idempotency_key is None:
+        return True
+    cursor.execute(get_backend().insert_ignore_sql("IdempotencyKeys", ("idempotency_key",)), (idempotency_key,))
+    return cursor.rowcount == 1
+
+
+@traced
+def expire_idempotency_keys(retention_seconds=86400, batch_size=500):
+    """Delete idempotency keys claimed more than retention_seconds ago, batch_size keys per transaction.
+
+    A key only has to outlive the repeated submits of its form, so the table stays
+    small instead of growing by one row per payment. Returns the number of keys deleted.
+    Raises on database errors; this runs from the background sweeper, not a render path.
+    """
+    cutoff = datetime.now().replace(microsecond=0) - timedelta(seconds=retention_seconds)
+    deleted = 0
+    with get_database_connection() as conn:
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("""
+                SELECT idempotency_key
+                FROM IdempotencyKeys
+                WHERE created_at < %s
+                ORDER BY created_at
+                LIMIT %s
+            """, (cutoff, int(batch_size)))
+            batch = [row[0] for row in cursor.fetchall()]
+            if not batch:
+                break
+
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"DELETE FROM IdempotencyKeys WHERE idempotency_key IN ({placeholders})", tuple(batch))
+            deleted += cursor.rowcount
+            conn.commit()
+            if len(batch) < batch_size:
+                break
+        cursor.close()
+    return deleted
+
+
+def _fetch_spending_rows(conn, household_id, period_days):
+    """Fetch the spending window, aggregated by day, category and user, from DailySpending.
+
+    Every Spending Overview frame is derived from these rows in pandas, so a chart
+    render costs one round trip and never touches the raw Transactions rows.
+    """
+    query = """
+        SELECT 
+            ds.day AS date,
+            ds.category_key AS category,
+            ds.user_id,
+            u.username,
+            ds.total,
+            ds.count AS txn_count
+        FROM DailySpending ds
+        JOIN Users u ON ds.user_id = u.user_id
+        WHERE ds.household_id = %s 
+        AND ds.day >= %s
+    """
+    since = date.today() - timedelta(days=int(period_days))
+    rows = pd.read_sql(query, conn, params=(household_id, since))
+    rows['date'] = pd.to_datetime(rows['date'])
+    return compact_dtypes(rows, money=['total'], labels=['category', 'username'])
+
+
+def _slice_period(rows, period_days):
+    """Keep the rows dated within the last period_days days (whole days, vectorized)."""
+    cutoff = (pd.Timestamp.now() - pd.Timedelta(days=int(period_days))).normalize()
+    return rows[rows['date'].to_numpy() >= cutoff.to_datetime64()]
+
+
+def _household_spending_frames(rows, user_id):
+    """Build the category totals, per-user averages and me-vs-household frames from spending rows."""
+    if rows.empty:
+        return (
+            pd.DataFrame(columns=['category', 'total']),
+            pd.DataFrame(columns=['username', 'avg_amount']),
+            pd.DataFrame({'my_spending': [None], 'household_spending': [None]})
+        )
+
+    total_df = rows.groupby('category', as_index=False, observed=True)['total'].sum()
+
+    per_user = rows.groupby('username', as_index=False, observed=True)[['total', 'txn_count']].sum()
+    per_user['avg_amount'] = per_user['total'] / per_user['txn_count']
+    avg_df = per_user[['username', 'avg_amount']].sort_values('avg_amount', ascending=False).head(5)
+    avg_df = avg_df.reset_index(drop=True)
+
+    is_mine = rows['user_id'] == user_id
+    comparison_df = pd.DataFrame({
+        'my_spending': [rows.loc[is_mine, 'total'].sum()],
+        'household_spending': [rows.loc[~is_mine, 'total'].sum()]
+    })
+    return total_df, avg_df, comparison_df
+
+
+def _user_spending_frames(rows):
+    """Build the category totals, category averages and cumulative frames from one member's rows."""
+    if rows.empty:
+        return (
+            pd.DataFrame(columns=['category', 'total']),
+            pd.DataFrame(columns=['category', 'avg_amount']),
+            pd.DataFrame(columns=['date', 'daily_total'])
+        )
+
+    per_category = rows.groupby('category', as_index=False, observed=True)[['total', 'txn_count']].sum()
+    user_category_df = per_category[['category', 'total']]
+
+    per_category['avg_amount'] = per_category['total'] / per_category['txn_count']
+    user_avg_category_df = per_category[['category', 'avg_amount']].sort_values('avg_amount', ascending=False)
+    user_avg_category_df = user_avg_category_df.reset_index(drop=True)
+
+    cumulative_df = rows.groupby('date', as_index=False)['total'].sum().sort_values('date')
+    cumulative_df = cumulative_df.rename(columns={'total': 'daily_total'}).reset_index(drop=True)
+    cumulative_df['cumulative_total'] = cumulative_df['daily_total'].cumsum()
+    return user_category_df, user_avg_category_df, cumulative_df
 
 
-@st.cache_data(ttl=60)
+@traced
+@household_cached(ttl=CACHE_TTL)
+def get_spending_rollup(household_id):
+    """Get the year of spending aggregated by day, category and user for a household.
+
+    Fetched once per household; every Time Period choice is sliced from it in memory.
+    """
+    household_id = int(household_id)
+
+    with get_database_connection() as conn:
+        if conn:
+            return _fetch_spending_rows(conn, household_id, SPENDING_WINDOW_DAYS)
+    return pd.DataFrame(columns=['date', 'category', 'user_id', 'username', 'total', 'txn_count'])
+
+
+@traced
 def get_spending_data(household_id, user_id, period_days):
     """Get spending data for charts"""
-    household_id = int(household_id)
-    user_id = int(user_id)
-    period_days = int(period_days)
-    
-    conn = get_database_connection()
-    if conn:
-        # Total household spending by category
-        total_query = """
-            SELECT 
-                CASE 
-                    WHEN c.name = 'Bill' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, ': ', -1), '\n', 1)
-                    WHEN c.name = 'Contribution' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, 'to ', -1), '\n', 1)
-                    ELSE c.name
-                END AS category,
-                SUM(t.amount) AS total
-            FROM Transactions t
-            JOIN Categories c ON t.category_id = c.category_id
-            WHERE t.household_id = %s 
-            AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-            GROUP BY category
-        """
-        total_df = pd.read_sql(total_query, conn, params=(household_id, period_days))
-        
-        # Average spending per user
-        avg_query = """
-            SELECT 
-                u.username,
-                AVG(t.amount) AS avg_amount
-            FROM Transactions t
-            JOIN Users u ON t.user_id = u.user_id
-            WHERE t.household_id = %s 
-            AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-            GROUP BY u.username
-            ORDER BY avg_amount DESC
-            LIMIT 5
-        """
-        avg_df = pd.read_sql(avg_query, conn, params=(household_id, period_days))
-        
-        # User vs household spending
-        user_vs_household_query = """
-            SELECT 
-                SUM(CASE WHEN t.user_id = %s THEN t.amount ELSE 0 END) AS my_spending,
-                SUM(CASE WHEN t.user_id != %s THEN t.amount ELSE 0 END) AS household_spending
-            FROM Transactions t
-            WHERE t.household_id = %s 
-            AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-        """
-        comparison_df = pd.read_sql(user_vs_household_query, conn, 
-                                    params=(user_id, user_id, household_id, period_days))
-        
-        return total_df, avg_df, comparison_df
-    return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-
-
-@st.cache_data(ttl=60)
+    rows = _slice_period(get_spending_rollup(household_id), period_days)
+    return _household_spending_frames(rows, int(user_id))
+
+
+@traced
 def get_user_spending_data(household_id, user_id, period_days):
     """Get individual user spending data for 'My spending' view"""
-    household_id = int(household_id)
-    user_id = int(user_id)
-    period_days = int(period_days)
-    
-    conn = get_database_connection()
-    if conn:
-        # User's total spending by category
-        user_category_query = """
-            SELECT 
-                CASE 
-                    WHEN c.name = 'Bill' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, ': ', -1), '\n', 1)
-                    WHEN c.name = 'Contribution' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, 'to ', -1), '\n', 1)
-                    ELSE c.name
-                END AS category,
-                SUM(t.amount) AS total
-            FROM Transactions t
-            JOIN Categories c ON t.category_id = c.category_id
-            WHERE t.household_id = %s 
-            AND t.user_id = %s
-            AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-            GROUP BY category
-        """
-        user_category_df = pd.read_sql(user_category_query, conn, params=(household_id, user_id, period_days))
-        
-        # User's average spending by category
-        user_avg_category_query = """
-            SELECT 
-                CASE 
-                    WHEN c.name = 'Bill' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, ': ', -1), '\n', 1)
-                    WHEN c.name = 'Contribution' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, 'to ', -1), '\n', 1)
-                    ELSE c.name
-                END AS category,
-                AVG(t.amount) AS avg_amount
-            FROM Transactions t
-            JOIN Categories c ON t.category_id = c.category_id
-            WHERE t.household_id = %s 
-            AND t.user_id = %s
-            AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-            GROUP BY category
-            ORDER BY avg_amount DESC
-        """
-        user_avg_category_df = pd.read_sql(user_avg_category_query, conn, params=(household_id, user_id, period_days))
-        
-        # Cumulative spending over time
-        cumulative_query = """
-            SELECT 
-                DATE(t.created_at) AS date,
-                SUM(t.amount) AS daily_total
-            FROM Transactions t
-            WHERE t.household_id = %s 
-            AND t.user_id = %s
-            AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-            GROUP BY DATE(t.created_at)
-            ORDER BY date ASC
-        """
-        cumulative_df = pd.read_sql(cumulative_query, conn, params=(household_id, user_id, period_days))
-        
-        # Calculate cumulative sum
-        if not cumulative_df.empty:
-            cumulative_df['cumulative_total'] = cumulative_df['daily_total'].cumsum()
-        
-        return user_category_df, user_avg_category_df, cumulative_df
-    return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    rows = _slice_period(get_spending_rollup(household_id), period_days)
+    rows = rows[rows['user_id'].to_numpy() == int(user_id)]
+    return _user_spending_frames(rows)
 
 
 # ============================================================
 # CATEGORY OPERATIONS
 # ============================================================
 
-@st.cache_data(ttl=60)
+@traced
+@household_cached(ttl=CACHE_TTL)
 def get_categories(household_id):
     """Get all categories for a household"""
     household_id = int(household_id)
-    conn = get_database_connection()
-    if conn:
-        query = """
-            SELECT category_id, name, type
-            FROM Categories
-            WHERE household_id = %s
-            ORDER BY type, name
-        """
-        df = pd.read_sql(query, conn, params=(household_id,))
-        return df
+    with get_database_connection() as conn:
+        if conn:
+            query = """
+                SELECT category_id, name, type
+                FROM Categories
+                WHERE household_id = %s
+                ORDER BY type, name
+            """
+            df = pd.read_sql(query, conn, params=(household_id,))
+            return compact_dtypes(df, labels=['type'])
     return pd.DataFrame()
 
 
+@traced
 def create_category(household_id, name, category_type):
     """Create a new category for a household"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = """
-                INSERT INTO Categories (household_id, name, type)
-                VALUES (%s, %s, %s)
-            """
-            cursor.execute(query, (int(household_id), name, category_type))
-            conn.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            st.error(f"Error creating category: {e}")
-            return False
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO Categories (household_id, name, type)
+                    VALUES (%s, %s, %s)
+                """
+                cursor.execute(query, (int(household_id), name, category_type))
+                bump_household_version(cursor, household_id)
+                conn.commit()
+                cursor.close()
+                household_events.publish(household_id, "categories")
+                return True
+            except Exception as e:
+                st.error(f"Error creating category: {e}")
+                return False
     return False
 
 
+@traced
 def delete_category(category_id, household_id):
     """Delete a category from a household"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = "DELETE FROM Categories WHERE category_id = %s AND household_id = %s"
-            cursor.execute(query, (int(category_id), int(household_id)))
-            conn.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            st.error(f"Error deleting category: {e}")
-            return False
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = "DELETE FROM Categories WHERE category_id = %s AND household_id = %s"
+                cursor.execute(query, (int(category_id), int(household_id)))
+                bump_household_version(cursor, household_id)
+                conn.commit()
+                cursor.close()
+                forget_permanent_categories(household_id)
+                household_events.publish(household_id, "categories")
+                return True
+            except Exception as e:
+                st.error(f"Error deleting category: {e}")
+                return False
     return False
 
 
-def get_or_create_permanent_category(household_id, category_name, category_type):
-    """Get or create a permanent category (Bill or Contribution)"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            # Check if category exists
-            cursor.execute("""
-                SELECT category_id FROM Categories 
-                WHERE household_id = %s AND name = %s AND type = %s
-            """, (int(household_id), category_name, category_type))
-            result = cursor.fetchone()
-            
-            if result:
-                category_id = result[0]
-            else:
-                # Create the permanent category
-                cursor.execute("""
-                    INSERT INTO Categories (household_id, name, type)
-                    VALUES (%s, %s, %s)
-                """, (int(household_id), category_name, category_type))
-                conn.commit()
-                category_id = cursor.lastrowid
-            
-            cursor.close()
-            return category_id
-        except Exception as e:
-            st.error(f"Error getting/creating category: {e}")
-            return None
-    return None
+# Permanent category ids by (household_id, name, type); once created they never change
+_permanent_category_ids = {}
+
+
+def get_or_create_category(cursor, household_id, category_name, category_type):
+    """Return the id of a household's category, creating it if needed.
+
+    Runs on the caller's cursor and never commits, so a new category is committed or
+    rolled back together with the write that needed it.
+    """
+    return get_backend().upsert_id(
+        cursor,
+        "Categories",
+        columns=("household_id", "name", "type"),
+        id_column="category_id",
+        params=(int(household_id), category_name, category_type)
+    )
+
+
+def get_or_create_permanent_category(cursor, household_id, category_name, category_type):
+    """Get or create a permanent category (Bill or Contribution)
+
+    Like get_or_create_category, but ids the caller has passed to
+    remember_permanent_category after committing are reused, so only the first
+    payment of each kind costs a round trip.
+    """
+    key = (int(household_id), category_name, category_type)
+    category_id = _permanent_category_ids.get(key)
+    if category_id is None:
+        category_id = get_or_create_category(cursor, household_id, category_name, category_type)
+    return category_id
+
+
+def remember_permanent_category(household_id, category_name, category_type, category_id):
+    """Remember a permanent category id once the transaction that used it has committed."""
+    _permanent_category_ids[(int(household_id), category_name, category_type)] = category_id
+
+
+def forget_permanent_categories(household_id):
+    """Drop a household's remembered permanent category ids (after a category is deleted)."""
+    for key in [key for key in _permanent_category_ids if key[0] == int(household_id)]:
+        _permanent_category_ids.pop(key, None)
 
 
 # ============================================================
 # DEBT SETTLEMENT OPERATIONS
 # ============================================================
 
-@st.cache_data(ttl=60)
+@traced
+@household_cached(ttl=CACHE_TTL, per_user=True)
 def get_user_debt_settlements(household_id, user_id):
     """Get debt settlements where user is payer or receiver"""
     household_id = int(household_id)
     user_id = int(user_id)
     
-    conn = get_database_connection()
-    if conn:
-        query = """
-            SELECT 
-                ds.settlement_id,
-                ds.amount,
-                ds.status,
-                ds.created_at,
-                payer.username AS payer_name,
-                receiver.username AS receiver_name,
-                ds.payer_user_id,
-                ds.receiver_user_id
-            FROM DebtSettlements ds
-            JOIN Users payer ON ds.payer_user_id = payer.user_id
-            JOIN Users receiver ON ds.receiver_user_id = receiver.user_id
-            WHERE ds.household_id = %s 
-            AND (ds.payer_user_id = %s OR ds.receiver_user_id = %s)
-            ORDER BY ds.created_at DESC
-        """
-        df = pd.read_sql(query, conn, params=(household_id, user_id, user_id))
-        return df
+    with get_database_connection() as conn:
+        if conn:
+            query = """
+                SELECT 
+                    ds.settlement_id,
+                    ds.amount,
+                    ds.status,
+                    ds.created_at,
+                    payer.username AS payer_name,
+                    receiver.username AS receiver_name,
+                    ds.payer_user_id,
+                    ds.receiver_user_id
+                FROM DebtSettlements ds
+                JOIN Users payer ON ds.payer_user_id = payer.user_id
+                JOIN Users receiver ON ds.receiver_user_id = receiver.user_id
+                WHERE ds.household_id = %s 
+                AND (ds.payer_user_id = %s OR ds.receiver_user_id = %s)
+                ORDER BY ds.created_at DESC
+            """
+            df = pd.read_sql(query, conn, params=(household_id, user_id, user_id))
+            return compact_dtypes(df, money=['amount'], labels=['status', 'payer_name', 'receiver_name'])
     return pd.DataFrame()
 
 
+@traced
 def record_payment_to_user(household_id, payer_user_id, receiver_user_id, amount, category_id):
     """Record a payment/debt settlement between household members"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            
-            # Get receiver username for transaction notes
-            cursor.execute("SELECT username FROM Users WHERE user_id = %s", (int(receiver_user_id),))
-            receiver_result = cursor.fetchone()
-            receiver_name = receiver_result[0] if receiver_result else "User"
-            
-            # Insert debt settlement record
-            query = """
-                INSERT INTO DebtSettlements (household_id, payer_user_id, receiver_user_id, amount, status)
-                VALUES (%s, %s, %s, %s, 'settled')
-            """
-            cursor.execute(query, (int(household_id), int(payer_user_id), int(receiver_user_id), float(amount)))
-            
-            # Insert transaction record
-            transaction_query = """
-                INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared)
-                VALUES (%s, %s, %s, %s, %s, TRUE)
-            """
-            transaction_notes = f"Payment to {receiver_name}"
-            cursor.execute(transaction_query, (int(household_id), int(payer_user_id), int(category_id), float(amount), transaction_notes))
-            
-            conn.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            st.error(f"Error recording payment: {e}")
-            return False
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                
+                # Get receiver username for transaction notes and the category's display name
+                cursor.execute("""
+                    SELECT
+                        (SELECT username FROM Users WHERE user_id = %s),
+                        (SELECT name FROM Categories WHERE category_id = %s)
+                """, (int(receiver_user_id), int(category_id)))
+                receiver_name, category_name = cursor.fetchone()
+                receiver_name = receiver_name or "User"
+                
+                # Insert debt settlement record
+                query = """
+                    INSERT INTO DebtSettlements (household_id, payer_user_id, receiver_user_id, amount, status)
+                    VALUES (%s, %s, %s, %s, 'settled')
+                """
+                cursor.execute(query, (int(household_id), int(payer_user_id), int(receiver_user_id), float(amount)))
+                
+                # Insert transaction record
+                transaction_query = """
+                    INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, category_key)
+                    VALUES (%s, %s, %s, %s, %s, TRUE, %s)
+                """
+                transaction_notes = f"Payment to {receiver_name}"
+                cursor.execute(transaction_query, (int(household_id), int(payer_user_id), int(category_id), float(amount), transaction_notes, category_name))
+                add_to_daily_spending(cursor, household_id, payer_user_id, category_name, amount)
+                bump_household_version(cursor, household_id)
+                
+                conn.commit()
+                cursor.close()
+                household_events.publish(household_id, "settlements", "transactions")
+                return True
+            except Exception as e:
+                st.error(f"Error recording payment: {e}")
+                return False
     return False
 
 
@@ -684,92 +1059,139 @@ def record_payment_to_user(household_id, payer_user_id, receiver_user_id, amount
 # SAVINGS GOAL OPERATIONS
 # ============================================================
 
-@st.cache_data(ttl=300)
+@traced
+@household_cached(ttl=CACHE_TTL)
 def get_savings_goals(household_id):
     """Get savings goals"""
     household_id = int(household_id)
     
-    conn = get_database_connection()
-    if conn:
-        query = """
-            SELECT 
-                goal_id,
-                name,
-                target_amount,
-                current_amount,
-                created_at
-            FROM SavingsGoals
-            WHERE household_id = %s
-            ORDER BY created_at DESC
-        """
-        df = pd.read_sql(query, conn, params=(household_id,))
-        return df
+    with get_database_connection() as conn:
+        if conn:
+            query = """
+                SELECT 
+                    goal_id,
+                    name,
+                    target_amount,
+                    current_amount,
+                    created_at
+                FROM SavingsGoals
+                WHERE household_id = %s
+                ORDER BY created_at DESC
+            """
+            df = pd.read_sql(query, conn, params=(household_id,))
+            return compact_dtypes(df, money=['target_amount', 'current_amount'])
     return pd.DataFrame()
 
 
+@traced
+def create_savings_goal(household_id, name, target_amount):
+    """Create a new savings goal for a household"""
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO SavingsGoals (household_id, name, target_amount, current_amount)
+                    VALUES (%s, %s, %s, %s)
+                """
+                cursor.execute(query, (int(household_id), name, float(target_amount), 0.0))
+                bump_household_version(cursor, household_id)
+                conn.commit()
+                cursor.close()
+                household_events.publish(household_id, "goals")
+                return True
+            except Exception as e:
+                st.error(f"Error creating savings goal: {e}")
+                return False
+    return False
+
+
+@traced
 def delete_savings_goal(goal_id, household_id):
     """Delete a savings goal"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            query = "DELETE FROM SavingsGoals WHERE goal_id = %s AND household_id = %s"
-            cursor.execute(query, (int(goal_id), int(household_id)))
-            conn.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            st.error(f"Error deleting savings goal: {e}")
-            return False
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                query = "DELETE FROM SavingsGoals WHERE goal_id = %s AND household_id = %s"
+                cursor.execute(query, (int(goal_id), int(household_id)))
+                bump_household_version(cursor, household_id)
+                conn.commit()
+                cursor.close()
+                household_events.publish(household_id, "goals")
+                return True
+            except Exception as e:
+                st.error(f"Error deleting savings goal: {e}")
+                return False
     return False
 
 
-def pay_towards_goal(goal_id, household_id, payment_amount, user_id=None):
-    """Add payment towards a savings goal, ensuring it doesn't exceed target"""
-    conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            # First get current and target amounts, and goal name
-            select_query = "SELECT current_amount, target_amount, name FROM SavingsGoals WHERE goal_id = %s AND household_id = %s"
-            cursor.execute(select_query, (int(goal_id), int(household_id)))
-            result = cursor.fetchone()
-            
-            if result:
-                current_amount = float(result[0])
-                target_amount = float(result[1])
-                goal_name = result[2]
-                new_amount = current_amount + float(payment_amount)
-                
-                # Check if payment would exceed target
-                if new_amount > target_amount:
+@traced
+def pay_towards_goal(goal_id, household_id, payment_amount, user_id=None, idempotency_key=None):
+    """Add payment towards a savings goal, ensuring it doesn't exceed target
+
+    The balance is raised by a single conditional UPDATE, so concurrent payments can
+    neither lose an update nor overshoot the target. A payment whose idempotency_key
+    was already used is ignored and reported as recorded.
+    """
+    goal_id = int(goal_id)
+    household_id = int(household_id)
+    payment_amount = float(payment_amount)
+
+    with get_database_connection() as conn:
+        if conn:
+            try:
+                cursor = conn.cursor()
+                if not claim_idempotency_key(cursor, idempotency_key):
+                    conn.rollback()
                     cursor.close()
-                    return False, "Payment would exceed target amount"
-                
-                # Update the current amount
-                update_query = "UPDATE SavingsGoals SET current_amount = %s WHERE goal_id = %s AND household_id = %s"
-                cursor.execute(update_query, (new_amount, int(goal_id), int(household_id)))
-                
+                    return True, "Payment already recorded"
+
+                # Add the payment only if it still fits under the target
+                update_query = """
+                    UPDATE SavingsGoals
+                    SET current_amount = current_amount + %s
+                    WHERE goal_id = %s AND household_id = %s
+                    AND current_amount + %s <= target_amount
+                """
+                cursor.execute(update_query, (payment_amount, goal_id, household_id, payment_amount))
+                if cursor.rowcount == 0:
+                    # Release the idempotency key so a corrected retry can use it
+                    conn.rollback()
+                    cursor.execute(
+                        "SELECT goal_id FROM SavingsGoals WHERE goal_id = %s AND household_id = %s",
+                        (goal_id, household_id)
+                    )
+                    goal_exists = cursor.fetchone() is not None
+                    cursor.close()
+                    if goal_exists:
+                        return False, "Payment would exceed target amount"
+                    return False, "Goal not found"
+
                 # If user_id is provided, create a transaction record
                 if user_id is not None:
+                    cursor.execute("SELECT name FROM SavingsGoals WHERE goal_id = %s", (goal_id,))
+                    goal_name = cursor.fetchone()[0]
+
                     # Get or create permanent 'Contribution' category
-                    category_id = get_or_create_permanent_category(int(household_id), 'Contribution', 'goal')
+                    category_id = get_or_create_permanent_category(cursor, household_id, 'Contribution', 'goal')
                     
-                    if category_id:
-                        # Insert transaction record
-                        transaction_query = """
-                            INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared)
-                            VALUES (%s, %s, %s, %s, %s, TRUE)
-                        """
-                        transaction_notes = f"Contribution to {goal_name}"
-                        cursor.execute(transaction_query, (int(household_id), int(user_id), category_id, float(payment_amount), transaction_notes))
+                    # Insert transaction record
+                    transaction_query = """
+                        INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, goal_id, category_key)
+                        VALUES (%s, %s, %s, %s, %s, TRUE, %s, %s)
+                    """
+                    transaction_notes = f"Contribution to {goal_name}"
+                    cursor.execute(transaction_query, (household_id, int(user_id), category_id, payment_amount, transaction_notes, goal_id, goal_name))
+                    add_to_daily_spending(cursor, household_id, user_id, goal_name, payment_amount)
                 
+                bump_household_version(cursor, household_id)
                 conn.commit()
                 cursor.close()
+                if user_id is not None:
+                    remember_permanent_category(household_id, 'Contribution', 'goal', category_id)
+                household_events.publish(household_id, "goals", "transactions")
                 return True, "Payment added successfully"
-            else:
-                cursor.close()
-                return False, "Goal not found"
-        except Exception as e:
-            return False, f"Error updating savings goal: {e}"
+            except Exception as e:
+                return False, f"Error updating savings goal: {e}"
     return False, "Database connection failed"
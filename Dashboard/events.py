@@ -0,0 +1,85 @@
+"""
+Live Household Updates for HomeBase Dashboard
+This module is an in-process publish/subscribe channel keyed by household_id. Write
+paths in crud publish what they changed after they commit; a listener drops the
+household's cached version stamp, so the dashboard sections that rerun on a timer
+(see routes LIVE UPDATES) read the new data, and their polls of the channel (a dict
+lookup, no database query) tell the member what another session changed.
+"""
+
+import threading
+from collections import deque
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+# What a write can change; routes maps each topic to the sections that show it
+TOPICS = ("bills", "transactions", "settlements", "goals", "categories", "members")
+
+
+class HouseholdEvents:
+    """Process-wide event log per household, read by sessions through a cursor.
+
+    Every event gets the next number of one process-wide sequence, so a subscriber's
+    cursor is a single int no matter how many households it follows. Each household
+    keeps its last `history` events; a cursor older than that gets every topic back.
+    Listeners added with add_listener are called with the household_id of each event.
+    """
+
+    def __init__(self, history=256):
+        self.history = history
+        self._events = {}
+        self._sequence = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def add_listener(self, callback):
+        """Call callback(household_id) on every publish, after the write has committed."""
+        self._listeners.append(callback)
+
+    def publish(self, household_id, *topics, origin=None):
+        """Record that topics changed for household_id; origin defaults to the calling session."""
+        if origin is None:
+            ctx = get_script_run_ctx(suppress_warning=True)
+            origin = ctx.session_id if ctx else None
+
+        with self._lock:
+            self._sequence += 1
+            self._events.setdefault(int(household_id), deque(maxlen=self.history)).append(
+                (self._sequence, origin, frozenset(topics))
+            )
+            self.published += 1
+
+        for callback in self._listeners:
+            callback(int(household_id))
+
+    def latest(self):
+        """Cursor that sees only events published after this call."""
+        with self._lock:
+            return self._sequence
+
+    def poll(self, household_id, after, origin=None):
+        """Return (cursor, topics) for household_id's events published after the cursor `after`.
+
+        Events published by origin itself are skipped, since that session already
+        reran after its own write.
+        """
+        with self._lock:
+            cursor = self._sequence
+            events = self._events.get(int(household_id))
+            if not events or events[-1][0] <= after:
+                return cursor, set()
+            if len(events) == events.maxlen and events[0][0] > after + 1:
+                return cursor, set(TOPICS)
+
+            topics = set()
+            for sequence, event_origin, event_topics in reversed(events):
+                if sequence <= after:
+                    break
+                if origin is None or event_origin != origin:
+                    topics |= event_topics
+            return cursor, topics
+
+
+household_events = HouseholdEvents()
@@ -0,0 +1,194 @@
+"""
+Household Ledger Export for HomeBase Dashboard
+This module exports a household's Transactions, DebtSettlements, Bills and
+SavingsGoals to CSV or Parquet. Rows are read from an unbuffered cursor in fixed-size
+chunks and each chunk is written out before the next is fetched, so memory use
+doesn't grow with the size of the ledger.
+
+Usage (run from the Dashboard folder so .streamlit/secrets.toml is found):
+    python export.py --household 1 --output exports/
+    python export.py --household 1 --format parquet --sqlite bench.db --output exports/
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import zipfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backends import SQLiteBackend, get_backend, set_backend
+from crud import get_database_connection
+
+
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_FORMATS = ("csv", "parquet")
+
+# File name -> (query with one household_id parameter, column schema)
+EXPORT_TABLES = {
+    "transactions": ("""
+        SELECT t.transaction_id, t.created_at, u.username, c.name AS category, t.category_key,
+               t.amount, t.notes, t.is_shared, t.bill_id, t.goal_id
+        FROM Transactions t
+        JOIN Users u ON t.user_id = u.user_id
+        JOIN Categories c ON t.category_id = c.category_id
+        WHERE t.household_id = %s
+        ORDER BY t.transaction_id
+    """, pa.schema([
+        ("transaction_id", pa.int64()), ("created_at", pa.timestamp("s")), ("username", pa.string()),
+        ("category", pa.string()), ("category_key", pa.string()), ("amount", pa.decimal128(10, 2)),
+        ("notes", pa.string()), ("is_shared", pa.bool_()), ("bill_id", pa.int64()), ("goal_id", pa.int64()),
+    ])),
+    "debt_settlements": ("""
+        SELECT ds.settlement_id, ds.created_at, payer.username AS payer, receiver.username AS receiver,
+               ds.amount, ds.status
+        FROM DebtSettlements ds
+        JOIN Users payer ON ds.payer_user_id = payer.user_id
+        JOIN Users receiver ON ds.receiver_user_id = receiver.user_id
+        WHERE ds.household_id = %s
+        ORDER BY ds.settlement_id
+    """, pa.schema([
+        ("settlement_id", pa.int64()), ("created_at", pa.timestamp("s")), ("payer", pa.string()),
+        ("receiver", pa.string()), ("amount", pa.decimal128(10, 2)), ("status", pa.string()),
+    ])),
+    "bills": ("""
+        SELECT bill_id, name, amount, due_date, status
+        FROM Bills
+        WHERE household_id = %s
+        ORDER BY bill_id
+    """, pa.schema([
+        ("bill_id", pa.int64()), ("name", pa.string()), ("amount", pa.decimal128(10, 2)),
+        ("due_date", pa.date32()), ("status", pa.string()),
+    ])),
+    "savings_goals": ("""
+        SELECT goal_id, name, target_amount, current_amount, created_at
+        FROM SavingsGoals
+        WHERE household_id = %s
+        ORDER BY goal_id
+    """, pa.schema([
+        ("goal_id", pa.int64()), ("name", pa.string()), ("target_amount", pa.decimal128(10, 2)),
+        ("current_amount", pa.decimal128(10, 2)), ("created_at", pa.timestamp("s")),
+    ])),
+}
+
+
+# ============================================================
+# ROW STREAMS
+# ============================================================
+
+def stream_rows(conn, query, params, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the query's rows as lists of at most chunk_rows tuples, fetched as they are needed."""
+    cursor = get_backend().streaming_cursor(conn)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def write_csv(path, schema, chunks):
+    """Write a header and then each chunk of rows to a CSV file; returns rows written."""
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(schema.names)
+        for rows in chunks:
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+def write_parquet(path, schema, chunks):
+    """Write each chunk of rows as one Parquet row group; returns rows written."""
+    written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            # Build columns from the DBAPI values, then cast (SQLite gives 0/1 for booleans)
+            columns = [pa.array(values).cast(field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            written += len(rows)
+    return written
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet}
+
+
+# ============================================================
+# EXPORT
+# ============================================================
+
+def export_household(household_id, file_format="csv", directory=".", chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """Write one file per EXPORT_TABLES entry into directory and return their paths.
+
+    progress(table, rows_written) is called after every chunk.
+    """
+    if file_format not in WRITERS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+
+    paths = []
+    with get_database_connection() as conn:
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        for table, (query, schema) in EXPORT_TABLES.items():
+            def chunks(table=table, query=query):
+                written = 0
+                for rows in stream_rows(conn, query, (int(household_id),), chunk_rows):
+                    yield rows
+                    written += len(rows)
+                    if progress is not None:
+                        progress(table, written)
+
+            path = os.path.join(directory, f"{table}.{file_format}")
+            WRITERS[file_format](path, schema, chunks())
+            paths.append(path)
+    return paths
+
+
+def export_household_archive(household_id, file_format="csv", chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """Export every table into one zip in a temporary file and return the open file, positioned at 0.
+
+    The caller owns the returned file; it is deleted when closed.
+    """
+    archive = tempfile.TemporaryFile(suffix=".zip")
+    with tempfile.TemporaryDirectory(prefix="homebase-export-") as directory:
+        paths = export_household(household_id, file_format, directory, chunk_rows, progress)
+        # Parquet is already compressed
+        compression = zipfile.ZIP_DEFLATED if file_format == "csv" else zipfile.ZIP_STORED
+        with zipfile.ZipFile(archive, "w", compression) as zf:
+            for path in paths:
+                zf.write(path, os.path.basename(path))
+    archive.seek(0)
+    return archive
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a HomeBase household's ledger.")
+    parser.add_argument('--household', type=int, required=True)
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument('--output', default=".", help="directory the files are written to")
+    parser.add_argument('--chunk-rows', type=int, default=EXPORT_CHUNK_ROWS)
+    parser.add_argument('--sqlite', metavar='PATH', help="export from an embedded SQLite database instead of MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        set_backend(SQLiteBackend(args.sqlite, sample_data=False))
+
+    def report(table, written):
+        print(f"\r{table}: {written:,} rows", end="", flush=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    paths = export_household(args.household, args.format, args.output, args.chunk_rows, report)
+    print(f"\nWrote {', '.join(paths)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""
+Bulk Transaction Import for HomeBase Dashboard
+This module imports bank exports (CSV, or OFX/QFX statements) into a household's
+Transactions. Files are parsed a chunk at a time and each chunk is deduplicated,
+mapped to household categories and inserted in one bounded transaction, so memory
+use stays flat however large the file is.
+
+Usage (run from the Dashboard folder so .streamlit/secrets.toml is found):
+    python importer.py --household 1 --user 2 statement.csv
+    python importer.py --household 1 --user 2 --sqlite bench.db statement.ofx
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import re
+import sys
+from collections import Counter
+
+import pandas as pd
+
+from backends import SQLiteBackend, get_backend, set_backend
+from crud import (
+    get_database_connection, bump_household_version, add_totals_to_daily_spending,
+    get_or_create_category
+)
+from events import household_events
+
+
+# Rows per chunk; each chunk is one transaction
+IMPORT_BATCH_SIZE = 1000
+
+# Category for rows whose export has no category column or an empty one
+DEFAULT_CATEGORY = "Imported"
+
+# Header names (lowercased) that banks use for each field
+CSV_HEADERS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "booking date"),
+    "amount": ("amount", "transaction amount"),
+    "debit": ("debit", "withdrawal", "withdrawals", "money out"),
+    "credit": ("credit", "deposit", "deposits", "money in"),
+    "description": ("description", "payee", "name", "details", "narrative", "memo"),
+    "category": ("category",),
+    "external_id": ("transaction id", "id", "fitid", "reference"),
+}
+
+OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.S | re.I)
+OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+OFX_BLOCK_SIZE = 65536
+
+TRANSACTION_COLUMNS = (
+    "household_id", "user_id", "category_id", "amount", "notes",
+    "is_shared", "created_at", "category_key", "import_key"
+)
+
+
+# ============================================================
+# PARSING
+# ============================================================
+
+def _money(column):
+    """Parse '$1,234.50', '-12.00' or '(12.00)' strings to floats; blanks become NaN."""
+    text = column.astype(str).str.replace(r"[$,\s]", "", regex=True)
+    negative = text.str.startswith("(") & text.str.endswith(")")
+    value = pd.to_numeric(text.str.strip("()"), errors="coerce")
+    return value.where(~negative, -value)
+
+
+def _csv_columns(header):
+    """Map the file's column names to CSV_HEADERS fields; raises ValueError if required ones are missing."""
+    names = {str(name).strip().lower(): name for name in header}
+    columns = {}
+    for field, aliases in CSV_HEADERS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names[alias]
+                break
+
+    if "date" not in columns or "description" not in columns or not ({"amount", "debit"} & columns.keys()):
+        raise ValueError(
+            "Couldn't find date, description and amount (or debit) columns in: " + ", ".join(map(str, header))
+        )
+    return columns
+
+
+def read_csv_chunks(text_file, chunk_rows=IMPORT_BATCH_SIZE, debits_negative=True):
+    """Yield the CSV's rows as frames of posted_at, amount, description, category and external_id.
+
+    amount is negative for money going out. An export with a single amount column
+    that lists spending as positive numbers needs debits_negative=False.
+    """
+    columns = None
+    reader = pd.read_csv(text_file, chunksize=chunk_rows, dtype=str, keep_default_na=False, skipinitialspace=True)
+    for chunk in reader:
+        if columns is None:
+            columns = _csv_columns(chunk.columns)
+
+        if "amount" in columns:
+            amount = _money(chunk[columns["amount"]])
+            if not debits_negative:
+                amount = -amount
+        else:
+            amount = _money(chunk[columns["credit"]]).fillna(0) if "credit" in columns else 0.0
+            amount = amount - _money(chunk[columns["debit"]]).fillna(0)
+
+        yield pd.DataFrame({
+            "posted_at": pd.to_datetime(chunk[columns["date"]], errors="coerce"),
+            "amount": amount,
+            "description": chunk[columns["description"]].str.strip(),
+            "category": chunk[columns["category"]].str.strip() if "category" in columns else "",
+            "external_id": chunk[columns["external_id"]].str.strip() if "external_id" in columns else "",
+        })
+
+
+def _ofx_records(text_file, block_size=OFX_BLOCK_SIZE):
+    """Yield each <STMTTRN> of an OFX file as a {FIELD: value} dict, reading block_size characters at a time.
+
+    Works for SGML (OFX 1.x, leaf tags left open) and XML (OFX 2.x) statements, and for
+    files written on a single line.
+    """
+    buffer = ""
+    while True:
+        block = text_file.read(block_size)
+        buffer += block
+        consumed = 0
+        for match in OFX_TRANSACTION.finditer(buffer):
+            yield {name.upper(): value.strip() for name, value in OFX_FIELD.findall(match.group(1))}
+            consumed = match.end()
+        buffer = buffer[consumed:]
+        if not block:
+            break
+        # Keep only a transaction that is still being read
+        start = buffer.upper().rfind("<STMTTRN>")
+        buffer = buffer[start:] if start >= 0 else buffer[-len("<STMTTRN>"):]
+
+
+def read_ofx_chunks(text_file, chunk_rows=IMPORT_BATCH_SIZE):
+    """Yield the OFX statement's transactions as frames in the same shape as read_csv_chunks."""
+    records = []
+    for record in _ofx_records(text_file):
+        records.append(record)
+        if len(records) == chunk_rows:
+            yield _ofx_frame(records)
+            records = []
+    if records:
+        yield _ofx_frame(records)
+
+
+def _ofx_frame(records):
+    raw = pd.DataFrame.from_records(records, columns=["DTPOSTED", "TRNAMT", "NAME", "MEMO", "FITID"]).fillna("")
+    # DTPOSTED is YYYYMMDD[HHMMSS[.XXX][TZ]]
+    posted = raw["DTPOSTED"].str.extract(r"^(\d{8})(\d{6})?").fillna({1: "000000"})
+    description = raw["NAME"].where(raw["NAME"] != "", raw["MEMO"])
+    return pd.DataFrame({
+        "posted_at": pd.to_datetime(posted[0] + posted[1], format="%Y%m%d%H%M%S", errors="coerce"),
+        "amount": _money(raw["TRNAMT"]),
+        "description": description.str.strip(),
+        "category": "",
+        "external_id": raw["FITID"],
+    })
+
+
+# ============================================================
+# IMPORT
+# ============================================================
+
+class ImportKeys:
+    """Stable keys that let a re-imported statement line be recognized.
+
+    A line with a bank transaction id is keyed by that id. Otherwise the key is the
+    date, amount and description plus how many identical lines came before it on
+    the same day, so two equal coffees on one day stay two transactions. Only the
+    current day's counts are kept, which assumes the export is in date order (bank
+    exports are).
+    """
+
+    def __init__(self):
+        self._day = None
+        self._seen = Counter()
+
+    def key(self, posted_at, amount, description, external_id):
+        if external_id:
+            line = f"id|{external_id}"
+        else:
+            if posted_at.date() != self._day:
+                self._day = posted_at.date()
+                self._seen.clear()
+            line = f"{posted_at:%Y-%m-%d %H:%M:%S}|{amount:.2f}|{description}"
+            self._seen[line] += 1
+            line = f"{line}|{self._seen[line]}"
+        return hashlib.sha1(line.encode("utf-8")).hexdigest()
+
+
+def _source_size(binary):
+    """Size in bytes of a seekable file, or None."""
+    try:
+        position = binary.tell()
+        size = binary.seek(0, io.SEEK_END)
+        binary.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+class TransactionImporter:
+    """Imports bank exports into one household as spending by one member.
+
+    Money going out becomes a transaction with a positive amount; deposits and rows
+    without a date or amount are skipped. Categories are matched to the household's
+    shared categories by name, and missing ones are created.
+    """
+
+    def __init__(self, household_id, user_id, batch_size=IMPORT_BATCH_SIZE, debits_negative=True):
+        self.household_id = int(household_id)
+        self.user_id = int(user_id)
+        self.batch_size = batch_size
+        self.debits_negative = debits_negative
+        self._categories = {}
+        self.created_categories = []
+
+    def chunks(self, text_file, file_format):
+        if file_format == "csv":
+            return read_csv_chunks(text_file, self.batch_size, self.debits_negative)
+        if file_format in ("ofx", "qfx"):
+            return read_ofx_chunks(text_file, self.batch_size)
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+    def run(self, source, file_format=None, name=None, progress=None):
+        """Import a file path or binary file object and return a summary dict.
+
+        The format is taken from the file name's extension unless file_format is given.
+        progress(fraction, summary) is called after every chunk; fraction is None for
+        files that can't report their size.
+        """
+        name = name or getattr(source, "name", None) or str(source)
+        file_format = (file_format or os.path.splitext(name)[1].lstrip(".")).lower()
+        binary = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+        total_bytes = _source_size(binary)
+        text_file = io.TextIOWrapper(binary, encoding="utf-8-sig", errors="replace", newline="")
+
+        summary = {"rows_read": 0, "inserted": 0, "duplicates": 0, "skipped": 0}
+        keys = ImportKeys()
+        try:
+            with get_database_connection() as conn:
+                if not conn:
+                    raise RuntimeError("Database connection failed")
+
+                self._load_categories(conn)
+                for raw in self.chunks(text_file, file_format):
+                    rows = self._spending_rows(raw, keys)
+                    summary["rows_read"] += len(raw)
+                    summary["skipped"] += len(raw) - len(rows)
+                    if not rows.empty:
+                        inserted = self._write_chunk(conn, rows)
+                        summary["inserted"] += inserted
+                        summary["duplicates"] += len(rows) - inserted
+
+                    if progress is not None:
+                        fraction = min(binary.tell() / total_bytes, 1.0) if total_bytes else None
+                        progress(fraction, dict(summary))
+        finally:
+            # Hand a caller's file back open; close one opened here
+            text_file.detach()
+            if binary is not source:
+                binary.close()
+
+        topics = ["transactions"] + (["categories"] if self.created_categories else [])
+        if summary["inserted"]:
+            household_events.publish(self.household_id, *topics)
+        summary["categories_created"] = list(self.created_categories)
+        return summary
+
+    def _load_categories(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT category_id, name FROM Categories WHERE household_id = %s AND type = 'shared'",
+            (self.household_id,)
+        )
+        self._categories = {name.lower(): (category_id, name) for category_id, name in cursor.fetchall()}
+        cursor.close()
+
+    def _category_name(self, raw_name):
+        """The household's spelling of a category, the file's for new ones, or DEFAULT_CATEGORY."""
+        raw_name = raw_name[:100] or DEFAULT_CATEGORY
+        known = self._categories.get(raw_name.lower())
+        return known[1] if known else raw_name
+
+    def _category_id(self, cursor, name, created):
+        """Id of a shared category, creating it if needed; new ones go in created until the chunk commits."""
+        known = self._categories.get(name.lower()) or created.get(name.lower())
+        if known:
+            return known[0]
+        category_id = get_or_create_category(cursor, self.household_id, name, 'shared')
+        created[name.lower()] = (category_id, name)
+        return category_id
+
+    def _spending_rows(self, raw, keys):
+        """Keep the rows that are spending and give each its amount, category and import key."""
+        rows = raw[raw["posted_at"].notna() & (raw["amount"] < 0)].copy()
+        rows["amount"] = (-rows["amount"]).round(2)
+        rows["description"] = rows["description"].str[:255]
+        rows["category"] = rows["category"].map(self._category_name)
+        rows["import_key"] = [
+            keys.key(posted_at, amount, description, external_id)
+            for posted_at, amount, description, external_id
+            in zip(rows["posted_at"], rows["amount"], rows["description"], rows["external_id"])
+        ]
+        return rows
+
+    def _write_chunk(self, conn, rows):
+        """Insert one chunk's new rows and their rollup totals in one transaction; returns rows inserted.
+
+        A concurrent import of the same file can insert some of the keys between the
+        lookup and the INSERT; the unique key then rejects the chunk, and it is retried
+        once with those rows filtered out.
+        """
+        rows = rows.drop_duplicates("import_key")
+        try:
+            return self._insert_new_rows(conn, rows)
+        except get_backend().integrity_error:
+            conn.rollback()
+            return self._insert_new_rows(conn, rows)
+
+    def _insert_new_rows(self, conn, rows):
+        cursor = conn.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(rows))
+            cursor.execute(
+                f"SELECT import_key FROM Transactions WHERE household_id = %s AND import_key IN ({placeholders})",
+                (self.household_id, *rows["import_key"])
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            rows = rows[~rows["import_key"].isin(existing)]
+            if rows.empty:
+                conn.rollback()
+                return 0
+
+            created = {}
+            category_ids = {name: self._category_id(cursor, name, created) for name in rows["category"].unique()}
+            cursor.executemany(
+                f"INSERT INTO Transactions ({', '.join(TRANSACTION_COLUMNS)}) "
+                f"VALUES ({', '.join(['%s'] * len(TRANSACTION_COLUMNS))})",
+                [
+                    (self.household_id, self.user_id, category_ids[category], float(amount), description,
+                     True, posted_at.to_pydatetime(), category, import_key)
+                    for posted_at, amount, description, category, import_key
+                    in zip(rows["posted_at"], rows["amount"], rows["description"], rows["category"], rows["import_key"])
+                ]
+            )
+
+            totals = rows.groupby([rows["posted_at"].dt.date, "category"])["amount"].agg(["sum", "count"])
+            add_totals_to_daily_spending(cursor, [
+                (self.household_id, day, category, self.user_id, total, count)
+                for (day, category), total, count in zip(totals.index, totals["sum"], totals["count"])
+            ])
+            bump_household_version(cursor, self.household_id)
+            conn.commit()
+
+            self._categories.update(created)
+            self.created_categories.extend(name for _, name in created.values())
+            return len(rows)
+        finally:
+            cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a bank export into a HomeBase household.")
+    parser.add_argument('path', help="CSV, OFX or QFX file")
+    parser.add_argument('--household', type=int, required=True)
+    parser.add_argument('--user', type=int, required=True, help="member the spending is recorded for")
+    parser.add_argument('--format', choices=['csv', 'ofx', 'qfx'], help="default: from the file extension")
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--positive-debits', action='store_true',
+                        help="the CSV's amount column shows spending as positive numbers")
+    parser.add_argument('--sqlite', metavar='PATH', help="import into an embedded SQLite database instead of MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        set_backend(SQLiteBackend(args.sqlite, sample_data=False))
+
+    def report(fraction, summary):
+        done = f"{fraction:6.1%} " if fraction is not None else ""
+        print(f"\r{done}{summary['rows_read']:,} rows read, {summary['inserted']:,} imported", end="", flush=True)
+
+    importer = TransactionImporter(args.household, args.user, args.batch_size, not args.positive_debits)
+    summary = importer.run(args.path, args.format, progress=report)
+    print(f"\nImported {summary['inserted']:,} transaction(s); {summary['duplicates']:,} already present, "
+          f"{summary['skipped']:,} skipped (deposits or unreadable rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Schema Migrations for HomeBase Dashboard
+This module applies the versioned SQL files in /migrations and checks the EXPLAIN
+plans of the queries in Dashboard_SQL_Queries.sql for full table scans.
+
+Usage (run from the Dashboard folder so .streamlit/secrets.toml is found):
+    python migrate.py            apply pending migrations and run data backfills
+    python migrate.py --status   list applied and pending migrations
+    python migrate.py --rebuild-rollup  rebuild DailySpending from Transactions
+    python migrate.py --explain  EXPLAIN every catalogued query and report full scans
+"""
+
+import argparse
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+from backends import get_backend, split_sql_statements
+from crud import get_database_connection, category_key_for
+
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MIGRATIONS_DIR = os.path.join(ROOT_DIR, 'migrations')
+QUERIES_FILE = os.path.join(ROOT_DIR, 'Dashboard_SQL_Queries.sql')
+
+# Catalogued queries that legitimately read a whole (small) table
+FULL_SCAN_ALLOWED = {
+    "Get users from admin view",
+    "Get users from non-admin view",
+    "Get all households",
+}
+
+
+# ============================================================
+# MIGRATION FILES
+# ============================================================
+
+def list_migrations():
+    """Return (version, name, path) for every migration file, ordered by version."""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d+)_(.+)\.sql$', filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+
+# ============================================================
+# MIGRATIONS
+# ============================================================
+
+@contextmanager
+def _connection(conn=None):
+    """Use the caller's connection if given (backend bootstrap), otherwise check one out."""
+    if conn is not None:
+        yield conn
+        return
+    with get_database_connection() as conn:
+        if not conn:
+            raise RuntimeError("Database connection failed")
+        yield conn
+
+
+def ensure_schema_version_table(cursor):
+    """Create the schema_version bookkeeping table if it does not exist yet."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_applied_versions(conn):
+    """Return the set of migration versions already recorded in schema_version."""
+    cursor = conn.cursor()
+    ensure_schema_version_table(cursor)
+    conn.commit()
+    cursor.execute("SELECT version FROM schema_version")
+    versions = {int(row[0]) for row in cursor.fetchall()}
+    cursor.close()
+    return versions
+
+
+def apply_migrations(conn=None):
+    """Apply every pending migration in version order and return the versions applied.
+
+    Each migration is recorded in schema_version right after its statements run.
+    MySQL commits DDL implicitly, so a failing migration stops the run and must be
+    fixed forward rather than rolled back.
+    """
+    applied = []
+    with _connection(conn) as conn:
+        done = get_applied_versions(conn)
+        for version, name, path in list_migrations():
+            if version in done:
+                continue
+
+            with open(path) as f:
+                statements = split_sql_statements(f.read())
+
+            cursor = conn.cursor()
+            for _, statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+            conn.commit()
+            cursor.close()
+            applied.append(version)
+    return applied
+
+
+def migration_status():
+    """Return (version, name, applied) for every migration file."""
+    with _connection() as conn:
+        done = get_applied_versions(conn)
+    return [(version, name, version in done) for version, name, _ in list_migrations()]
+
+
+# ============================================================
+# DATA BACKFILLS
+# ============================================================
+
+def backfill_category_keys(batch_size=1000, conn=None):
+    """Fill Transactions.category_key for rows written before migration 0002.
+
+    Walks the table in transaction_id order, batch_size rows at a time, committing
+    after each batch so row locks are held only briefly. Returns the rows updated.
+    """
+    updated = 0
+    last_id = 0
+    with _connection(conn) as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("""
+                SELECT t.transaction_id, c.name, t.notes
+                FROM Transactions t
+                JOIN Categories c ON t.category_id = c.category_id
+                WHERE t.transaction_id > %s
+                AND t.category_key IS NULL
+                ORDER BY t.transaction_id
+                LIMIT %s
+            """, (last_id, batch_size))
+            batch = cursor.fetchall()
+            if not batch:
+                break
+
+            cursor.executemany(
+                "UPDATE Transactions SET category_key = %s WHERE transaction_id = %s",
+                [(category_key_for(name, notes), transaction_id) for transaction_id, name, notes in batch]
+            )
+            conn.commit()
+            updated += len(batch)
+            last_id = batch[-1][0]
+        cursor.close()
+    return updated
+
+
+def rebuild_daily_spending(household_ids=None, conn=None):
+    """Rebuild the DailySpending rollup from Transactions, one household per transaction.
+
+    Each household's rows are deleted and re-aggregated and then committed, so readers
+    never see a half-built household and locks are held one household at a time.
+    Rebuilds every household unless household_ids is given. Returns the number rebuilt.
+    """
+    with _connection(conn) as conn:
+        cursor = conn.cursor()
+        if household_ids is None:
+            cursor.execute("SELECT household_id FROM Households ORDER BY household_id")
+            household_ids = [row[0] for row in cursor.fetchall()]
+
+        for household_id in household_ids:
+            cursor.execute("DELETE FROM DailySpending WHERE household_id = %s", (household_id,))
+            cursor.execute("""
+                INSERT INTO DailySpending (household_id, day, category_key, user_id, total, count)
+                SELECT household_id, DATE(created_at), category_key, user_id, SUM(amount), COUNT(*)
+                FROM Transactions
+                WHERE household_id = %s
+                AND category_key IS NOT NULL
+                GROUP BY household_id, DATE(created_at), category_key, user_id
+            """, (household_id,))
+            conn.commit()
+        cursor.close()
+    return len(household_ids)
+
+
+# ============================================================
+# EXPLAIN CHECKS
+# ============================================================
+
+def explain_queries(path=QUERIES_FILE, sample_param='1'):
+    """EXPLAIN every SELECT/UPDATE/DELETE in the query catalog on the active backend.
+
+    Placeholders are filled with sample_param. Returns a list of
+    (label, table, access type, key, estimated rows, is_full_scan) tuples.
+    """
+    with open(path) as f:
+        statements = split_sql_statements(f.read())
+
+    backend = get_backend()
+    results = []
+    with _connection() as conn:
+        cursor = conn.cursor()
+        for label, statement in statements:
+            if not re.match(r'^(SELECT|UPDATE|DELETE)\b', statement, flags=re.IGNORECASE):
+                continue
+
+            params = tuple(sample_param for _ in range(statement.count('%s')))
+            for plan in backend.explain(cursor, statement, params):
+                is_full_scan = plan['full_scan'] and label not in FULL_SCAN_ALLOWED
+                results.append((label, plan['table'], plan['type'], plan['key'], plan['rows'], is_full_scan))
+        cursor.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply HomeBase schema migrations.")
+    parser.add_argument('--status', action='store_true', help="list applied and pending migrations")
+    parser.add_argument('--explain', action='store_true', help="check query plans for full table scans")
+    parser.add_argument('--rebuild-rollup', action='store_true', help="rebuild DailySpending from Transactions")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        for version, name, applied in migration_status():
+            print(f"{version:04d} {name}: {'applied' if applied else 'pending'}")
+        return 0
+
+    if args.explain:
+        full_scans = 0
+        for label, table, access_type, key, rows, is_full_scan in explain_queries():
+            marker = "FULL SCAN" if is_full_scan else "ok"
+            print(f"[{marker}] {label} | table={table} type={access_type} key={key} rows={rows}")
+            full_scans += is_full_scan
+        print(f"{full_scans} unexpected full table scan(s)")
+        return 1 if full_scans else 0
+
+    applied = apply_migrations()
+    if applied:
+        print("Applied migrations: " + ", ".join(f"{v:04d}" for v in applied))
+    else:
+        print("Schema is up to date")
+
+    backfilled = backfill_category_keys()
+    if backfilled:
+        print(f"Backfilled category_key on {backfilled} transaction(s)")
+
+    if args.rebuild_rollup or 3 in applied:
+        households = rebuild_daily_spending()
+        print(f"Rebuilt DailySpending for {households} household(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Concurrent Section Loading for HomeBase Dashboard
+This module runs independent crud reads at the same time on a shared thread pool, so
+a full rerun waits for its slowest query instead of the sum of all of them. Results
+land in the household caches, where each section then finds them.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from backends import get_backend
+
+
+# Workers for backends without a connection pool setting (SQLite)
+READ_WORKERS = 8
+
+
+@st.cache_resource
+def get_read_pool():
+    """Thread pool shared by every session on the server.
+
+    It has one worker per connection in the backend's pool_size, so prefetched reads
+    never wait for a connection and max_overflow stays free for the script threads'
+    own reads and writes. Extra reads from busy reruns queue here instead.
+    """
+    workers = getattr(get_backend(), "pool_size", READ_WORKERS)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="homebase-read")
+
+
+def _run_in(script_ctx, context, call):
+    # The script's context lets st.error in crud render into the page, and the copied
+    # contextvars count the read towards the rerun profile and trace its caller
+    add_script_run_ctx(threading.current_thread(), script_ctx)
+    return context.run(call)
+
+
+def run_concurrently(calls):
+    """Run zero-argument callables at once and return their results in order.
+
+    The first exception raised by a call is re-raised. Calls run one after another
+    when the backend can't serve concurrent reads (an in-memory SQLite database).
+    """
+    if not get_backend().concurrent_reads:
+        return [call() for call in calls]
+
+    script_ctx = get_script_run_ctx()
+    pool = get_read_pool()
+    futures = [pool.submit(_run_in, script_ctx, copy_context(), call) for call in calls]
+    return [future.result() for future in futures]
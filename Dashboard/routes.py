@@ -3,15 +3,26 @@ Routes and Business Logic for HomeBase Dashboard
 This module contains higher-level functions and UI logic that use CRUD operations.
 """
 
+import html
+from contextlib import contextmanager
+from functools import wraps
+
 import streamlit as st
 import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from crud import (
     get_all_users, create_user, create_household, add_member_to_household,
     get_all_households, user_has_household, get_household_info,
-    mark_bill_as_paid, delete_bill, get_upcoming_bills, create_category,
-    delete_category, get_categories, pay_towards_goal, get_savings_goals,
-    get_spending_data, get_recent_transactions, update_user_name
+    mark_bill_as_paid, delete_bill, get_upcoming_bills, pay_towards_goal, get_savings_goals,
+    get_spending_rollup, get_transaction_page,
+    get_household_members, update_user_name, get_session_bootstrap, get_user_info
 )
+from cache import household_cache
+from events import household_events
+from importer import TransactionImporter
+from export import EXPORT_FORMATS, export_household_archive
+from sweeper import start_overdue_sweeper
+from tracing import begin_section, start_rerun_profile
 
 
 # ============================================================
@@ -24,6 +35,15 @@ def is_admin():
     return role in ['admin', 'co-admin']
 
 
+def load_session_user(user_id):
+    """Load user_id's profile and household into the session with one bootstrap query"""
+    bootstrap = get_session_bootstrap(user_id)
+    st.session_state.user_id = int(user_id)
+    st.session_state.user_info = bootstrap["user"]
+    st.session_state.household_info = bootstrap["household"]
+    return bootstrap
+
+
 def toggle_menu():
     """Toggle the menu visibility"""
     st.session_state.show_menu = not st.session_state.show_menu
@@ -34,6 +54,181 @@ def toggle_master_view():
     st.session_state.show_master_view = not st.session_state.show_master_view
 
 
+# ============================================================
+# SECTION FRAGMENTS
+# ============================================================
+
+def is_fragment_rerun():
+    """True when Streamlit is rerunning only fragments rather than the whole script"""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def section_fragment(name):
+    """Render a dashboard section as an st.fragment.
+
+    Widgets inside the section rerun only that section, and sections in LIVE_SECTIONS
+    also rerun on their own every live_update_seconds() (see LIVE UPDATES). On a full
+    rerun the section is timed as part of the page profile; a fragment rerun records a
+    profile of its own.
+    """
+    def decorator(render):
+        live = name in LIVE_SECTIONS
+        run_every = live_update_seconds() if live else None
+
+        @st.fragment(run_every=run_every)
+        @wraps(render)
+        def section(*args, **kwargs):
+            if not is_fragment_rerun():
+                if live:
+                    st.session_state.setdefault("live_section_seen", {})[name] = household_events.latest()
+                begin_section(name)
+                return render(*args, **kwargs)
+
+            if live:
+                announce_live_changes(name)
+            profile = start_rerun_profile(name, scope=f"{name} only")
+            result = render(*args, **kwargs)
+            st.session_state.last_rerun_profile = profile.finish()
+            return result
+        return section
+    return decorator
+
+
+def lazy_expander_loaded(key):
+    """Whether the lazy_expander with this key has been opened in this session"""
+    return st.session_state.get(f"{key}_loaded", False)
+
+
+@contextmanager
+def lazy_expander(label, key, load_label="Show"):
+    """st.expander whose contents are only built once the user asks for them.
+
+    Streamlit never tells the server whether an expander is open, so a collapsed
+    expander still runs its body on every rerun. This one shows a load button until it
+    is clicked and yields whether the section is loaded; once loaded it stays loaded
+    (and expanded) for the rest of the session.
+    """
+    loaded_key = f"{key}_loaded"
+    loaded = lazy_expander_loaded(key)
+
+    def mark_loaded():
+        st.session_state[loaded_key] = True
+
+    with st.expander(label, expanded=loaded):
+        if not loaded:
+            st.button(load_label, key=key, on_click=mark_loaded)
+        yield loaded
+
+
+# ============================================================
+# LIVE UPDATES
+# ============================================================
+# Streamlit can't push a rerun into another session through its public API, so live
+# updates poll. Each section in LIVE_SECTIONS reruns by itself on a timer; its reads
+# come from the household cache, whose entries are dropped as soon as a write in this
+# process publishes its event (and after the version stamp check window for writes
+# from other replicas), so a rerun shows other members' changes without a full page
+# rerun, and costs at most the version stamp check when nothing changed.
+#
+# Cost: every open dashboard reruns each live section once per interval. At the
+# default 30 s that is 4 small section reruns per session every 30 s, about 13 a
+# second for 100 open dashboards, nearly all answered from the cache.
+# Spending Overview and Categories are not live: their charts and forms are costly to
+# rebuild, and they show other members' writes on the next rerun.
+
+# Live sections and the event topics (see events.TOPICS) each one displays
+LIVE_SECTIONS = {
+    "Payments": {"settlements", "members", "categories"},
+    "Transactions": {"transactions", "members"},
+    "Savings Goals": {"goals"},
+    "Bills": {"bills"},
+}
+
+
+def live_update_seconds():
+    """Seconds between live section reruns, from st.secrets['live_updates'] (interval_seconds).
+
+    Defaults to 30; 0 turns live updates off.
+    """
+    seconds = float(st.secrets.get("live_updates", {}).get("interval_seconds", 30))
+    return seconds if seconds > 0 else None
+
+
+def announce_live_changes(name):
+    """Toast once when another session changed what the live section `name` shows.
+
+    Polls the in-process event channel (a dict lookup, no query) from the section's
+    own cursor; this session's own writes are skipped.
+    """
+    household_id = (st.session_state.get("household_info") or {}).get("household_id")
+    seen = st.session_state.setdefault("live_section_seen", {})
+    if household_id is None:
+        return
+
+    cursor, topics = household_events.poll(
+        household_id,
+        seen.get(name, household_events.latest()),
+        origin=get_script_run_ctx().session_id
+    )
+    seen[name] = cursor
+    if LIVE_SECTIONS[name] & topics:
+        st.toast(f"{name} updated by another household member")
+
+
+# ============================================================
+# LIST RENDERING
+# ============================================================
+# Lists are built column by column into one HTML string and sent as a single
+# st.markdown, instead of one markdown element (and one delta) per row.
+
+def _text(column):
+    return column.astype(str).map(html.escape)
+
+
+def _dollars(column):
+    # &#36; rather than "$" so pairs of dollar signs aren't rendered as LaTeX
+    return "&#36;" + column.astype(float).map("{:.2f}".format)
+
+
+def transaction_rows_html(transactions_df):
+    """Build the Recent Transactions rows as one HTML block"""
+    rows = (
+        '<div class="transaction-row"><div>'
+        + '<strong style="color: black;">' + _text(transactions_df['notes']) + '</strong>'
+        + '<span class="t-date">by ' + _text(transactions_df['username'])
+        + ' - ' + transactions_df['created_at'].astype(str) + '</span>'
+        + '</div><div style="text-align: right;">'
+        + '<strong style="color: red;">' + _dollars(transactions_df['amount']) + '</strong><br>'
+        + '<span class="t-category">' + _text(transactions_df['category']) + '</span>'
+        + '</div></div>'
+    )
+    return "".join(rows)
+
+
+def settlement_rows_html(settlements_df, user_id):
+    """Build the Payment History rows as one HTML block, from user_id's point of view"""
+    is_payer = settlements_df['payer_user_id'] == user_id
+    description = ("You paid " + _text(settlements_df['receiver_name'])).where(
+        is_payer,
+        _text(settlements_df['payer_name']) + " paid you"
+    )
+    amount_color = is_payer.map({True: "red", False: "green"})
+    amount_prefix = is_payer.map({True: "-", False: "+"})
+    status = settlements_df['status'].astype(str)
+
+    rows = (
+        '<div class="transaction-row"><div>'
+        + '<strong style="color: black;">' + description + '</strong>'
+        + '<span class="t-date">' + settlements_df['created_at'].astype(str) + '</span>'
+        + '</div><div style="text-align: right;">'
+        + '<strong style="color: ' + amount_color + ';">' + amount_prefix + _dollars(settlements_df['amount']) + '</strong><br>'
+        + '<span class="status-' + status + '">' + status.str.upper() + '</span>'
+        + '</div></div>'
+    )
+    return "".join(rows)
+
+
 # ============================================================
 # ONBOARDING
 # ============================================================
@@ -90,11 +285,12 @@ def onboarding_screen():
             add_member_to_household(selected_household, new_user_id, role="member")
 
             from crud import get_database_connection
-            df = pd.read_sql(
-                "SELECT name FROM Households WHERE household_id = %s",
-                get_database_connection(),
-                params=(selected_household,)
-            )
+            with get_database_connection() as conn:
+                df = pd.read_sql(
+                    "SELECT name FROM Households WHERE household_id = %s",
+                    conn,
+                    params=(selected_household,)
+                )
 
             st.session_state.household_info = {
                 "household_id": selected_household,
@@ -138,7 +334,7 @@ def show_add_bill_form(household_id):
             if name and amount > 0:
                 success = create_bill(household_id, name, amount, due_date)
                 if success:
-                    get_upcoming_bills.clear()
+                    get_upcoming_bills.invalidate(household_id)
                     st.success("Bill created successfully!")
                     st.rerun()
             else:
@@ -159,8 +355,10 @@ def open_bill_action(bill_id, bill_name, amount):
             success = mark_bill_as_paid(bill_id, st.session_state.user_id)
             if success:
                 st.success("Bill paid")
-                get_upcoming_bills.clear()
-                get_recent_transactions.clear()
+                household_id = st.session_state.household_info['household_id']
+                get_upcoming_bills.invalidate(household_id)
+                get_transaction_page.invalidate(household_id)
+                get_spending_rollup.invalidate(household_id)
                 st.rerun()
 
     with col2:
@@ -174,7 +372,7 @@ def open_bill_action(bill_id, bill_name, amount):
                     success = delete_bill(bill_id)
                     if success:
                         st.success("Bill deleted.")
-                        get_upcoming_bills.clear() 
+                        get_upcoming_bills.invalidate(st.session_state.household_info['household_id'])
                         st.rerun()
         else:
             st.caption("Admin only")
@@ -194,7 +392,10 @@ def handle_user_profile_update(new_username):
     if update_user_name(user_id_to_update, new_username):
         # Update session state with new username
         st.session_state.user_info['username'] = new_username
-        get_spending_data.clear()
+        household_id = st.session_state.household_info['household_id']
+        get_spending_rollup.invalidate(household_id)
+        get_transaction_page.invalidate(household_id)
+        get_household_members.invalidate(household_id)
         return True
     return False
 
@@ -223,186 +424,177 @@ def render_master_view_selector():
 
     if not all_users.empty:
         # Build dropdown options
-        user_options = {row['username']: row['user_id'] for _, row in all_users.iterrows()}
+        user_options = dict(zip(all_users['user_id'].astype(int), all_users['username']))
 
-        selected_user_label = st.sidebar.selectbox(
+        selected_user_id = st.sidebar.selectbox(
             "Select User",
             options=list(user_options.keys()),
+            format_func=user_options.get,
             key="user_selector"
         )
 
-        selected_user = selected_user_label
-
-        # Load selected user context into session
-        if selected_user:
-            from crud import get_database_connection
-            conn = get_database_connection()
-            if conn:
-                # Load user info
-                df_user = pd.read_sql(
-                    "SELECT user_id, username, email FROM Users WHERE username = %s",
-                    conn,
-                    params=(selected_user,)
-                )
+        # Load selected user context into session, only when the selection changes
+        if selected_user_id is not None:
+            if selected_user_id != st.session_state.get('user_id') or st.session_state.get('user_info') is None:
+                load_session_user(selected_user_id)
 
-                if not df_user.empty:
-                    st.session_state.user_id = int(df_user.iloc[0]["user_id"])
-                    st.session_state.user_info = {
-                        "user_id": int(df_user.iloc[0]["user_id"]),
-                        "username": df_user.iloc[0]["username"],
-                        "email": df_user.iloc[0]["email"]
-                    }
-
-                    # Load household info
-                    df_hh = pd.read_sql(
-                        """
-                        SELECT h.household_id, h.name, hm.role
-                        FROM HouseholdMembers hm
-                        JOIN Households h ON hm.household_id = h.household_id
-                        WHERE hm.user_id = %s
-                        """,
-                        conn,
-                        params=(st.session_state.user_id,)
-                    )
-
-                    if not df_hh.empty:
-                        st.session_state.household_info = {
-                            "household_id": int(df_hh.iloc[0]["household_id"]),
-                            "name": df_hh.iloc[0]["name"],
-                            "role": df_hh.iloc[0]["role"]
-                        }
-                    else:
-                        st.session_state.household_info = None
-
-                st.sidebar.markdown("---")
-                st.sidebar.info(f"Currently viewing: **{selected_user_label}** ({user_type})")
+            st.sidebar.markdown("---")
+            st.sidebar.info(f"Currently viewing: **{user_options[selected_user_id]}** ({user_type})")
 
     else:
         st.sidebar.warning(f"No {user_type} users found in database")
 
+    cache_stats = household_cache.stats()
+    st.sidebar.caption(
+        f"Household cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+        f"{cache_stats['evictions']} evictions · {cache_stats['hit_ratio']:.0%} hit ratio · "
+        f"{cache_stats['bytes'] / 1024:.0f} KiB"
+    )
 
-# ============================================================
-# CATEGORY MANAGEMENT UI
-# ============================================================
+    last_sweep = start_overdue_sweeper().last_run
+    if last_sweep:
+        st.sidebar.caption(
+            f"Overdue sweep: {last_sweep['rows_changed']} bill(s) marked, "
+            f"{last_sweep['keys_expired']} idempotency key(s) expired in "
+            f"{last_sweep['seconds']:.2f}s at {last_sweep['finished_at']:%H:%M}"
+        )
 
-def render_category_management(household_id):
-    """Render category management section"""
-    st.markdown('<h4 style="color: white;">Manage Categories</h4>', unsafe_allow_html=True)
+    render_performance_panel()
+    render_cache_memory_panel()
 
-    categories_df = get_categories(household_id)
 
-    # Display existing categories (only shared type)
-    with st.expander("📁 View All Categories", expanded=False):
-        if not categories_df.empty:
-            # Filter to only show shared categories
-            shared_categories = categories_df[categories_df['type'] == 'shared']
-            
-            if not shared_categories.empty:
-                st.markdown(f"<span style='color: black; font-weight: bold;'>Shared Categories</span>", unsafe_allow_html=True)
-                for idx, row in shared_categories.iterrows():
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.markdown(f"<span style='color: black;'>• {row['name']}</span>", unsafe_allow_html=True)
-                    with col2:
-                        if is_admin():
-                            if st.button("🗑️", key=f"delete_cat_{row['category_id']}", help="Delete category"):
-                                if delete_category(row['category_id'], household_id):
-                                    st.success(f"Deleted category: {row['name']}")
-                                    get_categories.clear()
-                                    st.rerun()
-            else:
-                st.info("No shared categories found for this household")
-        else:
-            st.info("No categories found for this household")
+def render_performance_panel():
+    """Show the previous rerun's script time, broken down by dashboard section"""
+    profile = st.session_state.get("last_rerun_profile")
 
-    # Toggle button for creating new category (admin only)
-    if 'show_create_category_form' not in st.session_state:
-        st.session_state.show_create_category_form = False
+    with st.sidebar.expander("⏱️ Last Rerun Performance", expanded=False):
+        if profile is None:
+            st.caption("Timings appear after the first complete rerun.")
+            return
 
-    if is_admin():
-        if st.button("➕ Create New Category", key="toggle_create_category"):
-            st.session_state.show_create_category_form = not st.session_state.show_create_category_form
+        st.metric(profile.get("scope", "Full rerun"), f"{profile['total_ms']:.0f} ms")
+        st.caption(
+            f"{profile['queries']} DB round trips ({profile['query_ms']:.0f} ms) · "
+            f"{profile['cache_hits']} cache hits · {profile['cache_misses']} misses · "
+            f"{profile['figure_ms']:.0f} ms building charts"
+        )
 
-    if st.session_state.show_create_category_form and is_admin():
-        st.markdown("### Create a new shared category")
-        
-        with st.form("create_category_form"):
-            category_name = st.text_input("Category Name", placeholder="e.g. Groceries, Transportation, Entertainment")
-            st.caption("This category will be available for user-to-user payments and shared expenses")
-            
-            col_submit, col_cancel = st.columns(2)
-            with col_submit:
-                category_submitted = st.form_submit_button("Create Category", use_container_width=True)
-            with col_cancel:
-                cancel_category = st.form_submit_button("Cancel", use_container_width=True)
-        
-        if category_submitted:
-            if category_name:
-                # Always create as 'shared' type
-                success = create_category(household_id, category_name, 'shared')
-                if success:
-                    st.success(f"Shared category '{category_name}' created successfully!")
-                    get_categories.clear()
-                    st.session_state.show_create_category_form = False
-                    st.rerun()
-            else:
-                st.warning("Please enter a category name.")
-        
-        if cancel_category:
-            st.session_state.show_create_category_form = False
-            st.rerun()
+        sections_df = pd.DataFrame(profile["sections"])
+        sections_df = sections_df.rename(columns={
+            "section": "Section",
+            "ms": "Total ms",
+            "queries": "Queries",
+            "query_ms": "DB ms",
+            "cache_hits": "Hits",
+            "cache_misses": "Misses",
+            "figure_ms": "Charts ms"
+        })
+        st.dataframe(
+            sections_df.round(1),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(f"Finished at {profile['finished_at']:%H:%M:%S}")
+
+
+# crud reads cached with st.cache_data, whose entries the household cache can't measure
+STREAMLIT_CACHED_READS = (get_user_info, get_all_users, get_household_info, get_all_households)
+
+
+def render_cache_memory_panel():
+    """Show how much memory each cached crud function's entries hold on this server"""
+    with st.sidebar.expander("🧠 Cache Memory", expanded=False):
+        usage = household_cache.memory_by_function()
+        if usage:
+            usage_df = pd.DataFrame([
+                {"Function": name, "Entries": stats["entries"], "KiB": stats["bytes"] / 1024}
+                for name, stats in usage.items()
+            ]).sort_values("KiB", ascending=False)
+            st.dataframe(usage_df.round(1), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Nothing is cached yet.")
+
+        st.caption(
+            "Not measured (held by st.cache_data): "
+            + ", ".join(func.__name__ for func in STREAMLIT_CACHED_READS)
+        )
 
 
 # ============================================================
-# BILL MANAGEMENT UI
+# TRANSACTION IMPORT UI
 # ============================================================
 
-def render_bill_management(household_id):
-    """Render bill management section"""
-    from crud import check_and_update_overdue_bills
-    
-    # Check and update overdue bills
-    check_and_update_overdue_bills(household_id)
-    
-    # Initialize session state for create bill form
-    if 'show_create_bill_form' not in st.session_state:
-        st.session_state.show_create_bill_form = False
+def render_transaction_import(household_id, user_id):
+    """Upload a bank export (CSV, OFX or QFX) and import its spending for the current user.
 
-    if is_admin():
-        if st.button("➕ Create New Bill", key="toggle_create_bill"):
-            st.session_state.show_create_bill_form = not st.session_state.show_create_bill_form
+    Returns True once a file has added transactions, so the caller can rerun the page.
+    """
+    summary = st.session_state.pop("last_import_summary", None)
+    if summary is not None:
+        st.success(
+            f"Imported {summary['inserted']:,} transaction(s); {summary['duplicates']:,} were already "
+            f"recorded and {summary['skipped']:,} deposits or unreadable rows were skipped."
+        )
 
-    if st.session_state.show_create_bill_form and is_admin():
-        st.markdown("### Create a new bill")
-        
-        from crud import create_bill
-        
-        with st.form("create_bill_form"):
-            col1, col2 = st.columns(2)
-            with col1:
-                bill_name = st.text_input("Bill Name", placeholder="e.g. Internet, Rent")
-            with col2:
-                bill_amount = st.number_input("Amount ($)", min_value=0.0, step=0.01)
-            
-            bill_due_date = st.date_input("Due Date")
-            
-            col_submit, col_cancel = st.columns(2)
-            with col_submit:
-                bill_submitted = st.form_submit_button("Create Bill", use_container_width=True)
-            with col_cancel:
-                cancel_bill = st.form_submit_button("Cancel", use_container_width=True)
-        
-        if bill_submitted:
-            if bill_name and bill_amount > 0:
-                success = create_bill(household_id, bill_name, bill_amount, bill_due_date)
-                if success:
-                    st.success("Bill created successfully!")
-                    get_upcoming_bills.clear()
-                    st.session_state.show_create_bill_form = False
-                    st.rerun()
-            else:
-                st.warning("Please enter a valid name and amount.")
-        
-        if cancel_bill:
-            st.session_state.show_create_bill_form = False
-            st.rerun()
+    uploaded = st.file_uploader("Bank export", type=["csv", "ofx", "qfx"], key="import_file")
+    debits_negative = st.checkbox(
+        "Spending is shown as negative amounts", value=True, key="import_debits_negative",
+        help="Untick for CSV exports whose amount column lists purchases as positive numbers"
+    )
+    if uploaded is None or not st.button("Import", key="import_submit"):
+        return False
+
+    progress_bar = st.progress(0.0, text="Importing…")
+
+    def report(fraction, progress):
+        progress_bar.progress(fraction or 0.0, text=f"{progress['rows_read']:,} rows read, {progress['inserted']:,} imported")
+
+    importer = TransactionImporter(household_id, user_id, debits_negative=debits_negative)
+    try:
+        summary = importer.run(uploaded, name=uploaded.name, progress=report)
+    except Exception as e:
+        st.error(f"Error importing transactions: {e}")
+        return False
+
+    if summary["inserted"] == 0:
+        st.info(f"Nothing new to import: {summary['duplicates']:,} transaction(s) were already recorded.")
+        return False
+
+    # Shown after the rerun the caller starts
+    st.session_state.last_import_summary = summary
+    return True
+
+
+# ============================================================
+# LEDGER EXPORT UI
+# ============================================================
+
+def render_ledger_export(household_id):
+    """Export the household's transactions, settlements, bills and goals as a zip of CSV or Parquet files"""
+    file_format = st.radio("Format", EXPORT_FORMATS, format_func=str.upper, horizontal=True, key="export_format")
+    if not st.button("Prepare export", key="export_submit"):
+        return
+
+    status = st.empty()
+
+    def report(table, written):
+        status.caption(f"Exporting {table.replace('_', ' ')}: {written:,} rows")
+
+    try:
+        archive = export_household_archive(household_id, file_format, progress=report)
+    except Exception as e:
+        st.error(f"Error exporting ledger: {e}")
+        return
+
+    status.empty()
+    # Streamlit's media store keeps the whole payload, so the compressed zip is the only
+    # full copy in memory; the temporary file is deleted once it has been read
+    with archive:
+        st.download_button(
+            "⬇️ Download export",
+            data=archive.read(),
+            file_name=f"homebase_household_{household_id}_{file_format}.zip",
+            mime="application/zip",
+            on_click="ignore",
+            key="export_download"
+        )
@@ -0,0 +1,326 @@
+"""
+Synthetic Data Generator for HomeBase Dashboard
+This module fills the database with seeded, reproducible households, members,
+categories, transactions, bills, debt settlements and savings goals using bulk
+inserts, for benchmarking and load testing.
+
+Usage (run from the Dashboard folder so .streamlit/secrets.toml is found):
+    python seed_data.py --households 50 --members 6 --transactions 1000000
+    python seed_data.py --sqlite bench.db --transactions 100000   (no MySQL server needed)
+    python seed_data.py --sqlite bench.db --as-of 2025-01-01      (same dates on every run)
+"""
+
+import argparse
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+
+from backends import SQLiteBackend, set_backend
+from crud import get_database_connection
+from migrate import rebuild_daily_spending
+
+
+BATCH_SIZE = 5000
+HISTORY_DAYS = 400
+
+SHARED_CATEGORIES = ['Groceries', 'Utilities', 'Dining Out', 'Household Supplies', 'Transportation', 'Entertainment']
+BILL_NAMES = ['Rent', 'Electricity', 'Water', 'Internet', 'Gas', 'Streaming', 'Insurance', 'Trash Pickup']
+GOAL_NAMES = ['Vacation', 'Emergency Fund', 'New Couch', 'Holiday Party', 'Roof Repair', 'Game Console']
+
+
+def _chunks(rows, size=BATCH_SIZE):
+    """Yield lists of at most size rows from any iterable without materializing it."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bulk_insert(conn, query, rows):
+    """executemany() rows in BATCH_SIZE chunks, committing after each chunk. Returns rows inserted."""
+    inserted = 0
+    cursor = conn.cursor()
+    for chunk in _chunks(rows):
+        cursor.executemany(query, chunk)
+        conn.commit()
+        inserted += len(chunk)
+    cursor.close()
+    return inserted
+
+
+def _fetch_all(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+class SyntheticDataGenerator:
+    """Seeded generator; the same seed, tag and as_of date produce the same data set.
+
+    Every generated user's email ends in @<tag>.bench, which is how later runs find
+    the households this generator owns and top them up to a larger size. Dates are
+    laid out backwards from as_of (today by default). Each block of BATCH_SIZE
+    transactions, and each household's bills, settlements and goals, get their own
+    random stream, so a data set topped up over several runs matches one seeded in
+    a single run.
+    """
+
+    def __init__(self, seed=42, tag="homebase", as_of=None):
+        self.random_seed = seed
+        self.tag = tag
+        self.as_of = as_of or date.today()
+
+    @property
+    def email_domain(self):
+        return f"@{self.tag}.bench"
+
+    # ------------------------------------------------------------
+    # Households, members and categories
+    # ------------------------------------------------------------
+
+    def ensure_households(self, conn, households, members):
+        """Create households with their members and categories if they don't exist yet.
+
+        Returns {household_id: {'members': [user_ids], 'shared': [(category_id, name)],
+        'bill': category_id, 'goal': category_id}}.
+        """
+        existing = self.load_households(conn)
+        if len(existing) >= households:
+            return existing
+
+        start = len(existing)
+        _bulk_insert(conn, "INSERT INTO Users (username, email) VALUES (%s, %s)", (
+            (f"bench_user_{h}_{m}", f"user_{h}_{m}{self.email_domain}")
+            for h in range(start, households) for m in range(members)
+        ))
+        users = dict(_fetch_all(
+            conn,
+            "SELECT email, user_id FROM Users WHERE email LIKE %s",
+            (f"%{self.email_domain}",)
+        ))
+
+        cursor = conn.cursor()
+        for h in range(start, households):
+            member_ids = [users[f"user_{h}_{m}{self.email_domain}"] for m in range(members)]
+            cursor.execute(
+                "INSERT INTO Households (admin_user_id, name) VALUES (%s, %s)",
+                (member_ids[0], f"Bench Household {h}")
+            )
+            household_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO HouseholdMembers (household_id, user_id, role) VALUES (%s, %s, %s)",
+                [(household_id, user_id, 'admin' if i == 0 else 'member') for i, user_id in enumerate(member_ids)]
+            )
+            categories = [(household_id, name, 'shared') for name in SHARED_CATEGORIES]
+            categories += [(household_id, 'Bill', 'bill'), (household_id, 'Contribution', 'goal')]
+            cursor.executemany(
+                "INSERT INTO Categories (household_id, name, type) VALUES (%s, %s, %s)",
+                categories
+            )
+            conn.commit()
+        cursor.close()
+        return self.load_households(conn)
+
+    def load_households(self, conn):
+        """Return the households owned by this generator's tag, keyed by household_id.
+
+        Each household's 'number' is its position in creation order, which seeds its
+        random streams.
+        """
+        rows = _fetch_all(conn, """
+            SELECT h.household_id, hm.user_id
+            FROM Households h
+            JOIN HouseholdMembers hm ON h.household_id = hm.household_id
+            JOIN Users u ON hm.user_id = u.user_id
+            WHERE u.email LIKE %s
+            ORDER BY h.household_id, hm.user_id
+        """, (f"%{self.email_domain}",))
+
+        households = {}
+        for household_id, user_id in rows:
+            households.setdefault(household_id, {'members': [], 'shared': []})['members'].append(user_id)
+        if not households:
+            return households
+        for number, household_id in enumerate(households):
+            households[household_id]['number'] = number
+
+        placeholders = ", ".join(["%s"] * len(households))
+        categories = _fetch_all(
+            conn,
+            f"SELECT household_id, category_id, name, type FROM Categories WHERE household_id IN ({placeholders})",
+            tuple(households)
+        )
+        for household_id, category_id, name, category_type in categories:
+            if category_type == 'shared':
+                households[household_id]['shared'].append((category_id, name))
+            else:
+                households[household_id][category_type] = category_id
+        return households
+
+    # ------------------------------------------------------------
+    # Row streams
+    # ------------------------------------------------------------
+
+    def _rng(self, stream, number):
+        """Random stream `number` of `stream`; it depends only on the seed and tag."""
+        return random.Random(f"{self.random_seed}:{self.tag}:{stream}:{number}")
+
+    def _random_timestamp(self, rng):
+        seconds = rng.randrange(HISTORY_DAYS * 86400)
+        return datetime.combine(self.as_of, time()) - timedelta(seconds=seconds)
+
+    def transaction_rows(self, households, count, start=0):
+        """Yield Transactions rows start .. start + count - 1 of the data set, spread across
+        households and the HISTORY_DAYS days before as_of."""
+        household_ids = sorted(households)
+        rng = None
+        # Replay the block start falls in up to start, so its rows don't depend on earlier runs
+        for number in range(start - start % BATCH_SIZE, start + count):
+            if rng is None or number % BATCH_SIZE == 0:
+                rng = self._rng("transactions", number // BATCH_SIZE)
+            household_id = rng.choice(household_ids)
+            household = households[household_id]
+            user_id = rng.choice(household['members'])
+            kind = rng.random()
+            if kind < 0.15:
+                bill_name = rng.choice(BILL_NAMES)
+                row = (household_id, user_id, household['bill'], round(rng.uniform(30, 1500), 2),
+                       f"Paid bill: {bill_name}", self._random_timestamp(rng), bill_name)
+            elif kind < 0.25:
+                goal_name = rng.choice(GOAL_NAMES)
+                row = (household_id, user_id, household['goal'], round(rng.uniform(10, 300), 2),
+                       f"Contribution to {goal_name}", self._random_timestamp(rng), goal_name)
+            else:
+                category_id, category_name = rng.choice(household['shared'])
+                row = (household_id, user_id, category_id, round(rng.uniform(2, 250), 2),
+                       f"{category_name} purchase", self._random_timestamp(rng), category_name)
+            if number >= start:
+                yield row
+
+    def bill_rows(self, households, per_household):
+        for household_id in households:
+            rng = self._rng("bills", households[household_id]['number'])
+            for _ in range(per_household):
+                due_date = self.as_of + timedelta(days=rng.randint(-90, 90))
+                status = 'paid' if rng.random() < 0.4 else 'pending'
+                yield (household_id, rng.choice(BILL_NAMES), round(rng.uniform(30, 1500), 2), due_date, status)
+
+    def settlement_rows(self, households, per_household):
+        for household_id, household in households.items():
+            if len(household['members']) < 2:
+                continue
+            rng = self._rng("settlements", household['number'])
+            for _ in range(per_household):
+                payer, receiver = rng.sample(household['members'], 2)
+                status = rng.choice(['pending', 'settled', 'settled', 'overdue'])
+                yield (household_id, payer, receiver, round(rng.uniform(5, 400), 2), status, self._random_timestamp(rng))
+
+    def goal_rows(self, households, per_household):
+        for household_id in households:
+            rng = self._rng("goals", households[household_id]['number'])
+            for _ in range(per_household):
+                target = round(rng.uniform(500, 10000), 2)
+                yield (household_id, rng.choice(GOAL_NAMES), target, round(target * rng.random(), 2),
+                       self._random_timestamp(rng))
+
+    # ------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------
+
+    def count_transactions(self, conn, households):
+        if not households:
+            return 0
+        placeholders = ", ".join(["%s"] * len(households))
+        return _fetch_all(
+            conn,
+            f"SELECT COUNT(*) FROM Transactions WHERE household_id IN ({placeholders})",
+            tuple(households)
+        )[0][0]
+
+    def seed(self, households=10, members=5, transactions=10000,
+             bills_per_household=20, settlements_per_household=50, goals_per_household=4):
+        """Top the tagged data set up to the requested size and return a summary dict.
+
+        Households, bills, settlements and goals are only created the first time; later
+        calls with a larger transactions count insert just the missing transactions,
+        so a benchmark can grow the same data set through several sizes.
+        """
+        with get_database_connection() as conn:
+            if not conn:
+                raise RuntimeError("Database connection failed")
+
+            existing = self.load_households(conn)
+            owned = self.ensure_households(conn, households, members)
+            new_households = {hid: h for hid, h in owned.items() if hid not in existing}
+
+            _bulk_insert(conn, """
+                INSERT INTO Bills (household_id, name, amount, due_date, status)
+                VALUES (%s, %s, %s, %s, %s)
+            """, self.bill_rows(new_households, bills_per_household))
+            _bulk_insert(conn, """
+                INSERT INTO DebtSettlements (household_id, payer_user_id, receiver_user_id, amount, status, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, self.settlement_rows(new_households, settlements_per_household))
+            _bulk_insert(conn, """
+                INSERT INTO SavingsGoals (household_id, name, target_amount, current_amount, created_at)
+                VALUES (%s, %s, %s, %s, %s)
+            """, self.goal_rows(new_households, goals_per_household))
+
+            present = self.count_transactions(conn, owned)
+            missing = max(0, transactions - present)
+            _bulk_insert(conn, """
+                INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, created_at, category_key)
+                VALUES (%s, %s, %s, %s, %s, TRUE, %s, %s)
+            """, self.transaction_rows(owned, missing, start=present))
+
+        if missing or new_households:
+            rebuild_daily_spending(household_ids=list(owned))
+
+        return {
+            "households": len(owned),
+            "members": members,
+            "transactions": transactions,
+            "transactions_inserted": missing,
+            "household_ids": sorted(owned),
+            "members_by_household": {household_id: h['members'] for household_id, h in owned.items()}
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed HomeBase with synthetic data.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tag', default="homebase", help="data set name; users get emails @<tag>.bench")
+    parser.add_argument('--households', type=int, default=10)
+    parser.add_argument('--members', type=int, default=5)
+    parser.add_argument('--transactions', type=int, default=10000)
+    parser.add_argument('--bills', type=int, default=20, help="bills per household")
+    parser.add_argument('--settlements', type=int, default=50, help="debt settlements per household")
+    parser.add_argument('--goals', type=int, default=4, help="savings goals per household")
+    parser.add_argument('--as-of', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help="date the generated history ends on (default: today)")
+    parser.add_argument('--sqlite', metavar='PATH', help="seed an embedded SQLite database instead of MySQL")
+    args = parser.parse_args(argv)
+
+    if args.sqlite:
+        set_backend(SQLiteBackend(args.sqlite, sample_data=False))
+
+    summary = SyntheticDataGenerator(args.seed, args.tag, args.as_of).seed(
+        households=args.households,
+        members=args.members,
+        transactions=args.transactions,
+        bills_per_household=args.bills,
+        settlements_per_household=args.settlements,
+        goals_per_household=args.goals
+    )
+    print(f"Seeded {summary['households']} household(s), inserted {summary['transactions_inserted']} transaction(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Background Jobs for HomeBase Dashboard
+This module runs the overdue-bill sweeper on a schedule so that page renders stay
+read-only instead of issuing an UPDATE on every rerun. The same pass expires old
+idempotency keys.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import streamlit as st
+
+from crud import sweep_overdue_bills, expire_idempotency_keys, get_upcoming_bills
+
+
+logger = logging.getLogger(__name__)
+
+
+class OverdueBillSweeper:
+    """Daemon thread that marks overdue bills for all households every interval_seconds.
+
+    Each pass also deletes idempotency keys older than key_retention_seconds.
+    """
+
+    def __init__(self, interval_seconds=86400, batch_size=500, key_retention_seconds=86400):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.key_retention_seconds = key_retention_seconds
+        self.history = deque(maxlen=50)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="overdue-bill-sweeper", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def last_run(self):
+        """Return the most recent pass as a dict, or None if no pass has finished yet."""
+        return self.history[-1] if self.history else None
+
+    def run_once(self):
+        """Run one sweep pass, invalidate the touched households and record the result."""
+        started = time.perf_counter()
+        rows_changed, household_ids = sweep_overdue_bills(self.batch_size)
+        for household_id in household_ids:
+            get_upcoming_bills.invalidate(household_id)
+        keys_expired = expire_idempotency_keys(self.key_retention_seconds, self.batch_size)
+
+        result = {
+            "finished_at": datetime.now(),
+            "rows_changed": rows_changed,
+            "households": len(household_ids),
+            "keys_expired": keys_expired,
+            "seconds": time.perf_counter() - started
+        }
+        self.history.append(result)
+        logger.info(
+            "Overdue sweep marked %d bill(s) in %d household(s) and expired %d idempotency key(s) in %.3fs",
+            rows_changed, len(household_ids), keys_expired, result["seconds"]
+        )
+        return result
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Overdue sweep failed")
+            self._stop.wait(self.interval_seconds)
+
+
+@st.cache_resource
+def start_overdue_sweeper():
+    """Start the one sweeper shared by every session on this server.
+
+    The interval, batch size and idempotency key retention are read from
+    st.secrets['sweeper'] (interval_seconds, batch_size, idempotency_key_retention_seconds)
+    and default to once a day, in batches of 500, keeping keys for a day.
+    """
+    settings = st.secrets.get("sweeper", {})
+    sweeper = OverdueBillSweeper(
+        interval_seconds=float(settings.get("interval_seconds", 86400)),
+        batch_size=int(settings.get("batch_size", 500)),
+        key_retention_seconds=float(settings.get("idempotency_key_retention_seconds", 86400))
+    )
+    return sweeper.start()
@@ -0,0 +1,477 @@
+"""
+Query Tracing for HomeBase Dashboard
+This module records every SQL statement the dashboard runs: the crud function that
+issued it, the normalized SQL, a hash of its parameters, wall time, rows returned
+and whether the call was answered from cache. Records go to an in-process ring
+buffer and to a rotating JSON-lines file, and can be summarized per function.
+It also keeps a per-rerun profile (section times, round trips, cache hits and
+chart build time) for the Master View performance panel.
+
+Usage (summarize a trace file written by a running dashboard):
+    python tracing.py logs/query_trace.jsonl
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+import streamlit as st
+
+
+RING_SIZE = 5000
+DEFAULT_TRACE_FILE = os.path.join('logs', 'query_trace.jsonl')
+
+# The innermost @traced call running in this thread (or asyncio task)
+_current_call = ContextVar("homebase_traced_call", default=None)
+
+# Stack frames that belong to the database plumbing rather than the caller
+_PLUMBING_FILES = ('tracing.py', 'backends.py', 'contextlib.py', os.sep + 'pandas' + os.sep,
+                   os.sep + 'sqlalchemy' + os.sep)
+
+
+# ============================================================
+# RECORDS
+# ============================================================
+
+_IN_LIST = re.compile(r'\bIN\s*\(\s*%s(\s*,\s*%s)+\s*\)', re.IGNORECASE)
+_NUMBER = re.compile(r"(?<![\w.])\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r'\s+')
+_normalized = {}
+
+
+def normalize_sql(query):
+    """Collapse whitespace and replace literals and IN lists so equal queries group together."""
+    normalized = _normalized.get(query)
+    if normalized is None:
+        normalized = _WHITESPACE.sub(' ', query).strip()
+        normalized = _IN_LIST.sub('IN (%s, ...)', normalized)
+        normalized = _STRING.sub('?', normalized)
+        normalized = _NUMBER.sub('?', normalized)
+        if len(_normalized) < 10000:
+            _normalized[query] = normalized
+    return normalized
+
+
+def hash_params(params):
+    """Short, stable hash of a parameter tuple; the values themselves are never stored."""
+    return hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+
+
+class QueryTracer:
+    """Collects trace records into a ring buffer and an optional rotating JSONL file."""
+
+    def __init__(self, ring_size=RING_SIZE):
+        self.records = deque(maxlen=ring_size)
+        self.enabled = True
+        self._file_logger = None
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=True, path=DEFAULT_TRACE_FILE, max_bytes=10 * 1024 * 1024, backup_count=5):
+        """(Re)configure the file sink. path=None keeps records in memory only."""
+        with self._lock:
+            self.enabled = enabled
+            self._configured = True
+            if self._file_logger is not None:
+                for handler in list(self._file_logger.handlers):
+                    self._file_logger.removeHandler(handler)
+                    handler.close()
+                self._file_logger = None
+            if not enabled or not path:
+                return
+
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+            except OSError as e:
+                logging.getLogger(__name__).warning("Query trace file disabled: %s", e)
+                return
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            file_logger = logging.getLogger("homebase.query_trace")
+            file_logger.setLevel(logging.INFO)
+            file_logger.propagate = False
+            file_logger.addHandler(handler)
+            self._file_logger = file_logger
+
+    def _configure_from_secrets(self):
+        """Read st.secrets['tracing'] the first time a record is written."""
+        try:
+            settings = st.secrets.get("tracing", {})
+        except Exception:
+            settings = {}
+        self.configure(
+            enabled=bool(settings.get("enabled", True)),
+            path=settings.get("path", DEFAULT_TRACE_FILE),
+            max_bytes=int(settings.get("max_bytes", 10 * 1024 * 1024)),
+            backup_count=int(settings.get("backup_count", 5))
+        )
+
+    def record(self, function, sql, params_hash, ms, rows, cached):
+        if not self._configured:
+            self._configure_from_secrets()
+        if not self.enabled:
+            return
+
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "function": function,
+            "sql": sql,
+            "params_hash": params_hash,
+            "ms": round(ms, 3),
+            "rows": rows,
+            "cached": cached
+        }
+        self.records.append(record)
+        if self._file_logger is not None:
+            self._file_logger.info(json.dumps(record, default=str))
+
+    def recent(self, limit=100, function=None):
+        """Return the newest records first, optionally for one function only."""
+        records = [r for r in reversed(self.records) if function is None or r["function"] == function]
+        return records[:limit]
+
+    def summary(self):
+        return summarize(self.records)
+
+    def clear(self):
+        self.records.clear()
+
+
+tracer = QueryTracer()
+
+
+# ============================================================
+# SUMMARIES
+# ============================================================
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(records):
+    """Per-function query counts, cache hits and p50/p95/p99 query time in ms, slowest p95 first."""
+    by_function = {}
+    for record in records:
+        stats = by_function.setdefault(record["function"], {"timings": [], "cache_hits": 0, "rows": 0})
+        if record["cached"]:
+            stats["cache_hits"] += 1
+        else:
+            stats["timings"].append(record["ms"])
+            stats["rows"] += record["rows"] or 0
+
+    summary = []
+    for function, stats in by_function.items():
+        timings = sorted(stats["timings"])
+        calls = len(timings) + stats["cache_hits"]
+        summary.append({
+            "function": function,
+            "queries": len(timings),
+            "cache_hits": stats["cache_hits"],
+            "cache_hit_ratio": stats["cache_hits"] / calls if calls else 0.0,
+            "rows": stats["rows"],
+            "total_ms": round(sum(timings), 3),
+            "p50_ms": _percentile(timings, 0.50),
+            "p95_ms": _percentile(timings, 0.95),
+            "p99_ms": _percentile(timings, 0.99)
+        })
+    summary.sort(key=lambda s: s["p95_ms"] or 0, reverse=True)
+    return summary
+
+
+def load_trace_file(path):
+    """Read the records of a trace file (rotated backups are separate files)."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ============================================================
+# INSTRUMENTATION
+# ============================================================
+
+class _Call:
+    """Bookkeeping for one @traced call: its name and how many queries it ran."""
+
+    __slots__ = ("function", "queries")
+
+    def __init__(self, function):
+        self.function = function
+        self.queries = 0
+
+
+def _caller_name():
+    """Name of the nearest non-plumbing frame, for SQL issued outside a @traced function."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not any(part in filename for part in _PLUMBING_FILES):
+            module = os.path.splitext(os.path.basename(filename))[0]
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def traced(func):
+    """Attribute the queries run inside func to it and record calls answered from cache.
+
+    Apply it outside any caching decorator: a call the cache answered is recorded with
+    cached=True. household_cached functions report that through .was_hit(); for others
+    a call that ran no query counts as a hit. The cache's .clear(), .invalidate() and
+    .prime() helpers stay available on the wrapper.
+    """
+    name = func.__name__
+    is_cached = hasattr(func, "clear")
+    was_hit = getattr(func, "was_hit", None)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        parent = _current_call.get()
+        call = _Call(name)
+        token = _current_call.set(call)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_call.reset(token)
+            if parent is not None:
+                parent.queries += call.queries
+            if is_cached:
+                # The household version check can run a query even when the cache answers
+                hit = was_hit() if was_hit is not None else call.queries == 0
+                _count("cache_hits" if hit else "cache_misses")
+                if hit:
+                    tracer.record(name, None, hash_params((args, kwargs)),
+                                  (time.perf_counter() - started) * 1000, None, True)
+
+    for helper in ("clear", "invalidate", "prime", "was_hit"):
+        if hasattr(func, helper):
+            setattr(wrapper, helper, getattr(func, helper))
+    return wrapper
+
+
+class TracedCursor:
+    """DBAPI cursor wrapper that times each statement together with fetching its rows.
+
+    A record is written when the next statement runs or the cursor is closed, so
+    the time pandas spends in fetchall() is included in the query's wall time.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pending = None
+
+    def _start(self, query, params):
+        self._finish()
+        call = _current_call.get()
+        if call is not None:
+            call.queries += 1
+        self._pending = {
+            "function": call.function if call is not None else _caller_name(),
+            "sql": normalize_sql(query),
+            "params_hash": hash_params(params),
+            "ms": 0.0,
+            "rows": 0
+        }
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending is not None:
+                self._pending["ms"] += (time.perf_counter() - started) * 1000
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        if not pending["rows"]:
+            rowcount = getattr(self._cursor, "rowcount", -1)
+            pending["rows"] = rowcount if rowcount and rowcount > 0 else 0
+        _count("queries")
+        _count("query_ms", pending["ms"])
+        tracer.record(cached=False, **pending)
+
+    def execute(self, query, params=()):
+        self._start(query, params)
+        return self._timed(self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._start(query, (len(seq_of_params),))
+        return self._timed(self._cursor.executemany, query, seq_of_params)
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None and self._pending is not None:
+            self._pending["rows"] += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(self._cursor.fetchmany, *args)
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class TracedConnection:
+    """DBAPI connection wrapper whose cursors are traced."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursors = []
+
+    def cursor(self, *args, **kwargs):
+        cursor = TracedCursor(self._conn.cursor(*args, **kwargs))
+        self._cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        """Flush cursors that were never closed (e.g. on an error path), then close."""
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors = []
+        return self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# ============================================================
+# RERUN PROFILES
+# ============================================================
+
+# The profile of the script run executing in this thread, if one was started
+_current_profile = ContextVar("homebase_rerun_profile", default=None)
+
+
+class RerunProfile:
+    """Wall time and counters for one run of the dashboard script, split into sections.
+
+    Sections are marked in order with begin_section(); each one lasts until the next
+    is marked (or finish() is called) and records the counters accumulated meanwhile.
+    scope says what ran: the whole page, or a single section rerunning as a fragment.
+    """
+
+    COUNTERS = ("queries", "query_ms", "cache_hits", "cache_misses", "figure_ms")
+
+    def __init__(self, scope="Full rerun"):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.totals = dict.fromkeys(self.COUNTERS, 0)
+        self.sections = []
+        self._open = None
+        self._lock = threading.Lock()
+
+    def add(self, counter, amount=1):
+        # Prefetch threads (prefetch.py) count into the same profile
+        with self._lock:
+            self.totals[counter] += amount
+
+    def begin_section(self, name):
+        self._close_section()
+        self._open = (name, time.perf_counter(), dict(self.totals))
+
+    def _close_section(self):
+        if self._open is None:
+            return
+        name, started, before = self._open
+        section = {"section": name, "ms": (time.perf_counter() - started) * 1000}
+        section.update({counter: self.totals[counter] - before[counter] for counter in self.COUNTERS})
+        self.sections.append(section)
+        self._open = None
+
+    def finish(self):
+        """Close the last section and return the profile as a plain dict."""
+        self._close_section()
+        return {
+            "finished_at": datetime.now(),
+            "scope": self.scope,
+            "total_ms": (time.perf_counter() - self.started) * 1000,
+            "sections": self.sections,
+            **self.totals
+        }
+
+
+def _count(counter, amount=1):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add(counter, amount)
+
+
+def start_rerun_profile(first_section="Setup", scope="Full rerun"):
+    """Start profiling the current script run; queries and cache lookups in this thread count towards it."""
+    profile = RerunProfile(scope)
+    _current_profile.set(profile)
+    profile.begin_section(first_section)
+    return profile
+
+
+def begin_section(name):
+    """Mark the start of the next dashboard section in the current rerun profile."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.begin_section(name)
+
+
+@contextmanager
+def figure_timer():
+    """Count the time spent building and serializing a Plotly figure."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _count("figure_ms", (time.perf_counter() - started) * 1000)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python tracing.py TRACE_FILE [TRACE_FILE ...]")
+        return 2
+
+    records = []
+    for path in argv:
+        records.extend(load_trace_file(path))
+
+    print(f"{'function':<40} {'queries':>8} {'cached':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in summarize(records):
+        print(f"{row['function']:<40} {row['queries']:>8} {row['cache_hits']:>7} "
+              f"{row['p50_ms'] or 0:>9.2f} {row['p95_ms'] or 0:>9.2f} {row['p99_ms'] or 0:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
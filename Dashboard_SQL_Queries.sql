@@ -1,5 +1,26 @@
 
 
+-- ============================================================
+-- HOUSEHOLD VERSION QUERIES
+-- ============================================================
+
+-- Get a household's version stamp (cached reads refetch when it moves)
+SELECT version 
+FROM HouseholdVersion 
+WHERE household_id = %s;
+
+-- Bump a household's version stamp (same transaction as every write)
+-- Built by the backend's upsert_sql(); this is the MySQL form
+INSERT INTO HouseholdVersion (household_id, version)
+VALUES (%s, %s)
+ON DUPLICATE KEY UPDATE version = version + VALUES(version);
+
+-- Households a renamed user belongs to
+SELECT household_id 
+FROM HouseholdMembers 
+WHERE user_id = %s;
+
+
 -- ============================================================
 -- USER MANAGEMENT QUERIES
 -- ============================================================
@@ -18,11 +39,6 @@ UPDATE Users
 SET username = %s 
 WHERE user_id = %s;
 
--- Get user by username
-SELECT user_id, username, email 
-FROM Users 
-WHERE username = %s;
-
 -- Get users from admin view
 SELECT user_id, username
 FROM adminusers
@@ -45,6 +61,29 @@ JOIN HouseholdMembers hm ON h.household_id = hm.household_id
 WHERE hm.user_id = %s
 LIMIT 1;
 
+-- Session bootstrap: user, household and role, members, categories and the household version in one round trip
+SELECT 'user' AS kind, u.user_id AS id, u.username AS name, u.email AS detail
+FROM Users u
+WHERE u.user_id = %s
+UNION ALL
+SELECT 'household', h.household_id, h.name, hm.role
+FROM Households h
+JOIN HouseholdMembers hm ON h.household_id = hm.household_id
+WHERE hm.user_id = %s AND h.household_id = (SELECT MIN(household_id) FROM HouseholdMembers WHERE user_id = %s)
+UNION ALL
+SELECT 'member', u.user_id, u.username, NULL
+FROM HouseholdMembers hm
+JOIN Users u ON hm.user_id = u.user_id
+WHERE hm.household_id = (SELECT MIN(household_id) FROM HouseholdMembers WHERE user_id = %s)
+UNION ALL
+SELECT 'category', c.category_id, c.name, c.type
+FROM Categories c
+WHERE c.household_id = (SELECT MIN(household_id) FROM HouseholdMembers WHERE user_id = %s)
+UNION ALL
+SELECT 'version', hv.version, NULL, NULL
+FROM HouseholdVersion hv
+WHERE hv.household_id = (SELECT MIN(household_id) FROM HouseholdMembers WHERE user_id = %s);
+
 -- Create new household
 INSERT INTO Households (admin_user_id, name)
 VALUES (%s, %s);
@@ -81,7 +120,9 @@ LIMIT 1;
 -- TRANSACTION QUERIES
 -- =================================
 
--- Get recent transactions
+-- Get a page of transaction history (keyset pagination, newest first)
+-- The keyset condition is omitted for the first page; member, category and
+-- amount filters are added as needed; LIMIT is page size + 1
 SELECT 
     t.transaction_id,
     t.amount,
@@ -89,100 +130,73 @@ SELECT
     t.created_at,
     u.username,
     c.name AS category,
-    c.type AS category_type
+    c.type AS category_type,
+    t.category_key
 FROM Transactions t
 JOIN Users u ON t.user_id = u.user_id
 JOIN Categories c ON t.category_id = c.category_id
-WHERE t.household_id = %s 
-AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-ORDER BY t.created_at DESC
-LIMIT 10;
+WHERE t.household_id = %s
+AND t.created_at <= %s AND (t.created_at < %s OR t.transaction_id < %s)
+AND t.user_id = %s
+AND t.category_key = %s
+AND t.amount >= %s
+AND t.amount <= %s
+ORDER BY t.created_at DESC, t.transaction_id DESC
+LIMIT %s;
+
+-- Insert bill payment transaction (display category is the bill name)
+INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, bill_id, category_key)
+VALUES (%s, %s, %s, %s, %s, TRUE, %s, %s);
+
+-- Insert goal contribution transaction (display category is the goal name)
+INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, goal_id, category_key)
+VALUES (%s, %s, %s, %s, %s, TRUE, %s, %s);
+
+-- Insert member payment transaction (display category is the category name)
+INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, category_key)
+VALUES (%s, %s, %s, %s, %s, TRUE, %s);
+
+-- Find which lines of an imported chunk are already in the ledger
+-- One %s per import key in the chunk
+SELECT import_key
+FROM Transactions
+WHERE household_id = %s
+AND import_key IN (%s, %s, %s);
+
+-- Insert imported bank transactions, one chunk per executemany (display category is the category name)
+INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared, created_at, category_key, import_key)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
 
--- Insert transaction record
-INSERT INTO Transactions (household_id, user_id, category_id, amount, notes, is_shared)
-VALUES (%s, %s, %s, %s, %s, TRUE);
+-- Shared categories an import can map file categories to
+SELECT category_id, name
+FROM Categories
+WHERE household_id = %s AND type = 'shared';
 
 
 -- ============================================================
 -- SPENDING ANALYTICS QUERIES
 -- ============================================================
 
--- Total household spending by category
--- Extracts specific names from Bill and Contribution transactions
-SELECT 
-    CASE 
-        WHEN c.name = 'Bill' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, ': ', -1), '\n', 1)
-        WHEN c.name = 'Contribution' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, 'to ', -1), '\n', 1)
-        ELSE c.name
-    END AS category,
-    SUM(t.amount) AS total
-FROM Transactions t
-JOIN Categories c ON t.category_id = c.category_id
-WHERE t.household_id = %s 
-AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-GROUP BY category;
-
--- Average spending per user
+-- Spending rollup for the last 365 days in a single scan
+-- Reads the DailySpending rollup (one row per household, day, category and member);
+-- every Time Period and both spending views are sliced from these rows in crud.py
 SELECT 
+    ds.day AS date,
+    ds.category_key AS category,
+    ds.user_id,
     u.username,
-    AVG(t.amount) AS avg_amount
-FROM Transactions t
-JOIN Users u ON t.user_id = u.user_id
-WHERE t.household_id = %s 
-AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-GROUP BY u.username
-ORDER BY avg_amount DESC
-LIMIT 5;
-
--- User vs household spending comparison
-SELECT 
-    SUM(CASE WHEN t.user_id = %s THEN t.amount ELSE 0 END) AS my_spending,
-    SUM(CASE WHEN t.user_id != %s THEN t.amount ELSE 0 END) AS household_spending
-FROM Transactions t
-WHERE t.household_id = %s 
-AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY);
-
--- User's total spending by category
-SELECT 
-    CASE 
-        WHEN c.name = 'Bill' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, ': ', -1), '\n', 1)
-        WHEN c.name = 'Contribution' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, 'to ', -1), '\n', 1)
-        ELSE c.name
-    END AS category,
-    SUM(t.amount) AS total
-FROM Transactions t
-JOIN Categories c ON t.category_id = c.category_id
-WHERE t.household_id = %s 
-AND t.user_id = %s
-AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-GROUP BY category;
-
--- User's average spending by category
-SELECT 
-    CASE 
-        WHEN c.name = 'Bill' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, ': ', -1), '\n', 1)
-        WHEN c.name = 'Contribution' THEN SUBSTRING_INDEX(SUBSTRING_INDEX(t.notes, 'to ', -1), '\n', 1)
-        ELSE c.name
-    END AS category,
-    AVG(t.amount) AS avg_amount
-FROM Transactions t
-JOIN Categories c ON t.category_id = c.category_id
-WHERE t.household_id = %s 
-AND t.user_id = %s
-AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-GROUP BY category
-ORDER BY avg_amount DESC;
+    ds.total,
+    ds.count AS txn_count
+FROM DailySpending ds
+JOIN Users u ON ds.user_id = u.user_id
+WHERE ds.household_id = %s 
+AND ds.day >= %s;
 
--- Cumulative spending over time
-SELECT 
-    DATE(t.created_at) AS date,
-    SUM(t.amount) AS daily_total
-FROM Transactions t
-WHERE t.household_id = %s 
-AND t.user_id = %s
-AND t.created_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-GROUP BY DATE(t.created_at)
-ORDER BY date ASC;
+-- Add a transaction to the daily rollup (same transaction as the Transactions insert)
+-- Built by the backend's upsert_sql(); this is the MySQL form
+INSERT INTO DailySpending (household_id, day, category_key, user_id, total, count)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE total = total + VALUES(total), count = count + VALUES(count);
 
 
 -- ============================================================
@@ -203,10 +217,11 @@ VALUES (%s, %s, %s);
 DELETE FROM Categories 
 WHERE category_id = %s AND household_id = %s;
 
--- Check if category exists
-SELECT category_id 
-FROM Categories 
-WHERE household_id = %s AND name = %s AND type = %s;
+-- Get or create a permanent category inside the payment's transaction
+-- Built by the backend's upsert_id(); this is the MySQL form (lastrowid is the id)
+INSERT INTO Categories (household_id, name, type)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE category_id = LAST_INSERT_ID(category_id);
 
 
 -- ============================================================
@@ -222,7 +237,7 @@ SELECT
     status
 FROM Bills
 WHERE household_id = %s
-AND due_date >= CURDATE()
+AND due_date >= %s
 ORDER BY due_date ASC
 LIMIT 10;
 
@@ -230,22 +245,29 @@ LIMIT 10;
 INSERT INTO Bills (household_id, name, amount, due_date, status)
 VALUES (%s, %s, %s, %s, 'pending');
 
--- Update overdue bills
+-- Find the next batch of overdue bills (background sweeper, all households)
+SELECT bill_id, household_id
+FROM Bills
+WHERE status = 'pending'
+AND due_date < %s
+ORDER BY due_date
+LIMIT %s;
+
+-- Mark a batch of bills overdue (background sweeper)
 UPDATE Bills 
 SET status = 'overdue' 
-WHERE household_id = %s 
-AND status = 'pending' 
-AND due_date < CURRENT_DATE;
+WHERE status = 'pending' 
+AND bill_id IN (%s);
 
 -- Get bill details
 SELECT household_id, name, amount 
 FROM Bills 
 WHERE bill_id = %s;
 
--- Mark bill as paid
+-- Mark bill as paid (no-op if it is already paid)
 UPDATE Bills 
 SET status = 'paid' 
-WHERE bill_id = %s;
+WHERE bill_id = %s AND status <> 'paid';
 
 -- Delete bill
 DELETE FROM Bills 
@@ -267,16 +289,35 @@ FROM SavingsGoals
 WHERE household_id = %s
 ORDER BY created_at DESC;
 
--- Get savings goal details
-SELECT current_amount, target_amount, name 
-FROM SavingsGoals 
-WHERE goal_id = %s AND household_id = %s;
+-- Claim a payment's idempotency key (0 rows if it was already used)
+INSERT IGNORE INTO IdempotencyKeys (idempotency_key) VALUES (%s);
+
+-- Find the next batch of expired idempotency keys (background sweeper)
+SELECT idempotency_key
+FROM IdempotencyKeys
+WHERE created_at < %s
+ORDER BY created_at
+LIMIT %s;
+
+-- Delete a batch of expired idempotency keys (background sweeper)
+DELETE FROM IdempotencyKeys WHERE idempotency_key IN (%s);
 
--- Update savings goal amount
+-- Add a payment to a savings goal if it still fits under the target
 UPDATE SavingsGoals 
-SET current_amount = %s 
+SET current_amount = current_amount + %s 
+WHERE goal_id = %s AND household_id = %s
+AND current_amount + %s <= target_amount;
+
+-- Check a savings goal exists
+SELECT goal_id 
+FROM SavingsGoals 
 WHERE goal_id = %s AND household_id = %s;
 
+-- Get savings goal name
+SELECT name 
+FROM SavingsGoals 
+WHERE goal_id = %s;
+
 -- Create new savings goal
 INSERT INTO SavingsGoals (household_id, name, target_amount, current_amount)
 VALUES (%s, %s, %s, %s);
@@ -307,16 +348,51 @@ WHERE ds.household_id = %s
 AND (ds.payer_user_id = %s OR ds.receiver_user_id = %s)
 ORDER BY ds.created_at DESC;
 
--- Get receiver username for payment
-SELECT username 
-FROM Users 
-WHERE user_id = %s;
+-- Get receiver username and category name for payment
+SELECT
+    (SELECT username FROM Users WHERE user_id = %s),
+    (SELECT name FROM Categories WHERE category_id = %s);
 
 -- Insert debt settlement record
 INSERT INTO DebtSettlements (household_id, payer_user_id, receiver_user_id, amount, status)
 VALUES (%s, %s, %s, %s, 'settled');
 
 
+-- ============================================================
+-- LEDGER EXPORT QUERIES
+-- ============================================================
+
+-- Export a household's transactions (read with an unbuffered cursor, in chunks)
+SELECT t.transaction_id, t.created_at, u.username, c.name AS category, t.category_key,
+       t.amount, t.notes, t.is_shared, t.bill_id, t.goal_id
+FROM Transactions t
+JOIN Users u ON t.user_id = u.user_id
+JOIN Categories c ON t.category_id = c.category_id
+WHERE t.household_id = %s
+ORDER BY t.transaction_id;
+
+-- Export a household's debt settlements
+SELECT ds.settlement_id, ds.created_at, payer.username AS payer, receiver.username AS receiver,
+       ds.amount, ds.status
+FROM DebtSettlements ds
+JOIN Users payer ON ds.payer_user_id = payer.user_id
+JOIN Users receiver ON ds.receiver_user_id = receiver.user_id
+WHERE ds.household_id = %s
+ORDER BY ds.settlement_id;
+
+-- Export a household's bills
+SELECT bill_id, name, amount, due_date, status
+FROM Bills
+WHERE household_id = %s
+ORDER BY bill_id;
+
+-- Export a household's savings goals
+SELECT goal_id, name, target_amount, current_amount, created_at
+FROM SavingsGoals
+WHERE household_id = %s
+ORDER BY goal_id;
+
+
 -- ============================================================
 -- NOTES
 -- ============================================================
@@ -408,6 +408,8 @@ WHERE household_id = 8;
 
 -- Create an index to speed up lookups by email
 CREATE INDEX idx_users_email ON Users(email);
+-- Hot-path indexes and later schema changes are versioned in /migrations
+-- (apply them with: cd Dashboard && python migrate.py)
 
 SHOW INDEX FROM Users;
 
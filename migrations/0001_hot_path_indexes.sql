@@ -0,0 +1,40 @@
+-- ============================================================
+-- 0001: Composite and covering indexes for the dashboard hot path
+-- ============================================================
+
+-- Spending rollup and recent transactions:
+-- WHERE household_id = ? AND created_at >= ? (covers user_id, category_id, amount)
+CREATE INDEX idx_transactions_household_created
+    ON Transactions (household_id, created_at, user_id, category_id, amount);
+
+-- Per-member transaction lookups:
+-- WHERE household_id = ? AND user_id = ? AND created_at >= ?
+CREATE INDEX idx_transactions_household_user_created
+    ON Transactions (household_id, user_id, created_at);
+
+-- Upcoming bills: WHERE household_id = ? AND due_date >= ? ORDER BY due_date
+CREATE INDEX idx_bills_household_due_status
+    ON Bills (household_id, due_date, status);
+
+-- Overdue sweep: WHERE status = 'pending' AND due_date < ?
+CREATE INDEX idx_bills_status_due
+    ON Bills (status, due_date);
+
+-- Payment history: WHERE household_id = ? AND (payer_user_id = ? OR receiver_user_id = ?)
+CREATE INDEX idx_settlements_household_payer
+    ON DebtSettlements (household_id, payer_user_id, created_at);
+
+CREATE INDEX idx_settlements_household_receiver
+    ON DebtSettlements (household_id, receiver_user_id, created_at);
+
+-- Savings goals: WHERE household_id = ? ORDER BY created_at DESC
+CREATE INDEX idx_goals_household_created
+    ON SavingsGoals (household_id, created_at);
+
+-- Category lookups: WHERE household_id = ? [AND name = ? AND type = ?] ORDER BY type, name
+CREATE INDEX idx_categories_household_type_name
+    ON Categories (household_id, type, name);
+
+-- Master View user lookup: WHERE username = ?
+CREATE INDEX idx_users_username
+    ON Users (username);
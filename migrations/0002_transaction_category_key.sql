@@ -0,0 +1,21 @@
+-- ============================================================
+-- 0002: Structured bill/goal references and a stored display category
+-- ============================================================
+-- Bill payments and goal contributions now record which bill or goal they
+-- belong to, and every transaction stores its display category so the
+-- spending rollup can GROUP BY an indexed column instead of parsing notes.
+-- Existing rows are backfilled in batches by migrate.py after this runs.
+
+ALTER TABLE Transactions ADD COLUMN bill_id INT NULL;
+
+ALTER TABLE Transactions ADD COLUMN goal_id INT NULL;
+
+ALTER TABLE Transactions ADD COLUMN category_key VARCHAR(100) NULL;
+
+-- Spending rollup: WHERE household_id = ? AND created_at >= ?
+-- GROUP BY DATE(created_at), category_key, user_id (covering)
+CREATE INDEX idx_transactions_household_created_key
+    ON Transactions (household_id, created_at, category_key, user_id, amount);
+
+-- Superseded by the covering index above
+DROP INDEX idx_transactions_household_created ON Transactions;
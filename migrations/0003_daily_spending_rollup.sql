@@ -0,0 +1,18 @@
+-- ============================================================
+-- 0003: Daily spending rollup maintained on write
+-- ============================================================
+-- One row per household, day, display category and member. Every write path
+-- that inserts into Transactions adds to the matching row in the same
+-- transaction, so the Spending Overview reads a table whose size depends on
+-- days x categories x members rather than on the number of transactions.
+-- migrate.py rebuilds it from Transactions when this migration is applied.
+
+CREATE TABLE DailySpending (
+    household_id INT NOT NULL,
+    day DATE NOT NULL,
+    category_key VARCHAR(100) NOT NULL,
+    user_id INT NOT NULL,
+    total DECIMAL(12,2) NOT NULL DEFAULT 0,
+    count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (household_id, day, category_key, user_id)
+);
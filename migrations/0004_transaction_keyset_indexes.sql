@@ -0,0 +1,15 @@
+-- ============================================================
+-- 0004: Indexes for keyset-paginated transaction history
+-- ============================================================
+-- Pages are ordered by (created_at, transaction_id) DESC and continue after the
+-- last row of the previous page, so each page is a short index range scan.
+
+-- Unfiltered history: WHERE household_id = ? AND (created_at, transaction_id) < (?, ?)
+CREATE INDEX idx_transactions_household_created_id
+    ON Transactions (household_id, created_at, transaction_id);
+
+-- History filtered by category: WHERE household_id = ? AND category_key = ? ...
+CREATE INDEX idx_transactions_household_key_created
+    ON Transactions (household_id, category_key, created_at, transaction_id);
+
+-- History filtered by member reuses idx_transactions_household_user_created (0001)
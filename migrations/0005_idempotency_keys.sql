@@ -0,0 +1,11 @@
+-- ============================================================
+-- 0005: Idempotency keys for payment writes
+-- ============================================================
+-- A write that must happen at most once (a goal contribution) claims its
+-- key in this table inside the same transaction. A repeated submit finds
+-- the key already taken and changes nothing, on any number of app replicas.
+
+CREATE TABLE IdempotencyKeys (
+    idempotency_key VARCHAR(64) PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,37 @@
+-- ============================================================
+-- 0006: One category per household, type and name
+-- ============================================================
+-- Permanent categories ('Bill', 'Contribution') are now created with an
+-- upsert on this key inside the payment's own transaction, so concurrent
+-- payments can no longer create duplicates. Duplicates left by the old
+-- check-then-insert are merged into the oldest row first.
+
+-- Point transactions at the oldest copy of their category
+UPDATE Transactions
+SET category_id = (
+    SELECT MIN(keep.category_id)
+    FROM Categories c
+    JOIN Categories keep
+        ON keep.household_id = c.household_id
+        AND keep.type = c.type
+        AND keep.name = c.name
+    WHERE c.category_id = Transactions.category_id
+)
+WHERE category_id NOT IN (
+    SELECT keep_id FROM (
+        SELECT MIN(category_id) AS keep_id FROM Categories GROUP BY household_id, type, name
+    ) AS keep_ids
+);
+
+DELETE FROM Categories
+WHERE category_id NOT IN (
+    SELECT keep_id FROM (
+        SELECT MIN(category_id) AS keep_id FROM Categories GROUP BY household_id, type, name
+    ) AS keep_ids
+);
+
+-- Replaces idx_categories_household_type_name (0001), same columns
+CREATE UNIQUE INDEX uq_categories_household_type_name
+    ON Categories (household_id, type, name);
+
+DROP INDEX idx_categories_household_type_name ON Categories;
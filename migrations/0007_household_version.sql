@@ -0,0 +1,11 @@
+-- ============================================================
+-- 0007: Per-household version stamps for cache freshness
+-- ============================================================
+-- Every write path adds 1 to its household's row in the same transaction.
+-- Cached reads compare this one-row stamp with the one they were fetched
+-- at and refetch only when it has moved, instead of expiring on a TTL.
+
+CREATE TABLE HouseholdVersion (
+    household_id INT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
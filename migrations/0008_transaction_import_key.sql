@@ -0,0 +1,13 @@
+-- ============================================================
+-- 0008: Import keys for bulk-imported transactions
+-- ============================================================
+-- Rows loaded from a bank export carry a key derived from the statement
+-- line (the bank's transaction id where there is one), so importing the same
+-- or an overlapping file again skips the rows already in the ledger.
+-- Transactions entered in the dashboard leave it NULL.
+
+ALTER TABLE Transactions ADD COLUMN import_key VARCHAR(64) NULL;
+
+-- Duplicate check: WHERE household_id = ? AND import_key IN (...)
+CREATE UNIQUE INDEX uq_transactions_household_import_key
+    ON Transactions (household_id, import_key);
@@ -0,0 +1,10 @@
+-- ============================================================
+-- 0009: Expiry index for idempotency keys
+-- ============================================================
+-- The background sweeper deletes keys older than the retention window in
+-- batches, oldest first, so the table no longer grows by one row per
+-- payment forever.
+
+-- Expiry sweep: WHERE created_at < ? ORDER BY created_at LIMIT ?
+CREATE INDEX idx_idempotency_keys_created
+    ON IdempotencyKeys (created_at);